@@ -13,5 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from pylivetrader import api # noqa
-from .algorithm import Algorithm # noqa
+import sys
+
+
+if sys.version_info >= (3, 7):
+    # Load the algorithm machinery on first access, so that the command
+    # line does not pay for pandas and the backends in e.g. `version`.
+    def __getattr__(name):
+        import importlib
+        if name == 'api':
+            return importlib.import_module('pylivetrader.api')
+        if name == 'Algorithm':
+            return importlib.import_module('pylivetrader.algorithm').Algorithm
+        raise AttributeError(
+            "module 'pylivetrader' has no attribute '{}'".format(name))
+else:
+    from pylivetrader import api # noqa
+    from .algorithm import Algorithm # noqa
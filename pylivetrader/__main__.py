@@ -15,25 +15,41 @@
 # limitations under the License.
 
 
+from contextlib import ExitStack
+from datetime import timedelta
 from pathlib import Path
 import os
 import click
 
-from pylivetrader.misc import configloader
-from pylivetrader.misc.api_context import LiveTraderAPI
-from pylivetrader.algorithm import Algorithm
-from pylivetrader.loader import (
-    get_algomodule_by_path,
-    get_api_functions,
-)
-from pylivetrader.shell import start_shell
+# The rest of pylivetrader (pandas, the calendars, the backends, ...) is
+# imported by the commands that need it, so `version` and `--help` start
+# without it and `run --profile-startup` can see what it costs.
 
 
 @click.group()
-def main():
-    from logbook import StreamHandler
+@click.option(
+    '--log-queue/--no-log-queue',
+    default=False,
+    show_default=True,
+    help='Write the log from a background thread, leaving out '
+         'repeated warnings, so that a slow stdout does not block.')
+@click.option(
+    '--log-queue-size',
+    default=10000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help='Number of records --log-queue holds before dropping them.')
+def main(log_queue, log_queue_size):
     import sys
-    StreamHandler(sys.stdout).push_application()
+    if log_queue:
+        import atexit
+        from pylivetrader.misc.log_queue import QueuedStreamHandler
+        handler = QueuedStreamHandler(sys.stdout, maxsize=log_queue_size)
+        atexit.register(handler.close)
+    else:
+        from logbook import StreamHandler
+        handler = StreamHandler(sys.stdout)
+    handler.push_application()
 
 
 def algo_parameters(f):
@@ -63,11 +79,54 @@ def algo_parameters(f):
             default='minute',
             show_default=True,
             help='The data frequency of the live trade.'),
+        click.option(
+            '--daily-bar-offset',
+            default=5,
+            show_default=True,
+            type=click.IntRange(min=0),
+            help='Minutes before the close to run the daily bar at, '
+                 'with --data-frequency daily.'),
         click.option(
             '-s', '--statefile',
             default=None,
             type=click.Path(writable=True),
             help='Path to the state file. Defaults to <algofile>-state.pkl.'),
+        click.option(
+            '--state-format',
+            type=click.Choice(['pickle', 'columnar']),
+            default='pickle',
+            show_default=True,
+            help='Format of the state. columnar keeps the arrays and '
+                 'DataFrames of the context in memory-mapped files '
+                 'under the <algofile>-state directory.'),
+        click.option(
+            '--shared-data',
+            default=None,
+            type=click.Path(file_okay=False, writable=True),
+            help='Directory of the market data shared by `data-daemon`.'),
+        click.option(
+            '--bar-warehouse',
+            default=None,
+            type=click.Path(file_okay=False, writable=True),
+            help='Directory to keep the fetched bars in across restarts.'),
+        click.option(
+            '--runtime-snapshot',
+            default=None,
+            type=click.Path(dir_okay=False, writable=True),
+            help='File to snapshot the asset index and the pipeline '
+                 'outputs to, for a warm restart in the same session.'),
+        click.option(
+            '--pipeline-background/--no-pipeline-background',
+            default=False,
+            show_default=True,
+            help='Compute attached pipelines in the background '
+                 'from the session start.'),
+        click.option(
+            '--pipeline-processes',
+            default=None,
+            type=int,
+            help='Number of processes to compute sharded pipelines. '
+                 'Defaults to the number of CPUs.'),
         click.argument('algofile', nargs=-1),
     ]
     for opt in opts:
@@ -82,7 +141,16 @@ def process_algo_params(
         backend,
         backend_config,
         data_frequency,
-        statefile):
+        daily_bar_offset,
+        statefile,
+        state_format,
+        shared_data,
+        bar_warehouse,
+        runtime_snapshot,
+        pipeline_background,
+        pipeline_processes,
+        startup_profiler=None,
+        algo_options=None):
     if len(algofile) > 0:
         algofile = algofile[0]
     elif file:
@@ -96,31 +164,111 @@ def process_algo_params(
     if not (Path(algofile).exists() and Path(algofile).is_file()):
         ctx.fail("couldn't find algofile '{}'".format(algofile))
 
-    algomodule = get_algomodule_by_path(algofile)
-    functions = get_api_functions(algomodule)
+    with _phase(startup_profiler, 'import pylivetrader'):
+        from pylivetrader.algorithm import Algorithm
+        from pylivetrader.loader import (
+            get_algomodule_by_path,
+            get_api_functions,
+        )
+
+    with _phase(startup_profiler, 'load algorithm file'):
+        algomodule = get_algomodule_by_path(algofile)
+        functions = get_api_functions(algomodule)
 
     backend_options = None
     if backend_config is not None:
+        from pylivetrader.misc import configloader
         backend_options = configloader.load_config(backend_config)
 
-    algorithm = Algorithm(
-        backend=backend,
-        backend_options=backend_options,
-        data_frequency=data_frequency,
-        algoname=extract_filename(algofile),
-        statefile=statefile,
-        **functions,
-    )
+    with _phase(startup_profiler, 'create algorithm and backend'):
+        algorithm = Algorithm(
+            backend=backend,
+            backend_options=backend_options,
+            data_frequency=data_frequency,
+            daily_bar_offset=timedelta(minutes=daily_bar_offset),
+            algoname=extract_filename(algofile),
+            statefile=statefile,
+            state_format=state_format,
+            shared_data=shared_data,
+            bar_warehouse=bar_warehouse,
+            runtime_snapshot=runtime_snapshot,
+            pipeline_background=pipeline_background,
+            pipeline_processes=pipeline_processes,
+            **dict(functions, **(algo_options or {}))
+        )
     ctx.algorithm = algorithm
     ctx.algomodule = algomodule
     return ctx
 
 
+def _phase(profiler, name):
+    if profiler is None:
+        return ExitStack()
+    return profiler.phase(name)
+
+
 @click.command()
 @algo_parameters
+@click.option(
+    '--profile-startup',
+    is_flag=True,
+    default=False,
+    help='Print the time spent on each start-up phase and '
+         'imported package before running.')
+@click.option(
+    '--profile',
+    default=None,
+    type=click.Path(file_okay=False, writable=True),
+    help='Sample the algorithm thread and write the per-session '
+         'collapsed stacks and reports to this directory.')
+@click.option(
+    '--profile-interval',
+    default=0.01,
+    show_default=True,
+    type=click.FloatRange(min=0.001),
+    help='Seconds between the samples of --profile.')
+@click.option(
+    '--record-dir',
+    default=None,
+    type=click.Path(file_okay=False, writable=True),
+    help='Directory to flush the history of the recorded values to.')
 @click.pass_context
-def run(ctx, **kwargs):
-    ctx = process_algo_params(ctx, **kwargs)
+def run(ctx, profile_startup, profile, profile_interval, record_dir,
+        **kwargs):
+    algo_options = {}
+    if record_dir is not None:
+        algo_options['record_dir'] = record_dir
+    if profile is not None:
+        from pylivetrader.misc.profiler import SamplingProfiler
+        algofile = kwargs['algofile'][0] if kwargs['algofile'] \
+            else kwargs['file']
+        if algofile:
+            algo_options['profiler'] = SamplingProfiler(
+                profile,
+                name=extract_filename(algofile),
+                interval=profile_interval,
+                user_files=[os.path.basename(algofile)],
+            )
+
+    startup_profiler = None
+    if profile_startup:
+        from pylivetrader.misc.import_profile import ImportProfiler
+        startup_profiler = ImportProfiler()
+        startup_profiler.start()
+    try:
+        ctx = process_algo_params(
+            ctx,
+            startup_profiler=startup_profiler,
+            algo_options=algo_options,
+            **kwargs)
+    finally:
+        if startup_profiler is not None:
+            startup_profiler.stop()
+    if startup_profiler is not None:
+        for line in startup_profiler.report():
+            click.echo(line, err=True)
+
+    from pylivetrader.misc.api_context import LiveTraderAPI
     algorithm = ctx.algorithm
     with LiveTraderAPI(algorithm):
         algorithm.run()
@@ -130,6 +278,9 @@ def run(ctx, **kwargs):
 @algo_parameters
 @click.pass_context
 def shell(ctx, **kwargs):
+    from pylivetrader.misc.api_context import LiveTraderAPI
+    from pylivetrader.shell import start_shell
+
     ctx = process_algo_params(ctx, **kwargs)
     algorithm = ctx.algorithm
     algomodule = ctx.algomodule
@@ -138,6 +289,279 @@ def shell(ctx, **kwargs):
         start_shell(algorithm, algomodule)
 
 
+@click.command(name='run-many')
+@click.option(
+    '-b', '--backend',
+    default='alpaca',
+    show_default=True,
+    help='Broker backend to run the algorithms with.')
+@click.option(
+    '--backend-config',
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False,
+        readable=True, resolve_path=True),
+    default=None,
+    help='Path to broker backend config file, for the market data of '
+         'all the algorithms.')
+@click.option(
+    '--account-config',
+    multiple=True,
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False,
+        readable=True, resolve_path=True),
+    help='Path to the backend config file of the account an algorithm '
+         'trades on, once per algorithm file in the same order. '
+         'Defaults to --backend-config for a single algorithm file.')
+@click.option(
+    '--data-frequency',
+    type=click.Choice({'daily', 'minute'}),
+    default='minute',
+    show_default=True,
+    help='The data frequency of the live trade.')
+@click.option(
+    '--daily-bar-offset',
+    default=5,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help='Minutes before the close to run the daily bar at, '
+         'with --data-frequency daily.')
+@click.option(
+    '--state-dir',
+    default=None,
+    type=click.Path(file_okay=False, writable=True),
+    help='Directory of the state files <algofile>-state.pkl. '
+         'Defaults to the current directory.')
+@click.option(
+    '--state-format',
+    type=click.Choice(['pickle', 'columnar']),
+    default='pickle',
+    show_default=True,
+    help='Format of the states, look for `run --help`.')
+@click.option(
+    '--shared-data',
+    default=None,
+    type=click.Path(file_okay=False, writable=True),
+    help='Directory of the market data shared by `data-daemon`.')
+@click.option(
+    '--bar-warehouse',
+    default=None,
+    type=click.Path(file_okay=False, writable=True),
+    help='Directory to keep the fetched bars in across restarts.')
+@click.option(
+    '--pipeline-background/--no-pipeline-background',
+    default=False,
+    show_default=True,
+    help='Compute attached pipelines in the background '
+         'from the session start.')
+@click.option(
+    '--pipeline-processes',
+    default=None,
+    type=int,
+    help='Number of processes to compute sharded pipelines. '
+         'Defaults to the number of CPUs.')
+@click.argument(
+    'algofiles',
+    nargs=-1,
+    required=True,
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False,
+        readable=True, resolve_path=True))
+@click.pass_context
+def run_many(
+        ctx,
+        algofiles,
+        backend,
+        backend_config,
+        account_config,
+        data_frequency,
+        daily_bar_offset,
+        state_dir,
+        state_format,
+        shared_data,
+        bar_warehouse,
+        pipeline_background,
+        pipeline_processes):
+    from pylivetrader.algorithm import Algorithm
+    from pylivetrader.assets import AssetFinder, intern_calendar
+    from pylivetrader.backend import load_backend
+    from pylivetrader.data.data_portal import DataPortal
+    from pylivetrader.data.shared_cache import SharedMarketDataCache
+    from pylivetrader.data.warehouse import BarWarehouse
+    from pylivetrader.executor.multi import MultiAlgorithmExecutor
+    from pylivetrader.loader import (
+        get_algomodule_by_path,
+        get_api_functions,
+    )
+    from pylivetrader.misc.calendar_snapshot import get_calendar
+    from pylivetrader.statestore import default_state_path
+
+    names = [extract_filename(algofile) for algofile in algofiles]
+    if len(set(names)) < len(names):
+        ctx.fail('algorithm file names must be unique, '
+                 'as they name the state files')
+
+    if account_config and len(account_config) != len(algofiles):
+        ctx.fail('give one --account-config per algorithm file')
+    if not account_config and len(algofiles) > 1:
+        ctx.fail('the algorithms would trade on the same account, '
+                 'give one --account-config per algorithm file')
+
+    from pylivetrader.misc import configloader
+    backend_options = None
+    if backend_config is not None:
+        backend_options = configloader.load_config(backend_config)
+
+    # one data plane for all the algorithms
+    data_backend = load_backend(backend, backend_options)
+    calendar = intern_calendar(get_calendar('NYSE'))
+    data_portal = DataPortal(
+        data_backend,
+        AssetFinder(data_backend),
+        calendar,
+        shared_cache=(
+            SharedMarketDataCache(shared_data)
+            if shared_data is not None else None),
+        warehouse=(
+            BarWarehouse(bar_warehouse, calendar)
+            if bar_warehouse is not None else None),
+    )
+
+    # and one account for each of them
+    if account_config:
+        trading_backends = [
+            load_backend(backend, configloader.load_config(path))
+            for path in account_config
+        ]
+    else:
+        trading_backends = [data_backend]
+
+    algos = []
+    for algofile, name, trading_backend in zip(
+            algofiles, names, trading_backends):
+        algomodule = get_algomodule_by_path(algofile)
+        statefile = default_state_path(name, state_format)
+        if state_dir is not None:
+            os.makedirs(state_dir, exist_ok=True)
+            statefile = os.path.join(state_dir, statefile)
+        algos.append(Algorithm(
+            backend=trading_backend,
+            data_portal=data_portal,
+            data_frequency=data_frequency,
+            daily_bar_offset=timedelta(minutes=daily_bar_offset),
+            algoname=name,
+            statefile=statefile,
+            state_format=state_format,
+            pipeline_background=pipeline_background,
+            pipeline_processes=pipeline_processes,
+            **get_api_functions(algomodule)
+        ))
+
+    try:
+        executor = MultiAlgorithmExecutor(algos, data_portal)
+    except ValueError as e:
+        ctx.fail(str(e))
+    executor.run()
+
+
+@click.command()
+@click.option(
+    '--sessions',
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help='Number of past sessions to simulate.')
+@click.option(
+    '--universe',
+    default=50,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help='Number of stocks of the synthesic data.')
+@click.option(
+    '--data',
+    default=None,
+    type=click.Path(exists=True, file_okay=False, resolve_path=True),
+    help='Directory of recorded minute bars to replay, '
+         'one <SYMBOL>.csv per stock.')
+@click.option(
+    '--data-frequency',
+    type=click.Choice({'daily', 'minute'}),
+    default='minute',
+    show_default=True,
+    help='The data frequency of the simulation.')
+@click.option(
+    '--json', 'json_path',
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help='Also write the report as JSON to this file, or - for stdout.')
+@click.argument(
+    'algofile',
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False,
+        readable=True, resolve_path=True))
+def bench(sessions, universe, data, data_frequency, json_path, algofile):
+    import json
+    from pylivetrader.testing.bench import run_bench, format_report
+
+    report = run_bench(
+        algofile,
+        sessions=sessions,
+        universe=universe,
+        data=data,
+        data_frequency=data_frequency,
+    )
+
+    if json_path == '-':
+        click.echo(json.dumps(report, indent=2))
+        return
+    for line in format_report(report):
+        click.echo(line)
+    if json_path is not None:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+@click.command(name='data-daemon')
+@click.option(
+    '-b', '--backend',
+    default='alpaca',
+    show_default=True,
+    help='Broker backend to fetch market data with.')
+@click.option(
+    '--backend-config',
+    type=click.Path(
+        exists=True, file_okay=True, dir_okay=False,
+        readable=True, resolve_path=True),
+    default=None,
+    help='Path to broker backend config file.')
+@click.option(
+    '--shared-data',
+    required=True,
+    type=click.Path(file_okay=False, writable=True),
+    help='Directory to publish the market data to.')
+@click.option(
+    '--delay',
+    default=0.0,
+    show_default=True,
+    help='Seconds after the minute boundary to start fetching.')
+def data_daemon(backend, backend_config, shared_data, delay):
+    from pylivetrader.backend import load_backend
+    from pylivetrader.data.shared_cache import (
+        SharedMarketDataCache, DataDaemon,
+    )
+
+    backend_options = None
+    if backend_config is not None:
+        from pylivetrader.misc import configloader
+        backend_options = configloader.load_config(backend_config)
+
+    daemon = DataDaemon(
+        load_backend(backend, backend_options),
+        SharedMarketDataCache(shared_data),
+        delay=delay,
+    )
+    daemon.run()
+
+
 @click.command()
 def version():
     from ._version import VERSION
@@ -153,7 +577,10 @@ def extract_filename(algofile):
 
 
 main.add_command(run)
+main.add_command(run_many)
 main.add_command(shell)
+main.add_command(bench)
+main.add_command(data_daemon)
 main.add_command(version)
 
 
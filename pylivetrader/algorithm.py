@@ -14,21 +14,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import warnings
 import pytz
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from datetime import tzinfo
 from itertools import chain
 from contextlib import ExitStack
 from copy import copy
-import importlib
-from trading_calendars import get_calendar
 
 import pylivetrader.protocol as proto
-from pylivetrader.assets import AssetFinder, Asset
+from pylivetrader.assets import AssetFinder, Asset, intern_calendar
+from pylivetrader.backend import load_backend
 from pylivetrader.data.bardata import handle_non_market_minutes
 from pylivetrader.data.data_portal import DataPortal
+from pylivetrader.data.shared_cache import SharedMarketDataCache
+from pylivetrader.data.warehouse import BarWarehouse
 from pylivetrader.executor.executor import AlgorithmExecutor
 from pylivetrader.errors import (
     APINotSupported, CannotOrderDelistedAsset, UnsupportedOrderParameters,
@@ -66,6 +69,7 @@ from pylivetrader.misc.events import (
     BeforeClose
 )
 from pylivetrader.misc.math_utils import round_if_near_integer, tolerant_equals
+from pylivetrader.misc.calendar_snapshot import get_calendar
 from pylivetrader.misc.api_context import (
     api_method,
     LiveTraderAPI,
@@ -73,6 +77,16 @@ from pylivetrader.misc.api_context import (
     disallowed_in_before_trading_start,
 )
 from pylivetrader.misc.pd_utils import normalize_date
+from pylivetrader.misc.recorder import (
+    Recorder,
+    DEFAULT_CAPACITY,
+    DEFAULT_MAX_BYTES,
+)
+from pylivetrader.misc.runtime_snapshot import (
+    RuntimeSnapshot,
+    backend_identity,
+)
+from pylivetrader.misc.sharded_pipeline import ShardPool
 from pylivetrader.misc.preprocess import preprocess
 from pylivetrader.misc.input_validation import (
     coerce_string,
@@ -81,13 +95,16 @@ from pylivetrader.misc.input_validation import (
     expect_dtypes,
     optional,
 )
-from pylivetrader.statestore import StateStore
+from pylivetrader.statestore import default_state_path, get_state_store
 
 from logbook import Logger
 
 
 log = Logger('Algorithm')
 
+# long enough before the close to fetch the prices and place the orders
+DEFAULT_DAILY_BAR_OFFSET = pd.Timedelta(minutes=5)
+
 
 class Algorithm:
     """Provides algorithm compatible with zipline.
@@ -96,28 +113,77 @@ class Algorithm:
     def __init__(self, *args, **kwargs):
         '''
         data_frequency: 'minute' or 'daily'
+        daily_bar_offset: pd.Timedelta, time before the close of the
+                          single bar of the 'daily' frequency, defaults
+                          to 5 minutes
         algoname: str, defaults to 'algo'
+        statefile: str, path of the state, defaults to
+                   '<algoname>-state.pkl' or '<algoname>-state'
+        state_format: 'pickle' (default) or 'columnar'
         backend: str or Backend instance, defaults to 'alpaca'
                  (str is either backend module name under
                   'pylivetrader.backend', or global import path)
         trading_calendar: pd.DateIndex for trading calendar
+        shared_data: str or SharedMarketDataCache, directory of the
+                     host-local market data published by `data-daemon`
+        bar_warehouse: str or BarWarehouse, directory to keep the fetched
+                       bars in across restarts
+        runtime_snapshot: str or RuntimeSnapshot, file to snapshot the
+                          asset index and the pipeline outputs to for
+                          a warm restart in the same session
+        asset_finder: AssetFinder to share with other algorithms on the
+                      same backend
+        data_portal: DataPortal to share with other algorithms on the
+                     same backend, its calendar is used by default
+        profiler: SamplingProfiler to run while the algorithm runs
+        record_dir: str, directory to flush the history of the recorded
+                    values to, kept in memory only by default
+        record_capacity: int, number of values kept per recorded name
+        record_max_bytes: int, memory cap of the recorded history
+        pipeline_background: bool, compute the eager pipelines in a
+                             background thread from the session start
+        pipeline_processes: int, size of the process pool of sharded
+                            pipelines, defaults to the number of CPUs
         initialize: initialize function
         handle_data: handle_data function
         before_trading_start: before_trading_start function
         '''
         self._recorded_vars = {}
+        self._recorder = Recorder(
+            capacity=kwargs.pop('record_capacity', DEFAULT_CAPACITY),
+            max_bytes=kwargs.pop('record_max_bytes', DEFAULT_MAX_BYTES),
+            directory=kwargs.pop('record_dir', None),
+        )
 
         self.data_frequency = kwargs.pop('data_frequency', 'minute')
         assert self.data_frequency in ('minute', 'daily')
+        self.daily_bar_offset = pd.Timedelta(kwargs.pop(
+            'daily_bar_offset', DEFAULT_DAILY_BAR_OFFSET))
 
         self._algoname = kwargs.pop('algoname', 'algo')
 
-        self._state_store = StateStore(
+        state_format = kwargs.pop('state_format', 'pickle')
+        self._state_store = get_state_store(
             kwargs.pop('statefile', None) or
-            '{}-state.pkl'.format(self._algoname)
+            default_state_path(self._algoname, state_format),
+            state_format,
         )
 
         self._pipelines = {}
+        self._eager_pipelines = set()
+        # name -> (session, output)
+        self._pipeline_cache = {}
+        # name -> (session, Future)
+        self._pipeline_futures = {}
+        self._pipeline_engine = None
+        self._pipeline_symbols = None
+        self._pipeline_executor = None
+        self._pipeline_background = kwargs.pop('pipeline_background', False)
+        self._pipeline_processes = kwargs.pop('pipeline_processes', None)
+        # name -> (shards, reduce)
+        self._pipeline_options = {}
+        # name -> ShardPool of the sharded pipelines
+        self._shard_pools = {}
 
         backend_param = kwargs.pop('backend', 'alpaca')
         if not isinstance(backend_param, str):
@@ -125,31 +191,39 @@ class Algorithm:
             self._backend_name = backend_param.__class__.__name__
         else:
             self._backend_name = backend_param
-            try:
-                # First, tries to import official backend packages
-                backendmod = importlib.import_module(
-                    'pylivetrader.backend.{}'.format(self._backend_name))
-            except ImportError:
-                # Then if failes, tries to find pkg in global package
-                # namespace.
-                try:
-                    backendmod = importlib.import_module(
-                        self._backend_name)
-                except ImportError:
-                    raise RuntimeError(
-                        "Could not find backend package `{}`.".format(
-                            self._backend_name))
-
-            backend_options = kwargs.pop('backend_options', None) or {}
-            self._backend = backendmod.Backend(**backend_options)
-
-        self.asset_finder = AssetFinder(self._backend)
-
-        self.trading_calendar = kwargs.pop(
-            'trading_calendar', get_calendar('NYSE'))
-
-        self.data_portal = DataPortal(
-            self._backend, self.asset_finder, self.trading_calendar)
+            self._backend = load_backend(
+                self._backend_name,
+                kwargs.pop('backend_options', None))
+
+        self.data_portal = kwargs.pop('data_portal', None)
+        self.asset_finder = kwargs.pop('asset_finder', None)
+        if self.asset_finder is None:
+            if self.data_portal is not None:
+                self.asset_finder = self.data_portal.asset_finder
+            else:
+                self.asset_finder = AssetFinder(self._backend)
+
+        # shared by the clock, the scheduled events and the bar data
+        # shared with the assets trading on the same calendar
+        trading_calendar = kwargs.pop('trading_calendar', None)
+        if trading_calendar is None:
+            if self.data_portal is not None:
+                trading_calendar = self.data_portal.trading_calendar
+            else:
+                trading_calendar = get_calendar('NYSE')
+        self.trading_calendar = intern_calendar(trading_calendar)
+
+        shared_data = kwargs.pop('shared_data', None)
+        bar_warehouse = kwargs.pop('bar_warehouse', None)
+        if self.data_portal is None:
+            if isinstance(shared_data, str):
+                shared_data = SharedMarketDataCache(shared_data)
+            if isinstance(bar_warehouse, str):
+                bar_warehouse = BarWarehouse(
+                    bar_warehouse, self.trading_calendar)
+            self.data_portal = DataPortal(
+                self._backend, self.asset_finder, self.trading_calendar,
+                shared_cache=shared_data, warehouse=bar_warehouse)
 
         self.event_manager = EventManager()
 
@@ -174,6 +248,8 @@ class Algorithm:
 
         self._account_needs_update = True
         self._portfolio_needs_update = True
+        # BarSnapshot of the current bar, set by the executor
+        self._snapshot = None
 
         self._in_before_trading_start = False
 
@@ -183,6 +259,13 @@ class Algorithm:
 
         self._max_shares = int(1e+11)
 
+        self._profiler = kwargs.pop('profiler', None)
+
+        runtime_snapshot = kwargs.pop('runtime_snapshot', None)
+        if isinstance(runtime_snapshot, str):
+            runtime_snapshot = RuntimeSnapshot(runtime_snapshot)
+        self._runtime_snapshot = runtime_snapshot
+
         self.initialized = False
 
     def initialize(self, *args, **kwargs):
@@ -225,6 +308,14 @@ class Algorithm:
                 self._backend_name, self.data_frequency)
         )
 
+        caches = None
+        if self._runtime_snapshot is not None:
+            caches = self._runtime_snapshot.load(self._runtime_snapshot_key())
+            if caches is not None:
+                log.info('restoring the runtime snapshot {}'.format(
+                    self._runtime_snapshot.path))
+                self._restore_assets(caches)
+
         # for compatibility with zipline to provide history api
         self._assets_from_source = \
             self.asset_finder.retrieve_all(self.asset_finder.sids)
@@ -235,9 +326,61 @@ class Algorithm:
         self.executor = AlgorithmExecutor(
             self,
             self.data_portal,
+            profiler=self._profiler,
         )
 
-        return self.executor.run()
+        if self._runtime_snapshot is None:
+            return self.executor.run()
+
+        if caches is not None:
+            self._restore_pipelines(caches)
+        self._runtime_snapshot.start(self._collect_runtime_caches)
+        try:
+            return self.executor.run()
+        finally:
+            self._runtime_snapshot.stop()
+
+    # runtime snapshot
+
+    def _runtime_snapshot_key(self):
+        today = pd.Timestamp.utcnow().tz_convert(self.trading_calendar.tz)
+        return (backend_identity(self._backend), today.strftime('%Y-%m-%d'))
+
+    def _collect_runtime_caches(self):
+        '''The (key, caches) of the runtime snapshot, from any thread.'''
+        pipelines = {}
+        for name, (session, output) in list(self._pipeline_cache.items()):
+            pipeline = self._pipelines.get(name)
+            if pipeline is not None:
+                pipelines[name] = (
+                    session, _pipeline_columns(pipeline), output)
+
+        # the bars are kept by the warehouse
+        warehouse = getattr(self.data_portal, 'warehouse', None)
+        if warehouse is not None:
+            warehouse.flush()
+
+        return self._runtime_snapshot_key(), {
+            'assets': self.asset_finder.cache_snapshot(),
+            'pipelines': pipelines,
+        }
+
+    def _restore_assets(self, caches):
+        assets = caches.get('assets')
+        if assets is not None and \
+                not hasattr(self.asset_finder, 'asset_cache'):
+            self.asset_finder.restore_cache(assets)
+
+    def _restore_pipelines(self, caches):
+        # after initialize(), which attaches the pipelines
+        session = self._pipeline_session()
+        for name, (saved_session, columns, output) in \
+                caches.get('pipelines', {}).items():
+            pipeline = self._pipelines.get(name)
+            if pipeline is None or saved_session != session or \
+                    columns != _pipeline_columns(pipeline):
+                continue
+            self._pipeline_cache.setdefault(name, (session, output))
 
     @api_method
     def get_environment(self, field='platform'):
@@ -381,8 +524,31 @@ class Algorithm:
         # call to next on args[0] will also advance args[1], resulting in zip
         # returning (a,b) (c,d) (e,f) rather than (a,a) (b,b) (c,c) etc.
         positionals = zip(*args)
+        dt = getattr(self, 'datetime', None) or pd.Timestamp.utcnow()
         for name, value in chain(positionals, kwargs.items()):
             self._recorded_vars[name] = value
+            self._recorder.record(dt, name, value)
+
+    @api_method
+    def recorded_history(self, name, window=None):
+        '''Return the values recorded for the name.
+
+        Parameters
+        ----------
+        name : str
+            The name given to ``record``.
+        window : int, optional
+            The number of last values to return, all of the kept ones
+            by default.
+
+        Returns
+        -------
+        history : pd.Series
+            The values indexed by the UTC datetime they were recorded at,
+            oldest first. Only the numeric values are kept, up to
+            ``record_capacity`` of them.
+        '''
+        return self._recorder.history(name, window)
 
     @api_method
     def set_benchmark(self, benchmark):
@@ -444,8 +610,42 @@ class Algorithm:
         raise APINotSupported
 
     @api_method
+    @disallowed_in_before_trading_start(OrderInBeforeTradingStart())
     def batch_order(self, order_arg_list):
-        return [self.order(*order_args) for order_args in order_arg_list]
+        orders = []
+        for order_args in order_arg_list:
+            asset, amount, limit_price, stop_price, style = \
+                _order_args(*order_args)
+
+            if not self._can_order_asset(asset):
+                orders.append(None)
+                continue
+
+            self._validate_order_style(limit_price, stop_price, style)
+            style = self.__convert_order_params_for_blotter(limit_price,
+                                                            stop_price,
+                                                            style)
+            orders.append((asset, self.round_order(amount), style))
+
+        # the trading controls see the whole list before anything is placed
+        valid = [o for o in orders if o is not None]
+        self.validate_batch_order_params([o[0] for o in valid],
+                                         [o[1] for o in valid])
+
+        if any(amount > self._max_shares for _, amount, _ in valid):
+            raise OverflowError("Can't order more than %d shares" %
+                                self._max_shares)
+
+        placed = iter(self._backend.batch_order(
+            [o for o in valid if o[1] != 0]))
+        result = []
+        for o in orders:
+            if o is None or o[1] == 0:
+                result.append(None)
+                continue
+            placed_order = next(placed)
+            result.append(placed_order.id if placed_order else None)
+        return result
 
     @api_method
     @disallowed_in_before_trading_start(OrderInBeforeTradingStart())
@@ -471,6 +671,8 @@ class Algorithm:
 
     @property
     def portfolio(self):
+        if self._snapshot is not None:
+            return self._snapshot.portfolio
         if self._portfolio_needs_update:
             self._portfolio = self._backend.portfolio
             self._portfolio_needs_update = False
@@ -478,6 +680,8 @@ class Algorithm:
 
     @property
     def account(self):
+        if self._snapshot is not None:
+            return self._snapshot.account
         if self._account_needs_update:
             self._account = self._backend.account
             self._account_needs_update = False
@@ -491,6 +695,14 @@ class Algorithm:
         self._account_needs_update = True
         self.datetime = dt
 
+    def set_snapshot(self, snapshot):
+        '''
+        Read the prices, the portfolio and the account through the
+        BarSnapshot of the current bar, or directly when None.
+        '''
+        self._snapshot = snapshot
+        self.data_portal.snapshot = snapshot
+
     @api_method
     @preprocess(tz=coerce_string(pytz.timezone))
     @expect_types(tz=optional(tzinfo))
@@ -600,8 +812,86 @@ class Algorithm:
             for (asset, amount) in share_counts.items()
             if amount
         ]
+        self.validate_batch_order_params([args[0] for args in order_args],
+                                         [args[1] for args in order_args])
         return self._backend.batch_order(order_args)
 
+    @api_method
+    @disallowed_in_before_trading_start(OrderInBeforeTradingStart())
+    @expect_types(weights=pd.Series)
+    def order_target_portfolio(self, weights, style=None):
+        """
+        Rebalance to the target weights of the portfolio value in one pass.
+
+        The share deltas of all the assets are computed at once from one
+        snapshot of the prices and positions, validated against the
+        trading controls as a batch, and submitted together, sells first
+        so that they free up buying power for the buys. Positions not in
+        `weights` are left as they are; give them a weight of 0 to close.
+
+        Parameters
+        ----------
+        weights : pd.Series[float] indexed by Asset
+            The target percent of the portfolio value for each asset.
+        style : ExecutionStyle, optional
+            The execution style of the orders. Defaults to market orders.
+
+        Returns
+        -------
+        order_ids : dict[Asset -> str]
+            The ids of the orders placed, by asset.
+        """
+        weights = weights[[self._can_order_asset(a) for a in weights.index]]
+        assets = list(weights.index)
+        if not assets:
+            return {}
+
+        self._validate_order_style(None, None, style)
+        style = self.__convert_order_params_for_blotter(None, None, style)
+
+        current_data = self.executor.current_data
+        tradable = current_data.can_trade(assets).values
+        prices = np.array(current_data.current(assets, 'price'), dtype=float)
+        for asset, ok, price in zip(assets, tradable, prices):
+            if not ok or np.isnan(price):
+                raise CannotOrderDelistedAsset(
+                    msg="Cannot order {0} on {1} as it is not tradable or "
+                        "there is no last price.".format(asset.symbol,
+                                                         self.datetime)
+                )
+
+        portfolio = self.portfolio
+        positions = _position_amounts(portfolio.positions, assets)
+        target_values = weights.values.astype(float) * \
+            portfolio.portfolio_value
+
+        # no order where the price can not tell the value, as order_value()
+        priced = ~np.isclose(prices, 0)
+        targets = np.zeros(len(assets))
+        targets[priced] = target_values[priced] / prices[priced]
+        amounts = _round_orders(
+            np.where(priced, targets - positions, 0))
+
+        if (amounts > self._max_shares).any():
+            raise OverflowError("Can't order more than %d shares" %
+                                self._max_shares)
+
+        self.validate_batch_order_params(assets, list(amounts))
+
+        order_ids = {}
+        for side in (amounts < 0, amounts > 0):
+            order_args = [
+                (assets[i], int(amounts[i]), style)
+                for i in np.flatnonzero(side)
+            ]
+            if not order_args:
+                continue
+            placed = self._backend.batch_order(order_args)
+            for (asset, _, _), o in zip(order_args, placed):
+                if o:
+                    order_ids[asset] = o.id
+        return order_ids
+
     @api_method
     def get_open_orders(self, asset=None):
         orders = self._backend.orders
@@ -688,7 +978,16 @@ class Algorithm:
 
         Raises an UnsupportedOrderParameters if invalid arguments are found.
         """
+        self._validate_order_style(limit_price, stop_price, style)
 
+        for control in self.trading_controls:
+            control.validate(asset,
+                             amount,
+                             self.portfolio,
+                             self.get_datetime(),
+                             self.executor.current_data)
+
+    def _validate_order_style(self, limit_price, stop_price, style):
         if not self.initialized:
             raise OrderDuringInitialize(
                 msg="order() can only be called from within handle_data()"
@@ -705,12 +1004,37 @@ class Algorithm:
                     msg="Passing both stop_price and style is not supported."
                 )
 
+    def validate_batch_order_params(self, assets, amounts):
+        """
+        Run the trading controls over a list of orders at once. The
+        positions and prices are fetched once for the whole list.
+
+        Raises a TradingControlViolation on the first violation of a
+        control with on_error='fail'.
+        """
+        if not self.trading_controls or not assets:
+            return
+
+        portfolio = self.portfolio
+        dt = self.get_datetime()
+        current_data = self.executor.current_data
+
+        amount_array = np.array(amounts, dtype=float)
+        positions = _position_amounts(portfolio.positions, assets)
+        prices = np.array(current_data.current(assets, 'price'), dtype=float)
+
         for control in self.trading_controls:
-            control.validate(asset,
-                             amount,
-                             self.portfolio,
-                             self.get_datetime(),
-                             self.executor.current_data)
+            mask = control.validate_batch(assets,
+                                          amount_array,
+                                          positions,
+                                          prices,
+                                          portfolio,
+                                          dt,
+                                          current_data)
+            for i in np.flatnonzero(mask):
+                for metadata in control.batch_violation_metadata(i):
+                    control.handle_violation(assets[i], amounts[i], dt,
+                                             metadata=metadata)
 
     @staticmethod
     def round_order(amount):
@@ -1000,27 +1324,188 @@ class Algorithm:
         self.register_trading_control(LongOnly(on_error))
 
     @api_method
-    def attach_pipeline(self, pipeline, name, chunks=None):
+    def attach_pipeline(self, pipeline, name, chunks=None, eager=True,
+                        shards=None, reduce=None):
+        '''Register a pipeline to be computed once per session.
+
+        Parameters
+        ----------
+        pipeline : Pipeline
+            The pipeline to have computed.
+        name : str
+            The name of the pipeline.
+        chunks : int, optional
+            Ignored, for compatibility with zipline.
+        eager : bool, optional
+            Whether to compute the pipeline in the background from the
+            session start, when the algorithm runs with
+            `pipeline_background` option.
+        shards : int, optional
+            Split the asset universe into this many shards and compute
+            them in a process pool. Cross-sectional terms then only see
+            the assets of their shard, so they should be moved to
+            `reduce`.
+        reduce : callable[pd.DataFrame -> pd.DataFrame], optional
+            Applied to the merged output, e.g. to rank or screen across
+            the whole universe.
+        '''
         self._pipelines[name] = pipeline
+        self._pipeline_options[name] = (shards, reduce)
+        pool = self._shard_pools.pop(name, None)
+        if pool is not None:
+            pool.shutdown()
+        if shards is not None and shards > 1:
+            # forked now, not from the threads computing the pipeline
+            self._shard_pools[name] = ShardPool(
+                pipeline, min(self._pipeline_processes or
+                              os.cpu_count() or 1, shards))
+        if eager:
+            self._eager_pipelines.add(name)
+        else:
+            self._eager_pipelines.discard(name)
+        self._pipeline_cache.pop(name, None)
+        self._pipeline_futures.pop(name, None)
+        return pipeline
 
     @api_method
     def pipeline_output(self, name):
-        try:
-            from pipeline_live.engine import LivePipelineEngine
-        except ImportError:
-            raise RuntimeError('pipeline-live is not installed')
+        """Get the results of the pipeline that was attached with the
+        name `name`.
+
+        The result is computed once per session and the same values are
+        returned on the subsequent calls in the session. Call
+        `refresh_pipeline` to force a new computation.
+        """
+        if name not in self._pipelines:
+            raise KeyError(name)
+        session = self._pipeline_session()
 
-        finder = self.asset_finder
+        cached = self._pipeline_cache.get(name)
+        if cached is not None and cached[0] == session:
+            return cached[1].copy()
 
-        def list_symbols():
-            return sorted([
-                a.symbol for a in finder._asset_cache.values()])
+        output = None
+        background = self._pipeline_futures.pop(name, None)
+        if background is not None and background[0] == session:
+            output = background[1].result()
+        if output is None:
+            output = self._run_pipeline(name)
 
-        eng = LivePipelineEngine(list_symbols)
-        output = eng.run_pipeline(self._pipelines[name])
-        output.index = pd.Index(finder.lookup_symbols(output.index))
+        self._pipeline_cache[name] = (session, output)
+        return output.copy()
+
+    @api_method
+    def refresh_pipeline(self, name=None):
+        '''Discard the cached pipeline output so that it is computed again
+        on the next `pipeline_output` call.
+
+        name: str, or None for all the attached pipelines
+        '''
+        names = list(self._pipelines) if name is None else [name]
+        for name in names:
+            self._pipeline_cache.pop(name, None)
+            self._pipeline_futures.pop(name, None)
+
+    def start_pipelines(self):
+        '''Start computing the eager pipelines of the current session
+        in the background, if `pipeline_background` is enabled.
+        '''
+        if not self._pipeline_background:
+            return
+
+        if self._pipeline_executor is None:
+            self._pipeline_executor = ThreadPoolExecutor(max_workers=1)
+
+        session = self._pipeline_session()
+        for name in sorted(self._eager_pipelines):
+            cached = self._pipeline_cache.get(name)
+            if cached is not None and cached[0] == session:
+                continue
+            background = self._pipeline_futures.get(name)
+            if background is not None and background[0] == session:
+                continue
+            log.info('computing pipeline {} in background'.format(name))
+            self._pipeline_futures[name] = (
+                session,
+                self._pipeline_executor.submit(
+                    self._run_pipeline_in_context, name),
+            )
+
+    def _run_pipeline_in_context(self, name):
+        with LiveTraderAPI(self):
+            return self._run_pipeline(name)
+
+    def _run_pipeline(self, name):
+        pipeline = self._pipelines[name]
+        shards, reduce = self._pipeline_options.get(name, (None, None))
+
+        if shards is not None and shards > 1:
+            output = self._shard_pools[name].run(
+                self._list_pipeline_symbols(), shards)
+        else:
+            engine = self._get_pipeline_engine()
+            output = engine.run_pipeline(pipeline)
+        output = output.copy(deep=False)
+        output.index = pd.Index(
+            self.asset_finder.lookup_symbols(output.index))
+
+        if reduce is not None:
+            output = reduce(output)
         return output
 
+    def _get_pipeline_engine(self):
+        if self._pipeline_engine is None:
+            try:
+                from pipeline_live.engine import LivePipelineEngine
+            except ImportError:
+                raise RuntimeError('pipeline-live is not installed')
+            self._pipeline_engine = LivePipelineEngine(
+                self._list_pipeline_symbols)
+        return self._pipeline_engine
+
+    def _list_pipeline_symbols(self):
+        # rebuilt only when the asset finder reloads the universe
+        asset_cache = self.asset_finder._asset_cache
+        if (self._pipeline_symbols is None or
+                self._pipeline_symbols[0] is not asset_cache):
+            self._pipeline_symbols = (asset_cache, sorted([
+                a.symbol for a in asset_cache.values()]))
+        return self._pipeline_symbols[1]
+
+    def _pipeline_session(self):
+        dt = getattr(self, 'datetime', None)
+        if dt is None:
+            dt = pd.Timestamp.utcnow()
+        return normalize_date(dt)
+
 
 def noop(*args, **kwargs):
     pass
+
+
+def _pipeline_columns(pipeline):
+    # tells apart the pipelines attached under the same name
+    columns = getattr(pipeline, 'columns', None)
+    if not isinstance(columns, dict):
+        return None
+    return tuple(sorted(columns))
+
+
+def _order_args(asset, amount, limit_price=None, stop_price=None, style=None):
+    # the arguments of order(), as given to batch_order()
+    return asset, amount, limit_price, stop_price, style
+
+
+def _round_orders(amounts):
+    # round_order() over an array
+    rounded = np.round(amounts)
+    near = np.abs(amounts - rounded) <= 1e-4
+    return np.trunc(np.where(near, rounded, amounts)).astype(np.int64)
+
+
+def _position_amounts(positions, assets):
+    if isinstance(positions, proto.Positions):
+        return positions.amounts(assets)
+    return np.array([
+        positions[asset].amount for asset in assets
+    ], dtype=float)
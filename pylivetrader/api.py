@@ -57,3 +57,14 @@ __all__ = [
     'HistoricalRestrictions',
     'RESTRICTION_STATES',
 ]
+
+
+def __getattr__(name):
+    # The redirections are registered when pylivetrader.algorithm is
+    # imported, which the package no longer does by itself (Python 3.7+).
+    import pylivetrader.algorithm  # noqa
+    try:
+        return globals()[name]
+    except KeyError:
+        raise AttributeError(
+            "module 'pylivetrader.api' has no attribute '{}'".format(name))
@@ -1,2 +1,6 @@
-from .assets import Asset, Equity # noqa
+from .assets import ( # noqa
+    Asset, Equity,
+    intern_calendar, get_exchange_calendar, bind_exchange_calendars,
+    exchanges_open,
+)
 from .finder import AssetFinder # noqa
@@ -14,13 +14,82 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from trading_calendars import get_calendar
+from trading_calendars.errors import InvalidCalendarName
 from functools import total_ordering
 
+from pylivetrader.misc.calendar_cache import SessionCalendar
+from pylivetrader.misc.calendar_snapshot import get_calendar
+
+
+# one handle per resolved calendar, shared by all of its exchange aliases
+_interned_calendars = {}
+
+# exchange name -> interned calendar
+_exchange_calendars = {}
+
+
+def intern_calendar(calendar):
+    '''
+    Return the shared SessionCalendar for the given calendar. If a
+    SessionCalendar is given for a calendar not seen yet, it becomes
+    the shared one.
+    '''
+    if isinstance(calendar, SessionCalendar):
+        handle, calendar = calendar, calendar.calendar
+    else:
+        handle = _interned_calendars.get(calendar)
+        if handle is None:
+            handle = SessionCalendar(calendar)
+    return _interned_calendars.setdefault(calendar, handle)
+
+
+def get_exchange_calendar(exchange):
+    '''Resolve the exchange calendar once and return the interned handle.'''
+    calendar = _exchange_calendars.get(exchange)
+    if calendar is None:
+        calendar = _exchange_calendars.setdefault(
+            exchange, intern_calendar(get_calendar(exchange)))
+    return calendar
+
+
+def bind_exchange_calendars(assets):
+    '''
+    Bind the interned exchange calendar to each asset. Assets on an
+    unknown exchange are left unbound, and fail when they are used.
+    '''
+    unknown = set()
+    for asset in assets:
+        if asset.exchange in unknown:
+            continue
+        try:
+            asset._exchange_calendar = get_exchange_calendar(asset.exchange)
+        except InvalidCalendarName:
+            unknown.add(asset.exchange)
+
+
+def exchanges_open(assets, dt_minute):
+    '''
+    Return the list of whether each asset's exchange is open at the
+    minute, checking every distinct calendar only once.
+    '''
+    opens = {}
+    result = []
+    for asset in assets:
+        calendar = asset.exchange_calendar
+        key = id(calendar)
+        is_open = opens.get(key)
+        if is_open is None:
+            is_open = opens[key] = calendar.is_open_on_minute(dt_minute)
+        result.append(is_open)
+    return result
+
 
 @total_ordering
 class Asset:
 
+    # bound on the first use, or by bind_exchange_calendars()
+    _exchange_calendar = None
+
     def __init__(self, sid, exchange, symbol="", asset_name="", **kwargs):
         self.sid = sid
         self.exchange = exchange
@@ -33,6 +102,11 @@ class Asset:
         self.auto_close_date = None
         self.exchange_full = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_exchange_calendar', None)
+        return state
+
     def __hash__(self):
         return hash(self.sid)
 
@@ -79,6 +153,14 @@ class Asset:
     def from_dict(cls, dic):
         return cls(**dic)
 
+    @property
+    def exchange_calendar(self):
+        calendar = self._exchange_calendar
+        if calendar is None:
+            calendar = self._exchange_calendar = \
+                get_exchange_calendar(self.exchange)
+        return calendar
+
     def is_exchange_open(self, dt_minute):
         """
         Parameters
@@ -90,8 +172,7 @@ class Asset:
         -------
         boolean: whether the asset's exchange is open at the given minute.
         """
-        calendar = get_calendar(self.exchange)
-        return calendar.is_open_on_minute(dt_minute)
+        return self.exchange_calendar.is_open_on_minute(dt_minute)
 
     def is_alive_for_session(self, session_label):
         """
@@ -14,11 +14,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from trading_calendars import register_calendar_alias, resolve_alias
+from trading_calendars.calendar_utils import (
+    global_calendar_dispatcher as default_calendar,
+)
+
 from pylivetrader.errors import (
     EquitiesNotFound, SidsNotFound, SymbolNotFound, NotSupported
 )
 from pylivetrader.misc.zipline_utils import split_delimited_symbol
 
+from .assets import bind_exchange_calendars
+
 
 class AssetFinder:
 
@@ -27,6 +34,7 @@ class AssetFinder:
 
     def clear_cache(self):
         del self.asset_cache
+        self._symbol_maps = None
 
     @property
     def _asset_cache(self):
@@ -37,22 +45,63 @@ class AssetFinder:
             asset.sid: asset
             for asset in self.backend.get_equities()
         }
+        bind_exchange_calendars(self.asset_cache.values())
 
         return self.asset_cache
 
-    @property
-    def symbol_ownership_map(self):
+    def cache_snapshot(self):
+        '''
+        The asset index to give to restore_cache() in another process,
+        or None if it is not built yet.
+        '''
+        asset_cache = getattr(self, 'asset_cache', None)
+        if asset_cache is None:
+            return None
+        exchanges = {asset.exchange for asset in asset_cache.values()}
         return {
-            split_delimited_symbol(v.symbol): v
-            for k, v in self._asset_cache.items()
+            'assets': list(asset_cache.values()),
+            # the aliases the backend registered for its exchanges
+            'calendars': {
+                exchange: resolve_alias(exchange)
+                for exchange in exchanges
+                if default_calendar.has_calendar(exchange)
+            },
+        }
+
+    def restore_cache(self, snapshot):
+        '''Use the asset index of cache_snapshot() instead of fetching it.'''
+        for exchange, name in snapshot['calendars'].items():
+            if not default_calendar.has_calendar(exchange):
+                register_calendar_alias(exchange, name, force=True)
+        self.asset_cache = {
+            asset.sid: asset for asset in snapshot['assets']
         }
+        self._symbol_maps = None
+        bind_exchange_calendars(self.asset_cache.values())
+
+    def _get_symbol_maps(self):
+        # built once per asset universe since symbol lookups are
+        # done for every pipeline output row
+        asset_cache = self._asset_cache
+        maps = getattr(self, '_symbol_maps', None)
+        if maps is None or maps[0] is not asset_cache:
+            ownership = {
+                split_delimited_symbol(v.symbol): v
+                for k, v in asset_cache.items()
+            }
+            fuzzy = {}
+            for (cs, scs), v in ownership.items():
+                fuzzy[cs + scs] = v
+            maps = self._symbol_maps = (asset_cache, ownership, fuzzy)
+        return maps
+
+    @property
+    def symbol_ownership_map(self):
+        return self._get_symbol_maps()[1]
 
     @property
     def fuzzy_symbol_ownership_map(self):
-        m = {}
-        for (cs, scs), v in self.symbol_ownership_map.items():
-            m[cs + scs] = v
-        return m
+        return self._get_symbol_maps()[2]
 
     def retrieve_all(self, sids, default_none=False):
         """
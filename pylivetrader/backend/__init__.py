@@ -0,0 +1,40 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+
+
+def load_backend(name, options=None):
+    '''
+    Instantiate the backend by name.
+
+    name: str, either backend module name under 'pylivetrader.backend',
+          or global import path
+    options: dict of keyword arguments passed to the Backend constructor
+    '''
+    try:
+        # First, tries to import official backend packages
+        backendmod = importlib.import_module(
+            'pylivetrader.backend.{}'.format(name))
+    except ImportError:
+        # Then if failes, tries to find pkg in global package
+        # namespace.
+        try:
+            backendmod = importlib.import_module(name)
+        except ImportError:
+            raise RuntimeError(
+                "Could not find backend package `{}`.".format(name))
+
+    return backendmod.Backend(**(options or {}))
@@ -20,16 +20,16 @@ import concurrent.futures
 from requests.exceptions import HTTPError
 import numpy as np
 import pandas as pd
-from trading_calendars import (
-    get_calendar,
-    register_calendar_alias,
-)
+from trading_calendars import register_calendar_alias
 from trading_calendars.calendar_utils import (
     global_calendar_dispatcher as default_calendar,
 )
+import threading
+import time
 import uuid
 
 from .base import BaseBackend
+from .ratelimit import RateLimiter
 
 from pylivetrader.api import symbol as symbol_lookup
 import pylivetrader.protocol as zp
@@ -43,7 +43,9 @@ from pylivetrader.finance.execution import (
     StopOrder,
     StopLimitOrder,
 )
+from pylivetrader.misc.calendar_snapshot import get_calendar
 from pylivetrader.misc.pd_utils import normalize_date
+from pylivetrader.misc.sentinel import sentinel
 from pylivetrader.errors import SymbolNotFound
 from pylivetrader.assets import Equity
 
@@ -57,6 +59,11 @@ NY = 'America/New_York'
 end_offset = pd.Timedelta('1000 days')
 one_day_offset = pd.Timedelta('1 day')
 
+MISSING = sentinel(
+    'MISSING',
+    'The result of a request that did not complete before its deadline.',
+)
+
 
 def skip_http_error(statuses):
     '''
@@ -84,37 +91,196 @@ def skip_http_error(statuses):
     return decorator
 
 
-def parallelize(mapfunc, workers=10):
+def parallelize(mapfunc, workers=10, limiter=None, deadline=None,
+                hedge=False):
     '''
     Parallelize the mapfunc using multithread partitioned by
     symbol.
 
+    If limiter (EndpointLimiter) is given, the pool is sized to the
+    limiter's maximum concurrency and the limiter decides how many
+    calls actually run at a time, so mapfunc should make its remote
+    calls through it.
+
+    deadline: epoch seconds by when to return. Symbols that have not
+              completed by then are returned as MISSING.
+    hedge:    if True, a duplicate call is made for a symbol that takes
+              longer than the limiter's p95 latency, and the first
+              result is used.
+
     Return: func(symbols: list[str]) => dict[str -> result]
     '''
 
+    if limiter is not None:
+        workers = limiter.max_concurrency
+
     def wrapper(symbols):
         result = {}
-        with concurrent.futures.ThreadPoolExecutor(
-                max_workers=workers) as executor:
-            tasks = {}
-            for symbol in symbols:
-                task = executor.submit(mapfunc, symbol)
-                tasks[task] = symbol
-
-            for task in concurrent.futures.as_completed(tasks):
-                symbol = tasks[task]
-                task_result = task.result()
-                result[symbol] = task_result
+        if len(symbols) == 0:
+            return result
+
+        started = {}
+
+        def run(symbol):
+            started.setdefault(symbol, time.time())
+            return mapfunc(symbol)
+
+        # not using the executor as context manager so that we do not
+        # wait for the stragglers past the deadline
+        pool_size = max(1, min(workers, len(symbols)))
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=pool_size)
+        tasks = {}
+        for symbol in symbols:
+            tasks[executor.submit(run, symbol)] = symbol
+        pending = set(tasks)
+        hedged = set()
+        try:
+            while len(pending) > 0:
+                hedge_after = None
+                if hedge and limiter is not None:
+                    hedge_after = limiter.latency.quantile(0.95)
+
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.time(), 0)
+                if hedge_after is not None:
+                    poll = max(hedge_after / 4, 0.01)
+                    timeout = poll if timeout is None else min(timeout, poll)
+
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=timeout,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for task in done:
+                    symbol = tasks[task]
+                    if symbol in result:
+                        continue
+                    try:
+                        result[symbol] = task.result()
+                    except Exception:
+                        # the hedged call may still succeed
+                        if not any(tasks[t] == symbol for t in pending):
+                            raise
+                pending = {t for t in pending if tasks[t] not in result}
+
+                if deadline is not None and time.time() >= deadline:
+                    break
+
+                # hedge the slowest calls once every call has started
+                # and there are idle workers
+                if hedge_after is None or len(started) < len(symbols):
+                    continue
+                now = time.time()
+                idle = pool_size - len(pending)
+                for task in sorted(
+                        pending, key=lambda t: started[tasks[t]]):
+                    symbol = tasks[task]
+                    if idle <= 0 or now - started[symbol] <= hedge_after:
+                        break
+                    if symbol in hedged:
+                        continue
+                    hedged.add(symbol)
+                    log.debug('hedging request for {}'.format(symbol))
+                    task = executor.submit(mapfunc, symbol)
+                    tasks[task] = symbol
+                    pending.add(task)
+                    idle -= 1
+        finally:
+            for task in pending:
+                task.cancel()
+            executor.shutdown(wait=False)
+
+        missing = [symbol for symbol in symbols if symbol not in result]
+        if len(missing) > 0:
+            log.warn('{} of {} requests missed the deadline: {}'.format(
+                len(missing), len(symbols), missing[:10]))
+            for symbol in missing:
+                result[symbol] = MISSING
         return result
 
     return wrapper
 
 
+def _available(value):
+    return value is not None and value is not MISSING
+
+
 class Backend(BaseBackend):
 
-    def __init__(self, key_id=None, secret=None, base_url=None):
+    def __init__(self, key_id=None, secret=None, base_url=None,
+                 rate_limits=None, deadline_margin=None, hedge=False):
+        '''
+        rate_limits:     dict[str -> dict] to override the limits of the
+                         'trading' and 'polygon' endpoint families, e.g.
+                         {'polygon': {'rate': 20, 'max_concurrency': 10}}
+                         or their circuit breakers, e.g.
+                         {'trading': {'circuit_breaker': {'min_calls': 5}}}
+        deadline_margin: seconds before the end of the current bar by
+                         when market data fetches return, leaving the
+                         symbols not fetched yet as missing (look for
+                         missed_deadline()). None (default) to wait for
+                         every request.
+        hedge:           duplicate market data requests slower than
+                         the p95 latency, off by default
+        '''
         self._api = tradeapi.REST(key_id, secret, base_url)
         self._cal = get_calendar('NYSE')
+        self._deadline_margin = deadline_margin
+        self._hedge = hedge
+        # (bar minute, symbols whose market data missed its deadline)
+        self._missed = (None, frozenset())
+        self._missed_lock = threading.Lock()
+
+        self._limiter = RateLimiter(rate_limits)
+        self._trading = self._limiter.get('trading')
+        self._polygon = self._limiter.get('polygon')
+        # tell when the endpoints recover while their breakers are open
+        if self._trading.breaker is not None:
+            self._trading.breaker.probe = self._api.get_clock
+        if self._polygon.breaker is not None:
+            self._polygon.breaker.probe = \
+                lambda: self._api.polygon.last_trade('SPY')
+
+    def is_alive(self):
+        return self._limiter.is_alive()
+
+    def identity(self):
+        return '{}:{}'.format(self._api._base_url, self._api._key_id)
+
+    def missed_deadline(self):
+        now = pd.Timestamp.utcnow().floor('1min')
+        minute, symbols = self._missed
+        return symbols if minute == now else frozenset()
+
+    def _record_missed(self, result):
+        missed = [
+            symbol for symbol, value in result.items() if value is MISSING]
+        if len(missed) == 0:
+            return result
+        now = pd.Timestamp.utcnow().floor('1min')
+        with self._missed_lock:
+            minute, symbols = self._missed
+            if minute != now:
+                symbols = frozenset()
+            self._missed = (now, symbols.union(missed))
+        return result
+
+    def _bar_deadline(self):
+        '''
+        The deadline of market data fetches in the current bar, or None
+        outside the market hours where there is no bar to keep up with.
+        '''
+        if self._deadline_margin is None:
+            return None
+        now = pd.Timestamp.utcnow()
+        if not self._cal.is_open_on_minute(now.floor('1min')):
+            return None
+        bar_end = now.floor('1min') + pd.Timedelta('1min')
+        # give at least a second to the requests of a late bar
+        return max(
+            bar_end.timestamp() - self._deadline_margin,
+            now.timestamp() + 1,
+        )
 
     def _symbols2assets(self, symbols):
         '''
@@ -127,7 +293,8 @@ class Backend(BaseBackend):
     def get_equities(self):
         assets = []
         t = normalize_date(pd.Timestamp('now', tz=NY))
-        raw_assets = self._api.list_assets(asset_class='us_equity')
+        raw_assets = self._trading.call(
+            self._api.list_assets, asset_class='us_equity')
         for raw_asset in raw_assets:
 
             asset = Equity(
@@ -147,36 +314,40 @@ class Backend(BaseBackend):
 
             assets.append(asset)
 
-            # register all unseen exchange name as
-            # alias of NYSE (e.g. AMEX, ARCA, NYSEARCA.)
-            if not default_calendar.has_calendar(raw_asset.exchange):
-                register_calendar_alias(raw_asset.exchange,
-                                        'NYSE', force=True)
+        # register all unseen exchange name as
+        # alias of NYSE (e.g. AMEX, ARCA, NYSEARCA.)
+        for exchange in {asset.exchange for asset in assets}:
+            if not default_calendar.has_calendar(exchange):
+                register_calendar_alias(exchange, 'NYSE', force=True)
 
         return assets
 
     @property
     def positions(self):
         z_positions = zp.Positions()
-        positions = self._api.list_positions()
+        positions = self._trading.call(self._api.list_positions)
         position_map = {}
         symbols = []
         for pos in positions:
             symbol = pos.symbol
             try:
-                z_position = zp.Position(symbol_lookup(symbol))
+                asset = symbol_lookup(symbol)
             except SymbolNotFound:
                 continue
-            z_position.amount = int(pos.qty)
-            z_position.cost_basis = float(pos.cost_basis) / float(pos.qty)
-            z_position.last_sale_price = None
-            z_position.last_sale_date = None
-            z_positions[symbol_lookup(symbol)] = z_position
+            z_position = zp.Position(
+                asset,
+                amount=int(pos.qty),
+                cost_basis=float(pos.cost_basis) / float(pos.qty),
+                last_sale_price=None,
+            )
+            z_positions[asset] = z_position
             symbols.append(symbol)
             position_map[symbol] = z_position
 
         trades = self._symbol_trades(symbols)
         for symbol, trade in trades.items():
+            if not _available(trade):
+                continue
             price = trade.price
             dt = trade.timestamp
             z_position = position_map[symbol]
@@ -186,7 +357,7 @@ class Backend(BaseBackend):
 
     @property
     def portfolio(self):
-        account = self._api.get_account()
+        account = self._trading.call(self._api.get_account)
         z_portfolio = zp.Portfolio()
         z_portfolio.cash = float(account.cash)
         z_portfolio.positions = self.positions
@@ -197,10 +368,10 @@ class Backend(BaseBackend):
 
     @property
     def account(self):
-        account = self._api.get_account()
+        account = self._trading.call(self._api.get_account)
         z_account = zp.Account()
         z_account.buying_power = float(account.buying_power)
-        z_account.total_position_value = float(
+        z_account.total_positions_value = float(
             account.portfolio_value) - float(account.cash)
         return z_account
 
@@ -228,9 +399,34 @@ class Backend(BaseBackend):
         return uuid.uuid4().hex
 
     def batch_order(self, args):
-        return [self.order(*order) for order in args]
+        def submit(i):
+            # an error fails this order only, the others may already be
+            # accepted by the broker and must be returned
+            try:
+                return self._submit_order(*args[i])
+            except Exception as e:
+                log.error('failed to submit the order for {} {}: {}'.format(
+                    args[i][1], args[i][0].symbol, e))
+                return None
+
+        # submitted concurrently, within the trading endpoint limits
+        results = parallelize(
+            submit,
+            limiter=self._trading,
+        )(list(range(len(args))))
+        # converted in this thread, which has the API context
+        return [
+            self._order2zp(results[i]) if results[i] is not None else None
+            for i in range(len(args))
+        ]
 
     def order(self, asset, amount, style):
+        order = self._submit_order(asset, amount, style)
+        if order is None:
+            return None
+        return self._order2zp(order)
+
+    def _submit_order(self, asset, amount, style):
         symbol = asset.symbol
         qty = amount if amount > 0 else -amount
         side = 'buy' if amount > 0 else 'sell'
@@ -250,7 +446,8 @@ class Backend(BaseBackend):
         zp_order_id = self._new_order_id()
 
         try:
-            order = self._api.submit_order(
+            order = self._trading.call_once(
+                self._api.submit_order,
                 symbol=symbol,
                 qty=qty,
                 side=side,
@@ -260,8 +457,7 @@ class Backend(BaseBackend):
                 stop_price=stop_price,
                 client_order_id=zp_order_id,
             )
-            zp_order = self._order2zp(order)
-            return zp_order
+            return order
         except APIError as e:
             log.warning('order is rejected {}'.format(e))
             return None
@@ -270,19 +466,21 @@ class Backend(BaseBackend):
     def orders(self):
         return {
             o.client_order_id: self._order2zp(o)
-            for o in self._api.list_orders('all')
+            for o in self._trading.call(self._api.list_orders, 'all')
         }
 
     def cancel_order(self, zp_order_id):
         try:
-            order = self._api.get_order_by_client_order_id(zp_order_id)
-            self._api.cancel_order(order.id)
+            order = self._trading.call(
+                self._api.get_order_by_client_order_id, zp_order_id)
+            self._trading.call(self._api.cancel_order, order.id)
         except Exception as e:
             log.error(e)
             return
 
     def get_last_traded_dt(self, asset):
-        trade = self._api.polygon.last_trade(asset.symbol)
+        trade = self._polygon.call(
+            self._api.polygon.last_trade, asset.symbol)
         return trade.timestamp
 
     def get_spot_value(self, assets, field, dt, data_frequency):
@@ -299,6 +497,17 @@ class Backend(BaseBackend):
             results = self._get_spot_bars(symbols, field)
         return results[0] if assets_is_scalar else results
 
+    def get_last_trades(self, assets):
+        '''
+        Return: dict[asset -> polygon.Trade or None]
+        '''
+        symbol_trades = self._symbol_trades([asset.symbol for asset in assets])
+        return {
+            asset: symbol_trades.get(asset.symbol)
+            for asset in assets
+            if symbol_trades.get(asset.symbol) is not MISSING
+        }
+
     def _get_spot_trade(self, symbols, field):
         assert(field in ('price', 'last_traded'))
         symbol_trades = self._symbol_trades(symbols)
@@ -306,11 +515,11 @@ class Backend(BaseBackend):
         def get_for_symbol(symbol_trades, symbol):
             trade = symbol_trades.get(symbol)
             if field == 'price':
-                if trade is None:
+                if not _available(trade):
                     return np.nan
                 return trade.price
             else:
-                if trade is None:
+                if not _available(trade):
                     return pd.NaT
                 return trade.timestamp
 
@@ -321,7 +530,7 @@ class Backend(BaseBackend):
 
         def get_for_symbol(symbol_bars, symbol, field):
             bars = symbol_bars.get(symbol)
-            if bars is None or len(bars) == 0:
+            if not _available(bars) or len(bars) == 0:
                 return np.nan
             return bars[field].values[-1]
 
@@ -352,6 +561,8 @@ class Backend(BaseBackend):
             symbol_bars_minute = self._symbol_bars(
                 symbols, 'minute', limit=1000)
             for symbol, df in symbol_bars_minute.items():
+                if not _available(df):
+                    continue
                 agged = df.resample('1D').agg(dict(
                     open='first',
                     high='max',
@@ -365,7 +576,7 @@ class Backend(BaseBackend):
         for asset in assets if not assets_is_scalar else [assets]:
             symbol = asset.symbol
             df = symbol_bars.get(symbol)
-            if df is None:
+            if not _available(df):
                 dfs.append(pd.DataFrame(
                     [], columns=[
                         'open', 'high', 'low', 'close', 'volume']
@@ -403,7 +614,8 @@ class Backend(BaseBackend):
         to:      str or pd.Timestamp
         limit:   str or int
 
-        return: dict[str -> pd.DataFrame]
+        return: dict[str -> pd.DataFrame], with None for the symbols
+                not found and MISSING for the ones past the deadline
         '''
         assert size in ('day', 'minute')
 
@@ -415,7 +627,8 @@ class Backend(BaseBackend):
 
         @skip_http_error((404, 504))
         def fetch(symbol):
-            df = self._api.polygon.historic_agg(
+            df = self._polygon.call(
+                self._api.polygon.historic_agg,
                 size, symbol, _from, to, query_limit).df
 
             # zipline -> right label
@@ -433,7 +646,12 @@ class Backend(BaseBackend):
                 df = df.iloc[-limit:]
             return df
 
-        return parallelize(fetch, workers=25)(symbols)
+        return self._record_missed(parallelize(
+            fetch,
+            limiter=self._polygon,
+            deadline=self._bar_deadline(),
+            hedge=self._hedge,
+        )(symbols))
 
     def _symbol_trades(self, symbols):
         '''
@@ -442,11 +660,17 @@ class Backend(BaseBackend):
 
         symbols: list[str]
 
-        return: dict[str -> polygon.Trade]
+        return: dict[str -> polygon.Trade], with None for the symbols
+                not found and MISSING for the ones past the deadline
         '''
 
         @skip_http_error((404, 504))
         def fetch(symbol):
-            return self._api.polygon.last_trade(symbol)
-
-        return parallelize(fetch, workers=25)(symbols)
+            return self._polygon.call(self._api.polygon.last_trade, symbol)
+
+        return self._record_missed(parallelize(
+            fetch,
+            limiter=self._polygon,
+            deadline=self._bar_deadline(),
+            hedge=self._hedge,
+        )(symbols))
@@ -74,3 +74,31 @@ class BaseBackend(abc.ABC):
                 Time skew between local clock and broker server clock
         '''
         return pd.Timedelta('0s')
+
+    def missed_deadline(self):
+        '''
+        Returns:
+            symbols (frozenset):
+                The symbols whose market data of the current bar did not
+                arrive before the deadline of the bar, and were returned
+                as NaN or empty bars
+        '''
+        return frozenset()
+
+    def identity(self):
+        '''
+        Returns:
+            identity (str):
+                What tells apart the accounts of the backend, e.g. the
+                endpoint and the key id, without the secrets
+        '''
+        return ''
+
+    def is_alive(self):
+        '''
+        Returns:
+            alive (bool):
+                False while the broker is known to be unavailable, so
+                that the clock skips the bars instead of waiting on it
+        '''
+        return True
@@ -0,0 +1,171 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Circuit breaker of a remote endpoint family.
+
+The breaker counts the calls that failed at the transport level
+(connection errors, timeouts and 5xx) over a sliding window. Once
+enough calls failed it opens, and the calls fail fast with
+CircuitBreakerOpen instead of waiting on their timeouts. After
+`reset_timeout` seconds a probe call is made in a background thread,
+or, without a probe, the next call goes through as the trial. If it
+succeeds the breaker closes, else it stays open twice as long, up to
+`max_reset_timeout`.
+'''
+
+from collections import deque
+import threading
+import time
+
+from logbook import Logger
+
+from pylivetrader.errors import CircuitBreakerOpen
+
+log = Logger('CircuitBreaker')
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    '''
+    name:              name of the endpoint family, for the errors
+    window:            seconds of calls the failure rate is computed on
+    min_calls:         number of calls in the window before it can open
+    failure_rate:      ratio of failed calls in the window to open at
+    reset_timeout:     seconds the breaker stays open before a probe
+    max_reset_timeout: upper bound of the backed off reset_timeout
+    probe:             function calling the endpoint, run in the
+                       background to test whether it recovered
+    '''
+
+    def __init__(self, name, window=30, min_calls=20, failure_rate=0.5,
+                 reset_timeout=15, max_reset_timeout=300, probe=None):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe = probe
+
+        self._state = CLOSED
+        # (time, failed) of the calls in the window
+        self._calls = deque()
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._retry_at = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def is_open(self):
+        '''True while the calls fail fast.'''
+        with self._lock:
+            if self._state == CLOSED:
+                return False
+            if self._state == OPEN and self.probe is None:
+                # the next call is the trial
+                return time.monotonic() < self._retry_at
+            return True
+
+    def before_call(self):
+        '''
+        Raise CircuitBreakerOpen if the call should not be made.
+        '''
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if (self._state == OPEN and self.probe is None and
+                    now >= self._retry_at):
+                self._state = HALF_OPEN
+                self._trial = True
+                return
+            raise CircuitBreakerOpen(
+                endpoint=self.name,
+                retry_in=max(self._retry_at - now, 0))
+
+    def on_success(self):
+        with self._lock:
+            self._record(False)
+            if self._state == HALF_OPEN and self._trial:
+                self._close()
+
+    def on_failure(self):
+        with self._lock:
+            self._record(True)
+            if self._state == HALF_OPEN and self._trial:
+                self._open()
+            elif self._state == CLOSED and self._tripped():
+                self._timeout = self.reset_timeout
+                self._open()
+
+    def _record(self, failed):
+        now = time.monotonic()
+        self._calls.append((now, failed))
+        self._failures += failed
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, old = self._calls.popleft()
+            self._failures -= old
+
+    def _tripped(self):
+        return (len(self._calls) >= self.min_calls and
+                self._failures >= self.failure_rate * len(self._calls))
+
+    def _open(self):
+        if self._state == HALF_OPEN:
+            self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+        else:
+            log.warn('{}: {} of the last {} calls failed, failing fast '
+                     'for {:.0f}s'.format(
+                         self.name, self._failures, len(self._calls),
+                         self._timeout))
+        self._state = OPEN
+        self._trial = False
+        self._retry_at = time.monotonic() + self._timeout
+        if self.probe is not None:
+            timer = threading.Timer(self._timeout, self._run_probe)
+            timer.daemon = True
+            timer.start()
+
+    def _close(self):
+        log.info('{}: calls succeed again'.format(self.name))
+        self._state = CLOSED
+        self._trial = False
+        self._timeout = self.reset_timeout
+        self._calls.clear()
+        self._failures = 0
+
+    def _run_probe(self):
+        with self._lock:
+            if self._state != OPEN:
+                return
+            self._state = HALF_OPEN
+            self._trial = True
+        try:
+            self.probe()
+        except Exception as e:
+            log.warn('{}: probe failed: {}'.format(self.name, e))
+            self.on_failure()
+        else:
+            self.on_success()
@@ -0,0 +1,339 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Rate limiting and adaptive concurrency for remote API calls.
+
+Each endpoint family (e.g. trading API, market data API) gets a token
+bucket that caps the request rate, and an AIMD (additive increase,
+multiplicative decrease) controller that caps the requests in flight.
+The concurrency limit grows by about one per round trip while calls
+succeed quickly, and shrinks when the provider throttles (429), fails
+(5xx, connection errors) or when the latency rises well above its
+recent baseline. Throttled and failed calls are retried with backoff,
+and a circuit breaker makes the calls fail fast while the endpoint is
+down.
+'''
+
+from collections import deque
+import random
+import threading
+import time
+
+import numpy as np
+
+from logbook import Logger
+from requests.exceptions import ConnectionError, Timeout
+
+from .circuitbreaker import CircuitBreaker
+
+log = Logger('RateLimiter')
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_LIMITS = {
+    # alpaca trading API allows 200 requests per minute per key
+    'trading': dict(rate=200 / 60., burst=20, concurrency=5,
+                    max_concurrency=25),
+    'polygon': dict(rate=50, burst=100, concurrency=10,
+                    max_concurrency=50),
+}
+
+
+def status_of(error):
+    '''
+    Return the HTTP status code of the error, 0 for connection errors
+    and timeouts, or None if it is not a transport error.
+    '''
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status
+    if isinstance(error, (ConnectionError, Timeout)):
+        return 0
+    return None
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    try:
+        return float(headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    '''
+    Latency samples of the most recent successful calls.
+    '''
+
+    def __init__(self, size=256, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def quantile(self, q):
+        '''Return the q-quantile latency, or None if not enough samples.'''
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = list(self._samples)
+        return float(np.percentile(samples, q * 100))
+
+
+class TokenBucket:
+    '''
+    Classic token bucket. `rate` tokens are added per second up to
+    `burst`, and each call consumes one token.
+    '''
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        '''Hold all callers for `seconds`, e.g. after being throttled.'''
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, time.time() + seconds)
+            self._tokens = 0
+
+
+class AdaptiveConcurrency:
+    '''
+    AIMD controller of the number of calls in flight.
+
+    initial:      initial concurrency limit
+    min_limit:    lower bound of the limit
+    max_limit:    upper bound of the limit
+    tolerance:    a successful call slower than tolerance x the baseline
+                  latency counts as a congestion signal
+    backoff:      factor applied to the limit when throttled
+    '''
+
+    def __init__(self, initial=10, min_limit=1, max_limit=50,
+                 tolerance=2.0, backoff=0.5, smoothing=0.05):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.baseline = None
+        self._inflight = 0
+        self._last_decrease = 0
+        self._cond = threading.Condition()
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    def acquire(self):
+        with self._cond:
+            while self._inflight >= int(self.limit):
+                self._cond.wait()
+            self._inflight += 1
+
+    def release(self, latency, throttled=False):
+        '''
+        End a call that took `latency` seconds. A latency of None tells
+        nothing about the endpoint, such as a rejected request, and
+        leaves the limit as it is.
+        '''
+        with self._cond:
+            self._inflight -= 1
+            if throttled:
+                self._decrease(self.backoff)
+            elif latency is None:
+                pass
+            elif (self.baseline is not None and
+                    latency > self.tolerance * self.baseline):
+                self._decrease(0.9)
+            else:
+                self.limit = min(
+                    self.max_limit, self.limit + 1. / self.limit)
+            if latency is not None and not throttled:
+                if self.baseline is None:
+                    self.baseline = latency
+                else:
+                    self.baseline += self.smoothing * (
+                        latency - self.baseline)
+            self._cond.notify_all()
+
+    def _decrease(self, factor):
+        # one decrease per round trip, so that a burst of failures
+        # from calls in flight at the same time does not collapse
+        # the limit to the minimum
+        now = time.time()
+        if now - self._last_decrease < (self.baseline or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+def _is_failure(status):
+    # the endpoint did not answer, or could not serve the request
+    return status == 0 or (status is not None and status >= 500)
+
+
+class EndpointLimiter:
+    '''
+    Rate limit, concurrency limit, retry policy and circuit breaker of
+    an endpoint family.
+
+    circuit_breaker: dict of CircuitBreaker parameters, or False to
+                     call the endpoint even when it keeps failing
+    '''
+
+    def __init__(self, name, rate=None, burst=None, concurrency=10,
+                 max_concurrency=50, max_retries=3, retry_wait=0.5,
+                 circuit_breaker=None):
+        self.name = name
+        self.breaker = None
+        if circuit_breaker is not False:
+            self.breaker = CircuitBreaker(name, **(circuit_breaker or {}))
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AdaptiveConcurrency(
+            initial=concurrency, max_limit=max_concurrency)
+        self.max_retries = max_retries
+        self.retry_wait = retry_wait
+        self.latency = LatencyTracker()
+
+    @property
+    def max_concurrency(self):
+        return self.concurrency.max_limit
+
+    def call(self, func, *args, **kwargs):
+        '''
+        Call func under the limits, retrying when throttled or when
+        the provider fails transiently.
+        '''
+        return self._call(func, args, kwargs, self.max_retries)
+
+    def call_once(self, func, *args, **kwargs):
+        '''
+        Call func under the limits without retry, for the requests
+        that are not safe to repeat (e.g. order submission).
+        '''
+        return self._call(func, args, kwargs, 0)
+
+    def _call(self, func, args, kwargs, max_retries):
+        attempt = 0
+        breaker = self.breaker
+        while True:
+            if breaker is not None:
+                breaker.before_call()
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self.concurrency.acquire()
+            start = time.time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = status_of(e)
+                if breaker is not None:
+                    if _is_failure(status):
+                        breaker.on_failure()
+                    else:
+                        breaker.on_success()
+                retryable = status == 0 or status in RETRY_STATUSES
+                # a rejected request is neither a success nor throttling
+                self.concurrency.release(
+                    time.time() - start if retryable else None,
+                    throttled=retryable)
+                if not retryable or attempt >= max_retries:
+                    raise
+
+                wait = _retry_after(e)
+                if wait is None:
+                    wait = self.retry_wait * (2 ** attempt) * (
+                        1 + random.random())
+                if status == 429 and self.bucket is not None:
+                    self.bucket.pause(wait)
+                log.warn('{} call failed with status {}, retrying in '
+                         '{:.1f}s: {}'.format(self.name, status, wait, e))
+                time.sleep(wait)
+                attempt += 1
+                continue
+            latency = time.time() - start
+            self.concurrency.release(latency)
+            self.latency.add(latency)
+            if breaker is not None:
+                breaker.on_success()
+            return result
+
+
+class RateLimiter:
+    '''
+    Registry of the endpoint families shared by all the calls of a
+    backend.
+
+    limits: dict[str -> dict] of EndpointLimiter parameters that
+            override DEFAULT_LIMITS per family
+    '''
+
+    def __init__(self, limits=None):
+        self._config = {k: dict(v) for k, v in DEFAULT_LIMITS.items()}
+        for name, params in (limits or {}).items():
+            self._config.setdefault(name, {}).update(params)
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = EndpointLimiter(
+                    name, **self._config.get(name, {}))
+            return family
+
+    def call(self, name, func, *args, **kwargs):
+        return self.get(name).call(func, *args, **kwargs)
+
+    def is_alive(self):
+        '''False if the calls of any endpoint family fail fast.'''
+        with self._lock:
+            families = list(self._families.values())
+        return not any(
+            f.breaker is not None and f.breaker.is_open for f in families)
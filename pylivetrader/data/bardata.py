@@ -21,7 +21,7 @@ from contextlib import contextmanager
 from collections import Iterable
 
 from pylivetrader.misc.pd_utils import normalize_date
-from pylivetrader.assets import Asset
+from pylivetrader.assets import Asset, exchanges_open
 
 
 @contextmanager
@@ -102,65 +102,45 @@ class BarData:
                         for field in fields
                     }, index=fields, name=assets.symbol)
         else:
+            # assume assets is iterable, fetched at once for each field
+            assets = list(assets)
             if not multiple_fields:
                 field = fields
 
-                # assume assets is iterable
                 # return a Series indexed by asset
-                if not self._adjust_minutes:
-                    return pd.Series(data={
-                        asset: self.data_portal.get_spot_value(
-                            asset,
-                            field,
-                            self._get_current_minute(),
-                            self.data_frequency
-                        )
-                        for asset in assets
-                    }, index=assets, name=fields)
-                else:
-                    return pd.Series(data={
-                        asset: self.data_portal.get_adjusted_value(
-                            asset,
-                            field,
-                            self._get_current_minute(),
-                            self.datetime,
-                            self.data_frequency
-                        )
-                        for asset in assets
-                    }, index=assets, name=fields)
+                return pd.Series(
+                    data=self._get_spot_values(assets, field),
+                    index=assets, name=fields)
 
             else:
                 # both assets and fields are iterable
-                data = {}
-
-                if not self._adjust_minutes:
-                    for field in fields:
-                        series = pd.Series(data={
-                            asset: self.data_portal.get_spot_value(
-                                asset,
-                                field,
-                                self._get_current_minute(),
-                                self.data_frequency
-                            )
-                            for asset in assets
-                        }, index=assets, name=field)
-                        data[field] = series
-                else:
-                    for field in fields:
-                        series = pd.Series(data={
-                            asset: self.data_portal.get_adjusted_value(
-                                asset,
-                                field,
-                                self._get_current_minute(),
-                                self.datetime,
-                                self.data_frequency
-                            )
-                            for asset in assets
-                        }, index=assets, name=field)
-                        data[field] = series
+                data = {
+                    field: pd.Series(
+                        data=self._get_spot_values(assets, field),
+                        index=assets, name=field)
+                    for field in fields
+                }
 
                 return pd.DataFrame(data)
 
+    def _get_spot_values(self, assets, field):
+        if not self._adjust_minutes:
+            values = self.data_portal.get_spot_value(
+                assets,
+                field,
+                self._get_current_minute(),
+                self.data_frequency
+            )
+        else:
+            values = self.data_portal.get_adjusted_value(
+                assets,
+                field,
+                self._get_current_minute(),
+                self.datetime,
+                self.data_frequency
+            )
+        return list(values)
+
     def history(self, assets, fields, bar_count, frequency):
 
         if isinstance(fields, str):
@@ -257,16 +237,48 @@ class BarData:
             adjusted_dt = dt
 
         data_portal = self.data_portal
+        session_label = self.calendar.minute_to_session_label(dt)
+
+        if self._daily_mode:
+            exchange_dt = None
+        elif self.calendar.is_open_on_minute(dt):
+            exchange_dt = dt
+        else:
+            # Find the next market minute for this calendar, and check if
+            # the asset's exchange is open at that minute.
+            exchange_dt = self.calendar.next_open(dt)
 
         if isinstance(assets, Asset):
-            return self._can_trade_for_asset(
-                assets, dt, adjusted_dt, data_portal
+            exchange_open = exchange_dt is None or \
+                assets.is_exchange_open(exchange_dt)
+            if not self._is_tradable(assets, session_label, exchange_open):
+                return False
+            # is there a last price?
+            return not np.isnan(
+                data_portal.get_spot_value(
+                    assets, "price", adjusted_dt, self.data_frequency
+                )
             )
         else:
+            assets = list(assets)
+            if exchange_dt is None:
+                exchange_open = [True] * len(assets)
+            else:
+                # grouped by exchange calendar
+                exchange_open = exchanges_open(assets, exchange_dt)
+            candidates = [
+                asset
+                for asset, is_open in zip(assets, exchange_open)
+                if self._is_tradable(asset, session_label, is_open)
+            ]
+            # the last prices of the candidates at once
+            prices = {}
+            if candidates:
+                prices = dict(zip(candidates, data_portal.get_spot_value(
+                    candidates, "price", adjusted_dt, self.data_frequency
+                )))
             tradeable = [
-                self._can_trade_for_asset(
-                    asset, dt, adjusted_dt, data_portal
-                )
+                asset in prices and not np.isnan(prices[asset])
                 for asset in assets
             ]
             return pd.Series(data=tradeable, index=assets, dtype=bool)
@@ -275,12 +287,10 @@ class BarData:
     def calendar(self):
         return self.data_portal.trading_calendar
 
-    def _can_trade_for_asset(self, asset, dt, adjusted_dt, data_portal):
+    def _is_tradable(self, asset, session_label, exchange_open):
         # if self._is_restricted(asset, adjusted_dt):
         #     return False
 
-        session_label = self.calendar.minute_to_session_label(dt)
-
         if not asset.is_alive_for_session(session_label):
             # asset isn't alive
             return False
@@ -288,24 +298,7 @@ class BarData:
         if asset.auto_close_date and session_label >= asset.auto_close_date:
             return False
 
-        if not self._daily_mode:
-            # Find the next market minute for this calendar, and check if this
-            # asset's exchange is open at that minute.
-            if self.calendar.is_open_on_minute(dt):
-                dt_to_use_for_exchange_check = dt
-            else:
-                dt_to_use_for_exchange_check = \
-                    self.calendar.next_open(dt)
-
-            if not asset.is_exchange_open(dt_to_use_for_exchange_check):
-                return False
-
-        # is there a last price?
-        return not np.isnan(
-            data_portal.get_spot_value(
-                asset, "price", adjusted_dt, self.data_frequency
-            )
-        )
+        return exchange_open
 
     def is_stale(self, assets):
         """
@@ -346,6 +339,28 @@ class BarData:
                 for asset in assets
             })
 
+    def is_missing(self, assets):
+        """
+        For the given asset or iterable of assets, returns true if the
+        market data of the asset in the current bar did not arrive before
+        the deadline of the backend, so that its values are NaN, rather
+        than being NaN in the market data.
+
+        Parameters
+        ----------
+        assets: Asset or iterable of assets
+
+        Returns
+        -------
+        boolean or Series of booleans, indexed by asset.
+        """
+        missed = self.data_portal.missed_deadline()
+        if isinstance(assets, Asset):
+            return assets.symbol in missed
+        return pd.Series(data={
+            asset: asset.symbol in missed for asset in assets
+        })
+
     def _is_stale_for_asset(self, asset, dt, adjusted_dt, data_portal):
         session_label = normalize_date(dt)  # FIXME
 
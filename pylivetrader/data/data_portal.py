@@ -15,16 +15,23 @@
 
 from functools import lru_cache
 from logbook import Logger
+import pandas as pd
 
 log = Logger('DataPortal')
 
 
 class DataPortal:
 
-    def __init__(self, backend, asset_finder, trading_calendar):
+    def __init__(self, backend, asset_finder, trading_calendar,
+                 shared_cache=None, warehouse=None):
         self.backend = backend
         self.asset_finder = asset_finder
         self.trading_calendar = trading_calendar
+        self.shared_cache = shared_cache
+        # BarWarehouse the history is read through
+        self.warehouse = warehouse
+        # BarSnapshot of the current bar, set by the executor
+        self.snapshot = None
 
     def get_last_traded_dt(self, asset, dt, data_frequency):
         return self.backend.get_last_traded_dt(asset)
@@ -40,16 +47,92 @@ class DataPortal:
         TODO:
         for external data (fetch_csv) support, need to update logic here.
         '''
-        return self.backend.get_spot_value(assets, field, dt, data_frequency)
+        return self.get_spot_value(assets, field, dt, data_frequency)
 
     def get_spot_value(self, assets, field, dt, data_frequency):
-        return self.backend.get_spot_value(assets, field, dt, data_frequency)
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.get_spot_value(assets, field, dt, data_frequency)
+        return self.fetch_spot_value(assets, field, dt, data_frequency)
+
+    def missed_deadline(self):
+        '''
+        The symbols whose market data of the current bar missed the
+        deadline of the backend.
+        '''
+        missed = getattr(self.backend, 'missed_deadline', None)
+        return missed() if missed is not None else frozenset()
+
+    def fetch_spot_value(self, assets, field, dt, data_frequency):
+        if (self.shared_cache is None or
+                field not in ('price', 'last_traded')):
+            return self.backend.get_spot_value(
+                assets, field, dt, data_frequency)
+
+        index = 0 if field == 'price' else 1
+        assets_is_scalar = not isinstance(assets, (list, set, tuple))
+        assets = [assets] if assets_is_scalar else list(assets)
+        # the published trades in one pass, the rest in one request
+        trades = self.shared_cache.read_trades([a.symbol for a in assets])
+        missing = [a for a, trade in zip(assets, trades) if trade is None]
+        fetched = iter(self.backend.get_spot_value(
+            missing, field, dt, data_frequency) if missing else [])
+        values = [
+            trade[index] if trade is not None else next(fetched)
+            for trade in trades
+        ]
+        return values[0] if assets_is_scalar else values
 
     @lru_cache(10)
     def _get_realtime_bars(self, assets, frequency, bar_count, end_dt):
+        if self.shared_cache is not None:
+            return self._get_shared_bars(
+                assets, frequency, bar_count, end_dt)
+        return self._fetch_bars(assets, frequency, bar_count, end_dt)
+
+    def _fetch_bars(self, assets, frequency, bar_count, end_dt):
+        if self.warehouse is not None:
+            return self.warehouse.get_bars(
+                self.backend, assets, frequency, bar_count, end_dt)
         return self.backend.get_bars(
             assets, frequency, bar_count=bar_count)
 
+    def _get_shared_bars(self, assets, frequency, bar_count, end_dt):
+        '''
+        Read bars from the host-local shared cache, and fetch only
+        the assets the data daemon does not have from the backend.
+        '''
+        frames = {}
+        missing = []
+        for asset in assets:
+            df = self.shared_cache.read_bars(
+                asset.symbol, frequency, bar_count)
+            if df is None:
+                missing.append(asset)
+            else:
+                frames[asset] = df
+
+        if len(frames) == 0:
+            return self._fetch_bars(assets, frequency, bar_count, end_dt)
+
+        if len(missing) > 0:
+            fetched = self._fetch_bars(
+                missing, frequency, bar_count, end_dt)
+            fetched_assets = set(fetched.columns.get_level_values(0))
+            for asset in missing:
+                if asset in fetched_assets:
+                    frames[asset] = fetched[asset]
+
+        dfs = []
+        for asset in assets:
+            df = frames.get(asset)
+            if df is None:
+                continue
+            df = df.copy()
+            df.columns = pd.MultiIndex.from_product([[asset, ], df.columns])
+            dfs.append(df)
+        return pd.concat(dfs, axis=1)
+
     def cache_clear(self):
         return self._get_realtime_bars.cache_clear()
 
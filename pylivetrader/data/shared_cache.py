@@ -0,0 +1,444 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Host-local market data cache shared between processes.
+
+A single `DataDaemon` process owns the backend fetches and publishes the
+latest trades and bars into memory mapped segments under a directory,
+one file per (kind, symbol). Algorithm processes read those segments
+through `SharedMarketDataCache` (wired into `DataPortal`), and fall back
+to their own backend on a miss.
+
+Each segment starts with a seqlock header:
+
+    seq (u8), updated_ns (i8), length (u8), capacity (u8), tz (32s)
+
+followed by `capacity` rows of int64/float64 columns stored column by
+column. The writer makes `seq` odd while it updates the segment and even
+when it is done, so readers retry until they observe the same even
+sequence before and after copying the data. When a segment needs to grow
+the writer builds a new file, renames it over the old one and marks the
+old mapping as retired so that readers re-open the path.
+
+Readers register interest in a symbol by touching a small file under
+`subscriptions/`; the daemon only fetches subscribed symbols and drops
+subscriptions that have not been refreshed for a while.
+'''
+
+import mmap
+import os
+import struct
+import time
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+from logbook import Logger
+
+from pylivetrader.errors import SymbolNotFound
+
+log = Logger('SharedCache')
+
+
+HEADER = struct.Struct('<QqQQ32s')
+SEQ = struct.Struct('<Q')
+RETIRED = 0xFFFFFFFFFFFFFFFF
+NAT = np.iinfo(np.int64).min
+
+TRADE = 'trade'
+MINUTE = 'minute'
+DAILY = 'daily'
+KINDS = (TRADE, MINUTE, DAILY)
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+_NS_PER_MINUTE = 60 * 10 ** 9
+
+
+def bar_kind(frequency):
+    '''Map the data frequency ('1m', 'minute', '1d', 'daily') to a kind'''
+    return DAILY if 'd' in frequency else MINUTE
+
+
+def _now_ns():
+    return int(time.time() * 1e9)
+
+
+def _minute_start_ns(now_ns):
+    return now_ns - now_ns % _NS_PER_MINUTE
+
+
+class _Segment:
+    '''A memory mapped view of a single segment file.'''
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as f:
+            self.mm = mmap.mmap(
+                f.fileno(), 0,
+                access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        _, _, _, capacity, _ = HEADER.unpack_from(self.mm, 0)
+        self.capacity = capacity
+        self.ncols = (len(self.mm) - HEADER.size) // (8 * capacity)
+
+    @property
+    def seq(self):
+        return SEQ.unpack_from(self.mm, 0)[0]
+
+    def read(self, dtypes):
+        '''Copy the segment content, without consistency check.'''
+        _, updated_ns, length, _, tz = HEADER.unpack_from(self.mm, 0)
+        length = min(length, self.capacity)
+        columns = []
+        for i, dtype in enumerate(dtypes):
+            offset = HEADER.size + 8 * self.capacity * i
+            columns.append(np.frombuffer(
+                self.mm, dtype=dtype, count=length, offset=offset).copy())
+        return updated_ns, tz.rstrip(b'\0').decode(), columns
+
+    def write(self, columns, tz, updated_ns):
+        length = len(columns[0])
+        seq = self.seq
+        SEQ.pack_into(self.mm, 0, seq + 1)
+        for i, col in enumerate(columns):
+            offset = HEADER.size + 8 * self.capacity * i
+            self.mm[offset:offset + 8 * length] = col.tobytes()
+        HEADER.pack_into(
+            self.mm, 0, seq + 1, updated_ns, length, self.capacity, tz)
+        SEQ.pack_into(self.mm, 0, seq + 2)
+
+    def retire(self):
+        SEQ.pack_into(self.mm, 0, RETIRED)
+        self.close()
+
+    def close(self):
+        try:
+            self.mm.close()
+        except (BufferError, ValueError):
+            pass
+
+
+class SharedMarketDataCache:
+    '''
+    Reader and writer of the host-local shared market data.
+
+    directory:    path shared by the daemon and the algorithm processes
+    ttl:          seconds after which an unrefreshed subscription expires
+
+    The reads do not wait for the daemon, a symbol it has not published
+    in the current minute yet is a miss, to be fetched from the backend.
+    '''
+
+    def __init__(self, directory, ttl=300.0):
+        self.directory = directory
+        self.ttl = ttl
+
+        self._readers = {}
+        self._writers = {}
+        self._subscribed = {}
+
+        for d in KINDS + ('subscriptions',):
+            os.makedirs(os.path.join(directory, d), exist_ok=True)
+
+    def _path(self, kind, symbol):
+        return os.path.join(self.directory, kind, quote(symbol, safe=''))
+
+    # reader side
+
+    def read_trade(self, symbol):
+        '''
+        Return (price, timestamp) of the last trade published in the
+        current minute, or None if the daemon does not have it.
+        '''
+        return self.read_trades([symbol])[0]
+
+    def read_trades(self, symbols):
+        '''
+        Return the list of read_trade() of the symbols, in one pass.
+        '''
+        now_ns = _now_ns()
+        return [
+            self._trade(self._read(
+                TRADE, symbol, 1, (np.float64, np.int64), now_ns))
+            for symbol in symbols
+        ]
+
+    def _trade(self, found):
+        if found is None:
+            return None
+        tz, (prices, timestamps) = found
+        if len(prices) == 0:
+            return None
+        ts = timestamps[0]
+        if ts == NAT:
+            return prices[0], pd.NaT
+        return prices[0], pd.Timestamp(int(ts), tz='UTC').tz_convert(tz)
+
+    def read_bars(self, symbol, frequency, bar_count):
+        '''
+        Return the DataFrame of the last `bar_count` OHLCV bars published
+        in the current minute, or None if the daemon does not have it.
+        '''
+        found = self._read(
+            bar_kind(frequency), symbol, bar_count,
+            (np.int64,) + (np.float64,) * len(BAR_FIELDS))
+        if found is None:
+            return None
+        tz, columns = found
+        if len(columns[0]) < bar_count:
+            return None
+        index = pd.to_datetime(columns[0][-bar_count:], utc=True)
+        index = index.tz_convert(tz) if tz else index.tz_localize(None)
+        return pd.DataFrame(
+            {f: c[-bar_count:] for f, c in zip(BAR_FIELDS, columns[1:])},
+            index=index,
+            columns=list(BAR_FIELDS),
+        )
+
+    def _read(self, kind, symbol, count, dtypes, now_ns=None):
+        if now_ns is None:
+            now_ns = _now_ns()
+        self._subscribe(kind, symbol, count, now_ns)
+
+        path = self._path(kind, symbol)
+        found = self._read_consistent(path, dtypes)
+        if found is not None and found[0] >= _minute_start_ns(now_ns):
+            return found[1:]
+        # drop the mapping so a restarted daemon's file is re-opened
+        self._close_reader(path)
+        return None
+
+    def _read_consistent(self, path, dtypes, retries=100):
+        for _ in range(retries):
+            seg = self._readers.get(path)
+            if seg is None:
+                try:
+                    seg = self._readers[path] = _Segment(path)
+                except (OSError, ValueError):
+                    return None
+            seq = seg.seq
+            if seq == RETIRED:
+                self._close_reader(path)
+                continue
+            if seq & 1:
+                time.sleep(0)
+                continue
+            updated_ns, tz, columns = seg.read(dtypes[:seg.ncols])
+            if seg.seq == seq:
+                return updated_ns, tz, columns
+        return None
+
+    def _close_reader(self, path):
+        seg = self._readers.pop(path, None)
+        if seg is not None:
+            seg.close()
+
+    def _subscribe(self, kind, symbol, count, now_ns):
+        '''
+        Touch the subscription file at most every ttl/2 seconds, or when
+        more bars are requested.
+        '''
+        key = (kind, symbol)
+        touched_ns, touched_count = self._subscribed.get(key, (0, 0))
+        if (now_ns - touched_ns > self.ttl / 2 * 1e9 or
+                count > touched_count):
+            count = max(count, touched_count)
+            path = os.path.join(
+                self.directory, 'subscriptions', '{}.{}.{}'.format(
+                    kind, quote(symbol, safe=''), os.getpid()))
+            try:
+                with open(path, 'w') as f:
+                    f.write(str(count))
+            except OSError as e:
+                log.warn('could not subscribe {}: {}'.format(symbol, e))
+                return
+            self._subscribed[key] = (now_ns, count)
+
+    # writer side
+
+    def subscriptions(self):
+        '''
+        Return the live subscriptions as dict[kind -> dict[symbol -> count]]
+        and delete the expired ones.
+        '''
+        result = {kind: {} for kind in KINDS}
+        subdir = os.path.join(self.directory, 'subscriptions')
+        expire = time.time() - self.ttl
+        for name in os.listdir(subdir):
+            path = os.path.join(subdir, name)
+            try:
+                kind, symbol = name.split('.', 1)
+                symbol, _ = symbol.rsplit('.', 1)
+                if os.stat(path).st_mtime < expire:
+                    os.unlink(path)
+                    continue
+                with open(path) as f:
+                    count = int(f.read() or 0)
+            except (OSError, ValueError):
+                continue
+            if kind not in result:
+                continue
+            symbol = unquote(symbol)
+            result[kind][symbol] = max(result[kind].get(symbol, 0), count)
+        return result
+
+    def write_trade(self, symbol, price, timestamp):
+        if timestamp is None or pd.isnull(timestamp):
+            ts, tz = NAT, ''
+        else:
+            timestamp = pd.Timestamp(timestamp)
+            ts = timestamp.value
+            tz = str(timestamp.tz) if timestamp.tz is not None else 'UTC'
+        self._publish(TRADE, symbol, [
+            np.array([price], dtype=np.float64),
+            np.array([ts], dtype=np.int64),
+        ], tz)
+
+    def write_bars(self, symbol, frequency, df):
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else ''
+        columns = [np.asarray(index.asi8, dtype=np.int64)]
+        for field in BAR_FIELDS:
+            columns.append(np.asarray(df[field].values, dtype=np.float64))
+        self._publish(bar_kind(frequency), symbol, columns, tz)
+
+    def _publish(self, kind, symbol, columns, tz):
+        path = self._path(kind, symbol)
+        tz = tz.encode()[:32]
+        now_ns = _now_ns()
+        length = len(columns[0])
+
+        seg = self._writers.get(path)
+        if seg is None and os.path.exists(path):
+            try:
+                seg = self._writers[path] = _Segment(path, writable=True)
+            except (OSError, ValueError):
+                seg = None
+        if (seg is not None and seg.capacity >= length and
+                seg.ncols == len(columns) and seg.seq != RETIRED):
+            seg.write(columns, tz, now_ns)
+            return
+
+        # grow into a new file and swap it in atomically
+        capacity = 1
+        while capacity < length:
+            capacity *= 2
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(0, now_ns, length, capacity, tz))
+            for col in columns:
+                f.write(col.tobytes())
+                f.write(b'\0' * (8 * (capacity - length)))
+        os.replace(tmp, path)
+        if seg is not None:
+            seg.retire()
+        self._writers[path] = _Segment(path, writable=True)
+
+    def close(self):
+        for segs in (self._readers, self._writers):
+            for seg in segs.values():
+                seg.close()
+            segs.clear()
+
+
+class DataDaemon:
+    '''
+    Fetch the subscribed symbols through the backend once a minute and
+    publish them into the shared cache.
+
+    backend:  Backend instance
+    cache:    SharedMarketDataCache
+    delay:    seconds after the minute boundary to start fetching
+    '''
+
+    def __init__(self, backend, cache, delay=0.0):
+        # avoid import cycle through pylivetrader.api
+        from pylivetrader.assets import AssetFinder
+
+        self.backend = backend
+        self.cache = cache
+        self.delay = delay
+        self.asset_finder = AssetFinder(backend)
+
+    def _lookup(self, symbols):
+        assets = []
+        for symbol in symbols:
+            try:
+                assets.append(self.asset_finder.lookup_symbol(symbol))
+            except SymbolNotFound:
+                log.warn('unknown symbol {} is subscribed'.format(symbol))
+        return assets
+
+    def _last_trades(self, assets):
+        if hasattr(self.backend, 'get_last_trades'):
+            trades = self.backend.get_last_trades(assets)
+            return {
+                asset: (np.nan, pd.NaT) if trade is None
+                else (trade.price, trade.timestamp)
+                for asset, trade in trades.items()
+            }
+        prices = self.backend.get_spot_value(
+            assets, 'price', None, 'minute')
+        dts = self.backend.get_spot_value(
+            assets, 'last_traded', None, 'minute')
+        if isinstance(prices, pd.Series):
+            prices = [prices[asset] for asset in assets]
+            dts = [dts[asset] for asset in assets]
+        return {
+            asset: (price, dt)
+            for asset, price, dt in zip(assets, prices, dts)
+        }
+
+    def run_once(self):
+        subscriptions = self.cache.subscriptions()
+
+        assets = self._lookup(sorted(subscriptions[TRADE]))
+        if len(assets) > 0:
+            for asset, (price, dt) in self._last_trades(assets).items():
+                self.cache.write_trade(asset.symbol, price, dt)
+
+        for kind in (MINUTE, DAILY):
+            counts = subscriptions[kind]
+            assets = self._lookup(sorted(counts))
+            if len(assets) == 0:
+                continue
+            bar_count = max(counts[asset.symbol] for asset in assets)
+            bars = self.backend.get_bars(assets, kind, bar_count=bar_count)
+            fetched = set(bars.columns.get_level_values(0))
+            for asset in assets:
+                if asset in fetched:
+                    self.cache.write_bars(asset.symbol, kind, bars[asset])
+
+        return subscriptions
+
+    def run(self, stop_event=None):
+        log.info('publishing market data to {}'.format(self.cache.directory))
+        while stop_event is None or not stop_event.is_set():
+            started = time.time()
+            try:
+                subscriptions = self.run_once()
+                log.debug('published {} in {:.3f}s'.format(
+                    {k: len(v) for k, v in subscriptions.items()},
+                    time.time() - started))
+            except Exception as e:
+                log.error('failed to publish market data: {}'.format(e))
+
+            wakeup = started - started % 60 + 60 + self.delay
+            timeout = max(wakeup - time.time(), 0)
+            if stop_event is None:
+                time.sleep(timeout)
+            else:
+                stop_event.wait(timeout)
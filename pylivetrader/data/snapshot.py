@@ -0,0 +1,128 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import threading
+
+
+class BarSnapshot:
+    '''
+    Consistent view of the data for one bar.
+
+    Spot values, the portfolio and the account are fetched lazily and at
+    most once in the bar, so the order sizing, the trading controls and
+    the user code all see the same values.
+
+    param: dt: the bar minute
+    param: fetch_spot_value: function(assets, field, dt, data_frequency)
+        which fetches a scalar for an asset, or a list for a list of assets
+    param: fetch_portfolio: function() returning the portfolio
+    param: fetch_account: function() returning the account
+    '''
+
+    def __init__(self, dt, fetch_spot_value,
+                 fetch_portfolio=None, fetch_account=None):
+        self.dt = dt
+        self._fetch_spot_value = fetch_spot_value
+        self._fetch_portfolio = fetch_portfolio
+        self._fetch_account = fetch_account
+        self._values = {}
+        # {(field, data_frequency): assets} read for the bar minute,
+        # apart from the prefetched values
+        self._requested = {}
+        self._lock = threading.Lock()
+
+    def get_spot_value(self, assets, field, dt, data_frequency):
+        if dt == self.dt:
+            if isinstance(assets, (list, set, tuple)):
+                assets = list(assets)
+                new = assets
+            else:
+                new = [assets]
+            with self._lock:
+                self._requested.setdefault(
+                    (field, data_frequency), set()).update(new)
+        return self._get_spot_value(assets, field, dt, data_frequency)
+
+    def _get_spot_value(self, assets, field, dt, data_frequency):
+        values = self._values
+        if not isinstance(assets, (list, set, tuple)):
+            key = (assets, field, dt, data_frequency)
+            try:
+                return values[key]
+            except KeyError:
+                pass
+            value = self._fetch_spot_value(assets, field, dt, data_frequency)
+            with self._lock:
+                return values.setdefault(key, value)
+
+        assets = list(assets)
+        keys = [(asset, field, dt, data_frequency) for asset in assets]
+        missing = [
+            asset for asset, key in zip(assets, keys) if key not in values
+        ]
+        if missing:
+            # one round trip for all the assets not seen in this bar
+            fetched = self._fetch_spot_value(
+                missing, field, dt, data_frequency)
+            with self._lock:
+                for asset, value in zip(missing, fetched):
+                    values.setdefault(
+                        (asset, field, dt, data_frequency), value)
+        return [values[key] for key in keys]
+
+    def requests(self):
+        '''
+        Return {(field, data_frequency): set of assets} read for the
+        bar minute so far, to be prefetched in the next bar. The values
+        prefetched and not read are left out.
+        '''
+        with self._lock:
+            return {
+                key: set(assets) for key, assets in self._requested.items()
+            }
+
+    def prefetch(self, requests):
+        '''
+        Fetch the values for the `requests()` of another snapshot in one
+        round trip per field.
+        '''
+        for (field, data_frequency), assets in requests.items():
+            self._get_spot_value(
+                list(assets), field, self.dt, data_frequency)
+
+    def with_account(self, fetch_portfolio, fetch_account):
+        '''
+        Return a snapshot sharing the spot values of this one, with the
+        portfolio and the account of another algorithm.
+        '''
+        snapshot = copy.copy(self)
+        snapshot._fetch_portfolio = fetch_portfolio
+        snapshot._fetch_account = fetch_account
+        snapshot.__dict__.pop('_portfolio', None)
+        snapshot.__dict__.pop('_account', None)
+        return snapshot
+
+    @property
+    def portfolio(self):
+        if not hasattr(self, '_portfolio'):
+            self._portfolio = self._fetch_portfolio()
+        return self._portfolio
+
+    @property
+    def account(self):
+        if not hasattr(self, '_account'):
+            self._account = self._fetch_account()
+        return self._account
@@ -0,0 +1,398 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+On-disk store of the bars fetched from the backend.
+
+`DataPortal` reads the history through the warehouse, which keeps the
+bars that can no longer change and asks the backend only for the bars
+after the last one it has, so that a restarted algorithm does not fetch
+a year of daily bars and the morning's minutes of its whole universe
+again. The directory can be shared by the algorithms of the host.
+
+The bars are partitioned by frequency and date, a session per minute
+partition and a year per daily one, with a file per symbol:
+
+    <directory>/minute/2018-11-23/AAPL.npy
+    <directory>/daily/2018/AAPL.npy
+
+Each file is a (6, n) int64 array, the UTC nanoseconds of the bars
+followed by the open, high, low, close and volume columns as float64,
+which is memory-mapped on read. The new bars are written to disk every
+`flush_interval` from a background thread, and the partitions older
+than the retention of their frequency are removed.
+'''
+
+import atexit
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from logbook import Logger
+
+log = Logger('BarWarehouse')
+
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+DEFAULT_RETENTION = {
+    'minute': pd.Timedelta(days=30),
+    'daily': pd.Timedelta(days=366 * 3),
+}
+
+# minute bars this close to the current one may still change
+MINUTE_SEAL = pd.Timedelta(minutes=1)
+
+
+def _frequency(frequency):
+    return 'daily' if 'd' in frequency else 'minute'
+
+
+class BarWarehouse:
+    '''
+    param: directory: where to keep the bars
+    param: calendar: trading calendar to count the bars to fetch
+    param: retention: dict of the frequency to the pd.Timedelta of
+        history to keep
+    param: flush_interval: seconds between the writes to disk
+    param: tz: time zone of the bar index returned by the backend
+    '''
+
+    def __init__(self, directory, calendar, retention=None,
+                 flush_interval=900, tz='America/New_York'):
+        self.directory = directory
+        self.calendar = calendar
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.flush_interval = flush_interval
+        self.tz = tz
+
+        # (frequency, symbol) -> DataFrame of the sealed bars
+        self._frames = {}
+        # (frequency, symbol) -> partitions changed since the last flush
+        self._pending = {}
+        # (frequency, symbol) -> number of bars last looked for on disk
+        self._looked_up = {}
+        self._last_flush = time.time()
+        # end_dt of the last bars served, the retention is relative to it
+        self._end_dt = None
+        self._last_evict = None
+        self._lock = threading.RLock()
+        # one flush at a time, the background one or at exit
+        self._flush_lock = threading.Lock()
+        self._executor = None
+        self._flushing = None
+        atexit.register(self.flush)
+
+    # files
+
+    def _partition(self, frequency, ts):
+        '''The partition of a timestamp or of each of a DatetimeIndex.'''
+        return ts.tz_convert(self.tz).strftime(
+            '%Y' if frequency == 'daily' else '%Y-%m-%d')
+
+    def _path(self, frequency, partition, symbol):
+        return os.path.join(
+            self.directory, frequency, partition,
+            quote(symbol, safe='') + '.npy')
+
+    def _partitions(self, frequency):
+        try:
+            return sorted(os.listdir(os.path.join(self.directory, frequency)))
+        except FileNotFoundError:
+            return []
+
+    def _read_file(self, path):
+        try:
+            data = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if data.dtype != np.int64 or data.ndim != 2 or \
+                data.shape[0] != 1 + len(BAR_FIELDS):
+            log.warn('ignoring malformed bar file {}'.format(path))
+            return None
+        return self._to_frame(data)
+
+    def _to_frame(self, data):
+        index = pd.DatetimeIndex(data[0], tz='UTC').tz_convert(self.tz)
+        values = data[1:].view(np.float64)
+        return pd.DataFrame(
+            {f: values[i] for i, f in enumerate(BAR_FIELDS)},
+            index=index,
+            columns=list(BAR_FIELDS),
+        )
+
+    def _write_file(self, path, df):
+        data = np.empty((1 + len(BAR_FIELDS), len(df)), dtype=np.int64)
+        data[0] = df.index.tz_convert('UTC').asi8
+        data[1:].view(np.float64)[:] = df[list(BAR_FIELDS)].values.T
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, path)
+
+    def _load(self, frequency, symbol, bar_count):
+        '''The last bar_count or more bars of the symbol on disk.'''
+        frames = []
+        rows = 0
+        for partition in reversed(self._partitions(frequency)):
+            df = self._read_file(self._path(frequency, partition, symbol))
+            if df is None:
+                if frames:
+                    # the history on disk has a hole
+                    break
+                continue
+            frames.append(df)
+            rows += len(df)
+            if rows >= bar_count:
+                break
+        if not frames:
+            return None
+        return pd.concat(frames[::-1])
+
+    # bars
+
+    def read(self, symbol, frequency, bar_count):
+        '''
+        Return the sealed bars kept for the symbol, at least `bar_count`
+        of them if there are, or None.
+        '''
+        frequency = _frequency(frequency)
+        key = (frequency, symbol)
+        with self._lock:
+            df = self._frames.get(key)
+            if (df is None or len(df) < bar_count) and \
+                    self._looked_up.get(key, 0) < bar_count:
+                self._looked_up[key] = bar_count
+                loaded = self._load(frequency, symbol, bar_count)
+                if loaded is not None:
+                    if df is not None:
+                        loaded = _merge(loaded, df)
+                    df = self._frames[key] = loaded
+        return df
+
+    def write(self, symbol, frequency, df, end_dt):
+        '''
+        Keep the bars of df which can no longer change at end_dt.
+        '''
+        frequency = _frequency(frequency)
+        df = df[df.index < self._seal_limit(frequency, end_dt)]
+        if len(df) == 0:
+            return
+
+        key = (frequency, symbol)
+        with self._lock:
+            stored = self._frames.get(key)
+            if stored is not None and len(stored) > 0:
+                df = df[df.index > stored.index[-1]]
+                if len(df) == 0:
+                    return
+                merged = _merge(stored, df)
+            else:
+                merged = df[list(BAR_FIELDS)]
+            self._frames[key] = merged
+            self._pending.setdefault(key, set()).update(
+                self._partition(frequency, df.index))
+
+    def _seal_limit(self, frequency, end_dt):
+        end_dt = pd.Timestamp(end_dt)
+        if frequency == 'daily':
+            # the bars of the sessions before the current one
+            return end_dt.tz_convert('UTC').normalize()
+        return end_dt - MINUTE_SEAL
+
+    def _tail_count(self, frequency, last, end_dt):
+        '''
+        The number of bars from the last one kept to end_dt, both
+        included.
+        '''
+        cal = self.calendar
+        end_dt = pd.Timestamp(end_dt)
+        if frequency == 'daily':
+            return len(cal.sessions_in_range(
+                last.tz_convert('UTC').normalize(),
+                end_dt.tz_convert('UTC').normalize()))
+        return len(cal.minutes_in_range(last, end_dt))
+
+    def get_bars(self, backend, assets, frequency, bar_count, end_dt):
+        '''
+        Return the bars like backend.get_bars(), fetching from the
+        backend only the bars after the last ones kept for each asset.
+        '''
+        freq = _frequency(frequency)
+        end_dt = pd.Timestamp.utcnow() if end_dt is None \
+            else pd.Timestamp(end_dt)
+        if end_dt.tzinfo is None:
+            end_dt = end_dt.tz_localize('UTC')
+        self._end_dt = end_dt
+        stored = {}
+        tails = {}
+        full = []
+        for asset in assets:
+            df = self.read(asset.symbol, freq, bar_count)
+            if df is None or len(df) == 0:
+                full.append(asset)
+                continue
+            # one bar more in case the last one is not in the calendar
+            tail = self._tail_count(freq, df.index[-1], end_dt) + 1
+            if len(df) + tail < bar_count + 1:
+                full.append(asset)
+                continue
+            stored[asset] = df
+            tails[asset] = tail
+
+        fetched = {}
+        if tails:
+            tail_assets = list(tails)
+            bars = backend.get_bars(
+                tail_assets, frequency, bar_count=max(tails.values()))
+            found = set(bars.columns.get_level_values(0))
+            for asset in tail_assets:
+                df = self._bars_of(bars, asset, found)
+                if df is not None and len(df) > 0 and \
+                        df.index[0] > stored[asset].index[-1]:
+                    # does not reach the bars kept
+                    full.append(asset)
+                else:
+                    fetched[asset] = df
+        if full:
+            bars = backend.get_bars(full, frequency, bar_count=bar_count)
+            found = set(bars.columns.get_level_values(0))
+            for asset in full:
+                fetched[asset] = self._bars_of(bars, asset, found)
+
+        dfs = []
+        for asset in assets:
+            df = fetched.get(asset)
+            if df is not None and len(df) > 0:
+                self.write(asset.symbol, freq, df, end_dt)
+            kept = stored.get(asset)
+            if kept is not None:
+                if df is None or len(df) == 0:
+                    df = kept
+                else:
+                    df = _merge(kept[kept.index < df.index[0]], df)
+            if df is None:
+                continue
+            df = df.iloc[-bar_count:].copy()
+            df.columns = pd.MultiIndex.from_product([[asset, ], df.columns])
+            dfs.append(df)
+
+        self._trim(bar_count)
+        if time.time() - self._last_flush >= self.flush_interval:
+            self._flush_in_background()
+        if not dfs:
+            return pd.DataFrame([], columns=pd.MultiIndex.from_product(
+                [[], BAR_FIELDS]))
+        return pd.concat(dfs, axis=1)
+
+    def _bars_of(self, bars, asset, found):
+        '''
+        The bars of the asset in the frame of the backend, without the
+        rows of the minutes only the other assets traded in.
+        '''
+        if asset not in found:
+            return None
+        return self._localize(bars[asset]).dropna(how='all')
+
+    def _localize(self, df):
+        df = df.copy()
+        if len(df) > 0:
+            if df.index.tz is None:
+                df.index = df.index.tz_localize('UTC')
+            df.index = df.index.tz_convert(self.tz)
+        return df
+
+    def _trim(self, bar_count):
+        # keep what the algorithm asks for in memory, the rest is on disk
+        with self._lock:
+            for key, df in self._frames.items():
+                if len(df) > 2 * bar_count and key not in self._pending:
+                    self._frames[key] = df.iloc[-bar_count:]
+
+    # disk
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._last_flush = time.time()
+            if self._flushing is not None and not self._flushing.done():
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._flushing = self._executor.submit(self._flush_logged)
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            log.exception('failed to flush the bars')
+
+    def flush(self):
+        '''Write the new bars to disk and apply the retention.'''
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            frames = {key: self._frames[key] for key in pending}
+            self._last_flush = time.time()
+
+        for (frequency, symbol), partitions in pending.items():
+            df = frames[(frequency, symbol)]
+            labels = self._partition(frequency, df.index)
+            for partition in partitions:
+                part = df[labels == partition]
+                path = self._path(frequency, partition, symbol)
+                on_disk = self._read_file(path) \
+                    if os.path.exists(path) else None
+                if on_disk is not None:
+                    part = _merge(on_disk, part)
+                try:
+                    self._write_file(path, part)
+                except OSError as e:
+                    log.warn('failed to write {}: {}'.format(path, e))
+
+        if self._end_dt is None:
+            return
+        today = self._end_dt.tz_convert('UTC').normalize()
+        if self._last_evict != today:
+            self._last_evict = today
+            self.evict(today)
+
+    def evict(self, now=None):
+        '''Remove the partitions older than the retention.'''
+        now = pd.Timestamp.utcnow() if now is None else pd.Timestamp(now)
+        for frequency, retention in self.retention.items():
+            if retention is None:
+                continue
+            oldest = self._partition(frequency, now - retention)
+            for partition in self._partitions(frequency):
+                if partition < oldest:
+                    shutil.rmtree(
+                        os.path.join(self.directory, frequency, partition),
+                        ignore_errors=True)
+
+
+def _merge(old, new):
+    '''old followed by the bars of new, new winning on the same index.'''
+    df = pd.concat([old[~old.index.isin(new.index)], new[list(BAR_FIELDS)]])
+    return df.sort_index()
@@ -151,3 +151,12 @@ class OrderInBeforeTradingStart(LiveTraderError):
     Raised when an algorithm calls an order method in before_trading_start.
     """
     msg = "Cannot place orders inside before_trading_start."
+
+
+class CircuitBreakerOpen(LiveTraderError):
+    """
+    Raised instead of calling a backend endpoint which has been failing,
+    until it recovers.
+    """
+    msg = ("{endpoint} calls are failing, not calling it for "
+           "{retry_in:.0f} more seconds")
@@ -19,18 +19,46 @@ from contextlib import ExitStack
 
 from pylivetrader.executor.realtimeclock import (
     RealtimeClock,
-    BAR, SESSION_START, BEFORE_TRADING_START_BAR
+    BAR, SESSION_START, BEFORE_TRADING_START_BAR, EVENT_NAMES,
 )
 from pylivetrader.data.bardata import BarData
+from pylivetrader.data.snapshot import BarSnapshot
 from pylivetrader.misc.api_context import LiveTraderAPI
+from pylivetrader.errors import CircuitBreakerOpen
+
+from logbook import Logger
+
+log = Logger('Executor')
+
+
+def new_clock(algo, backend):
+    '''
+    Return the RealtimeClock of `algo`, following the time and the health
+    of the broker of `backend`.
+    '''
+    before_trading_start_minute = \
+        (datetime.time(8, 45), 'America/New_York')
+
+    return RealtimeClock(
+        algo.trading_calendar,
+        before_trading_start_minute,
+        minute_emission=algo.data_frequency == 'minute',
+        time_skew=backend.time_skew,
+        is_broker_alive=getattr(backend, 'is_alive', None),
+        daily_bar_offset=(
+            algo.daily_bar_offset
+            if algo.data_frequency == 'daily' else None),
+    )
 
 
 class AlgorithmExecutor:
 
-    def __init__(self, algo, data_portal):
+    def __init__(self, algo, data_portal, clock=None, profiler=None):
 
         self.data_portal = data_portal
         self.algo = algo
+        # SamplingProfiler attributing its samples to the current event
+        self.profiler = profiler
 
         # This object is the way that user algorithms interact with OHLCV data,
         # fetcher data, and some API methods like `data.can_trade`.
@@ -39,44 +67,82 @@ class AlgorithmExecutor:
             self.algo.data_frequency,
         )
 
-        before_trading_start_minute = \
-            (datetime.time(8, 45), 'America/New_York')
-
-        self.clock = RealtimeClock(
-            self.algo.trading_calendar,
-            before_trading_start_minute,
-            minute_emission=algo.data_frequency == 'minute',
-            time_skew=self.algo._backend.time_skew,
+        if clock is None:
+            clock = new_clock(algo, algo._backend)
+        self.clock = clock
+
+    def new_snapshot(self, dt):
+        '''
+        Start a bar: clear the data portal cache and return the snapshot
+        the bar reads prices, positions and account through.
+        '''
+        self.data_portal.cache_clear()
+        return self.bind_snapshot(
+            BarSnapshot(dt, self.data_portal.fetch_spot_value))
+
+    def bind_snapshot(self, snapshot):
+        '''
+        Return a snapshot sharing the spot values of `snapshot`, with
+        the positions and account of this algorithm.
+        '''
+        backend = self.algo._backend
+        return snapshot.with_account(
+            lambda: backend.portfolio,
+            lambda: backend.account,
         )
 
-    def run(self):
+    def start_session(self, midnight_dt):
+        # precompute the session for the calendar queries of the day
+        set_session = getattr(
+            self.data_portal.trading_calendar, 'set_session', None)
+        if set_session is not None:
+            set_session(midnight_dt)
 
+    def every_bar(self, dt_to_use, snapshot):
         algo = self.algo
 
-        def every_bar(dt_to_use, current_data=self.current_data,
-                      handle_data=algo.event_manager.handle_data):
+        # called every tick (minute or day).
+        algo.on_dt_changed(dt_to_use)
+
+        self.current_data.datetime = dt_to_use
 
-            # clear data portal cache.
-            self.data_portal.cache_clear()
+        # prices, positions and account are fetched at most once
+        # in the bar and read consistently by everything in it
+        algo.set_snapshot(snapshot)
+        try:
+            algo.event_manager.handle_data(
+                algo, self.current_data, dt_to_use)
+        finally:
+            algo.set_snapshot(None)
 
-            # called every tick (minute or day).
-            algo.on_dt_changed(dt_to_use)
+        algo._portfolio_needs_update = True
+        algo._account_needs_update = True
 
-            self.current_data.datetime = dt_to_use
+    def once_a_day(self, midnight_dt):
+        algo = self.algo
 
-            handle_data(algo, current_data, dt_to_use)
+        # set all the timestamps
+        algo.on_dt_changed(midnight_dt)
+        self.current_data.datetime = midnight_dt
 
-            algo.portfolio_needs_update = True
-            algo.account_needs_update = True
+        # kick off the pipelines ahead of before_trading_start
+        algo.start_pipelines()
 
-        def once_a_day(midnight_dt, current_data=self.current_data,
-                       data_portal=self.data_portal):
+    def before_trading_start(self, dt):
+        self.algo.on_dt_changed(dt)
+        self.current_data.datetime = dt
+        self.algo.before_trading_start(self.current_data)
 
-            # set all the timestamps
-            algo.on_dt_changed(midnight_dt)
-            self.current_data.datetime = midnight_dt
+    def _section(self, dt, phase):
+        if self.profiler is None:
+            return ExitStack()
+        return self.profiler.section(dt, phase)
+
+    def run(self):
 
         def on_exit():
+            # write the values recorded since the last flush
+            self.algo._recorder.close()
             # Remove references to algo, data portal, et al to break cycles
             # and ensure deterministic cleanup of these objects when the
             # simulation finishes.
@@ -86,14 +152,25 @@ class AlgorithmExecutor:
         with ExitStack() as stack:
             stack.callback(on_exit)
             stack.enter_context(LiveTraderAPI(self.algo))
+            if self.profiler is not None:
+                stack.enter_context(self.profiler)
 
             # runs forever
             for dt, action in self.clock:
-                if action == BAR:
-                    every_bar(dt)
-                elif action == SESSION_START:
-                    once_a_day(dt)
-                elif action == BEFORE_TRADING_START_BAR:
-                    algo.on_dt_changed(dt)
-                    self.current_data.datetime = dt
-                    algo.before_trading_start(self.current_data)
+                try:
+                    if action == BAR:
+                        with self._section(dt, 'bar'):
+                            self.every_bar(dt, self.new_snapshot(dt))
+                    elif action == SESSION_START:
+                        if self.profiler is not None:
+                            self.profiler.start_session(dt)
+                        with self._section(dt, 'session_start'):
+                            self.start_session(dt)
+                            self.once_a_day(dt)
+                    elif action == BEFORE_TRADING_START_BAR:
+                        with self._section(dt, 'before_trading_start'):
+                            self.before_trading_start(dt)
+                except CircuitBreakerOpen as e:
+                    # the next event may find the broker back
+                    log.warn('{} at {} failed: {}'.format(
+                        EVENT_NAMES[action], dt, e))
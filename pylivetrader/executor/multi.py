@@ -0,0 +1,170 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pylivetrader.data.snapshot import BarSnapshot
+from pylivetrader.executor.executor import AlgorithmExecutor, new_clock
+from pylivetrader.executor.realtimeclock import (
+    BAR, SESSION_START, BEFORE_TRADING_START_BAR, EVENT_NAMES,
+)
+from pylivetrader.errors import CircuitBreakerOpen
+from pylivetrader.misc.api_context import LiveTraderAPI
+
+from logbook import Logger
+
+log = Logger('MultiAlgorithmExecutor')
+
+
+def _account(backend):
+    '''
+    What tells apart the broker accounts the backends trade on: the
+    identity of the backend, or the backend itself if it has none.
+    '''
+    identity = getattr(backend, 'identity', None)
+    identity = identity() if identity is not None else ''
+    if identity == '':
+        return id(backend)
+    return (type(backend), identity)
+
+
+class MultiAlgorithmExecutor:
+    '''
+    Run several algorithms in one process on one clock.
+
+    The algorithms share the data portal, with its backend for the
+    market data, the asset finder and the calendar, and keep their own
+    trading backend, context, state file and scheduled functions. Every
+    bar the prices all of them read in the previous bar are fetched in
+    one call per field, then the algorithms are run one after the other
+    against the same prices, each with its own positions and account.
+
+    As the positions and the orders of an account are those of all the
+    algorithms trading on it, each algorithm must trade on its own
+    account.
+
+    An exception raised by one algorithm is logged and does not stop
+    the others.
+
+    param: algos: list of Algorithm built on the same data portal
+    param: data_portal: the shared DataPortal
+    '''
+
+    def __init__(self, algos, data_portal):
+        if not algos:
+            raise ValueError('no algorithm to run')
+        frequencies = {algo.data_frequency for algo in algos}
+        if len(frequencies) > 1:
+            raise ValueError(
+                'algorithms must share the data frequency, got {}'.format(
+                    sorted(frequencies)))
+        for algo in algos:
+            if algo.data_portal is not data_portal:
+                raise ValueError(
+                    '{} does not use the shared data portal'.format(
+                        algo._algoname))
+
+        accounts = {}
+        for algo in algos:
+            other = accounts.setdefault(_account(algo._backend), algo)
+            if other is not algo:
+                raise ValueError(
+                    '{} and {} trade on the same account'.format(
+                        other._algoname, algo._algoname))
+
+        self.algos = algos
+        self.data_portal = data_portal
+        self.clock = new_clock(algos[0], data_portal.backend)
+        self.executors = [
+            AlgorithmExecutor(algo, data_portal, clock=self.clock)
+            for algo in algos
+        ]
+        # {(field, data_frequency): assets} read in the previous bar
+        self._requests = {}
+
+    def initialize(self):
+        finder = self.data_portal.asset_finder
+        assets = finder.retrieve_all(finder.sids)
+        for executor in self.executors:
+            algo = executor.algo
+            # for compatibility with zipline to provide history api
+            algo._assets_from_source = assets
+            algo.executor = executor
+            if not algo.initialized:
+                algo.initialize()
+
+    def _dispatch(self, executor, f, *args):
+        with LiveTraderAPI(executor.algo):
+            try:
+                f(*args)
+            except CircuitBreakerOpen as e:
+                log.warn('{} failed at {}: {}'.format(
+                    executor.algo._algoname, args[0], e))
+            except Exception:
+                log.exception('{} failed at {}'.format(
+                    executor.algo._algoname, args[0]))
+
+    def _prefetch(self, snapshot):
+        try:
+            snapshot.prefetch(self._requests)
+        except Exception as e:
+            # each algorithm fetches what it needs by itself then
+            log.warn('failed to prefetch the bar data: {}'.format(e))
+
+    def every_bar(self, dt):
+        self.data_portal.cache_clear()
+        snapshot = BarSnapshot(dt, self.data_portal.fetch_spot_value)
+        self._prefetch(snapshot)
+        for executor in self.executors:
+            self._dispatch(executor, executor.every_bar, dt,
+                           executor.bind_snapshot(snapshot))
+        self._requests = snapshot.requests()
+
+    def once_a_day(self, midnight_dt):
+        self.executors[0].start_session(midnight_dt)
+        for executor in self.executors:
+            self._dispatch(executor, executor.once_a_day, midnight_dt)
+
+    def before_trading_start(self, dt):
+        for executor in self.executors:
+            self._dispatch(executor, executor.before_trading_start, dt)
+
+    def run(self):
+        log.info('livetrader start running {} algorithms: {}'.format(
+            len(self.algos),
+            ', '.join(algo._algoname for algo in self.algos)))
+
+        self.initialize()
+
+        try:
+            # runs forever
+            for dt, action in self.clock:
+                try:
+                    if action == BAR:
+                        self.every_bar(dt)
+                    elif action == SESSION_START:
+                        self.once_a_day(dt)
+                    elif action == BEFORE_TRADING_START_BAR:
+                        self.before_trading_start(dt)
+                except CircuitBreakerOpen as e:
+                    # the next event may find the broker back
+                    log.warn('{} at {} failed: {}'.format(
+                        EVENT_NAMES[action], dt, e))
+        finally:
+            # write the values recorded since the last flush
+            for algo in self.algos:
+                try:
+                    algo._recorder.close()
+                except Exception:
+                    log.exception('failed to close the recorder of '
+                                  '{}'.format(algo._algoname))
@@ -25,6 +25,14 @@ SESSION_END = 2
 MINUTE_END = 3
 BEFORE_TRADING_START_BAR = 4
 
+EVENT_NAMES = {
+    BAR: 'bar',
+    SESSION_START: 'session start',
+    SESSION_END: 'session end',
+    MINUTE_END: 'minute end',
+    BEFORE_TRADING_START_BAR: 'before trading start',
+}
+
 
 log = Logger('Realtime Clock')
 
@@ -41,6 +49,13 @@ class RealtimeClock(object):
 
     The :param:`time_skew` parameter represents the time difference between
     the Broker and the live trading machine's clock.
+
+    While :param:`is_broker_alive` returns False, the bars are skipped and
+the ``BEFORE_TRADING_START_BAR`` is held back.
+
+    If :param:`daily_bar_offset` is given, a single ``BAR`` is emitted per
+    session, ``daily_bar_offset`` before the close, instead of one every
+    minute of the session.
     """
 
     def __init__(self,
@@ -48,14 +63,27 @@ class RealtimeClock(object):
                  before_trading_start_minute,
                  minute_emission,
                  time_skew=pd.Timedelta("0s"),
-                 is_broker_alive=None):
+                 is_broker_alive=None,
+                 daily_bar_offset=None):
         self.calendar = calendar
         self.before_trading_start_minute = before_trading_start_minute
         self.minute_emission = minute_emission
+        self.daily_bar_offset = daily_bar_offset
         self.time_skew = time_skew
         self.is_broker_alive = is_broker_alive or (lambda: True)
         self._last_emit = None
         self._before_trading_start_bar_yielded = False
+        self._daily_bar_yielded = False
+        self._last_skip = None
+
+    def _broker_alive(self, dt):
+        if self.is_broker_alive():
+            return True
+        if self._last_skip != dt:
+            self._last_skip = dt
+            log.warn('skipping the events at {}, the broker is not '
+                     'available'.format(dt))
+        return False
 
     def __iter__(self):
 
@@ -75,6 +103,7 @@ class RealtimeClock(object):
                 yield session_label, SESSION_START
                 current_session = session_label
                 self._before_trading_start_bar_yielded = False
+                self._daily_bar_yielded = False
 
             delta = pd.Timedelta(
                 hours=self.before_trading_start_minute[0].hour,
@@ -91,28 +120,46 @@ class RealtimeClock(object):
             session_close = self.calendar.session_close(current_session)
 
             if (server_time >= before_trading_start and
-                    not self._before_trading_start_bar_yielded):
+                    not self._before_trading_start_bar_yielded and
+                    self._broker_alive(server_time)):
                 self._last_emit = server_time
                 self._before_trading_start_bar_yielded = True
                 yield server_time, BEFORE_TRADING_START_BAR
             elif server_time < session_open:
                 sleep(1)
+            elif (session_open <= server_time < session_close and
+                    self.daily_bar_offset is not None):
+                if (not self._daily_bar_yielded and
+                        server_time >=
+                        session_close - self.daily_bar_offset and
+                        self._broker_alive(server_time)):
+                    self._last_emit = server_time
+                    self._daily_bar_yielded = True
+                    yield server_time, BAR
+                else:
+                    sleep(1)
             elif (session_open <= server_time < session_close):
-                if (self._last_emit is None or
+                if ((self._last_emit is None or
                         server_time - self._last_emit >=
-                        pd.Timedelta('1 minute')):
+                        pd.Timedelta('1 minute')) and
+                        self._broker_alive(server_time)):
                     self._last_emit = server_time
                     yield server_time, BAR
                     if self.minute_emission:
                         yield server_time, MINUTE_END
                 else:
                     sleep(1)
-            elif server_time == session_close:
+            elif (server_time == session_close and
+                    self._last_emit != server_time):
                 self._last_emit = server_time
-                yield server_time, BAR
-                if self.minute_emission:
-                    yield server_time, MINUTE_END
+                if (not self._daily_bar_yielded and
+                        self._broker_alive(server_time)):
+                    yield server_time, BAR
+                    if self.minute_emission:
+                        yield server_time, MINUTE_END
                 yield server_time, SESSION_END
+            elif server_time == session_close:
+                sleep(1)
             elif server_time > session_close:
                 sleep(1)
             else:
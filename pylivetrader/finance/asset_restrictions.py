@@ -14,8 +14,9 @@
 # limitations under the License.
 
 import abc
+import numpy as np
 from numpy import vectorize
-from functools import partial, reduce
+from functools import reduce
 import operator
 import pandas as pd
 from six import with_metaclass, iteritems
@@ -187,6 +188,27 @@ class HistoricalRestrictions(Restrictions):
             in iteritems(groupby(lambda x: x.asset, restrictions))
         }
 
+        # Compiled index: for each asset, the sorted effective dates in
+        # nanoseconds and whether the asset is frozen from each of them.
+        self._assets = list(self._restrictions_by_asset)
+        self._asset_index = {
+            asset: i for i, asset in enumerate(self._assets)
+        }
+        self._dates = []
+        self._frozen = []
+        for asset in self._assets:
+            rs = self._restrictions_by_asset[asset]
+            self._dates.append(np.array(
+                [_ns(r.effective_date) for r in rs], dtype=np.int64))
+            self._frozen.append(np.array(
+                [r.state == RESTRICTION_STATES.FROZEN for r in rs],
+                dtype=bool))
+
+        # the frozen mask over the assets only changes at effective dates
+        self._change_dates = np.unique(np.concatenate(
+            self._dates + [np.empty(0, dtype=np.int64)]))
+        self._masks = {}
+
     def is_restricted(self, assets, dt):
         """
         Returns whether or not an asset or iterable of assets is restricted
@@ -195,19 +217,39 @@ class HistoricalRestrictions(Restrictions):
         if isinstance(assets, Asset):
             return self._is_restricted_for_asset(assets, dt)
 
-        is_restricted = partial(self._is_restricted_for_asset, dt=dt)
+        assets = list(assets)
+        mask = self._frozen_mask(dt)
+        # the last entry is for the assets without restrictions
+        index = [self._asset_index.get(a, -1) for a in assets]
         return pd.Series(
             index=pd.Index(assets),
-            data=vectorize(is_restricted, otypes=[bool])(assets)
+            data=mask[np.array(index, dtype=np.intp)],
         )
 
     def _is_restricted_for_asset(self, asset, dt):
-        state = RESTRICTION_STATES.ALLOWED
-        for r in self._restrictions_by_asset.get(asset, ()):
-            if r.effective_date > dt:
-                break
-            state = r.state
-        return state == RESTRICTION_STATES.FROZEN
+        i = self._asset_index.get(asset)
+        if i is None:
+            return False
+        pos = self._dates[i].searchsorted(_ns(dt), side='right') - 1
+        return pos >= 0 and bool(self._frozen[i][pos])
+
+    def _frozen_mask(self, dt):
+        epoch = int(self._change_dates.searchsorted(_ns(dt), side='right'))
+        mask = self._masks.get(epoch)
+        if mask is None:
+            mask = np.zeros(len(self._assets) + 1, dtype=bool)
+            if epoch > 0:
+                v = self._change_dates[epoch - 1]
+                for i, (dates, frozen) in enumerate(
+                        zip(self._dates, self._frozen)):
+                    pos = dates.searchsorted(v, side='right') - 1
+                    mask[i] = pos >= 0 and frozen[pos]
+            self._masks[epoch] = mask
+        return mask
+
+
+def _ns(dt):
+    return pd.Timestamp(dt).value
 
 
 class SecurityListRestrictions(Restrictions):
@@ -221,16 +263,21 @@ class SecurityListRestrictions(Restrictions):
     """
 
     def __init__(self, security_list_by_dt):
+        self.security_list = security_list_by_dt
         self.current_securities = security_list_by_dt.current_securities
 
     def is_restricted(self, assets, dt):
-        securities_in_list = self.current_securities(dt)
+        # the security lists hold sids
         if isinstance(assets, Asset):
-            return assets in securities_in_list
-        return pd.Series(
-            index=pd.Index(assets),
-            data=vectorized_is_element(assets, securities_in_list)
-        )
+            return assets.sid in self.current_securities(dt)
+        assets = list(assets)
+        contains = getattr(self.security_list, 'contains', None)
+        if contains is not None:
+            data = contains(assets, dt)
+        else:
+            data = vectorized_is_element(
+                [asset.sid for asset in assets], self.current_securities(dt))
+        return pd.Series(index=pd.Index(assets), data=data)
 
 
 def vectorized_is_element(array, choices):
@@ -15,6 +15,7 @@
 import abc
 import logbook
 
+import numpy as np
 import pandas as pd
 
 from six import with_metaclass
@@ -33,6 +34,11 @@ class TradingControl(with_metaclass(abc.ABCMeta)):
     algorithm.
     """
 
+    # metadata of the violations by order index while validating a batch
+    _batch_violations = None
+    # and of the last batch validated
+    _batch_metadata = {}
+
     def __init__(self, on_error, **kwargs):
         """
         Track any arguments that should be printed in the error message
@@ -61,6 +67,56 @@ class TradingControl(with_metaclass(abc.ABCMeta)):
         """
         raise NotImplementedError
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Validate a list of orders at once, before any of them is placed.
+
+        `amounts`, `positions` (the current share counts) and `prices` are
+        float arrays aligned with `assets`. Return a boolean array which is
+        True for the orders violating this control. The violations are not
+        handled here, the caller passes each of them to handle_violation.
+
+        The default checks the orders one by one with validate(). Controls
+        can override it with a vectorized check.
+        """
+        violations = self._batch_violations = {}
+        try:
+            for i, (asset, amount) in enumerate(zip(assets, amounts)):
+                self._batch_index = i
+                self.validate(asset,
+                              amount,
+                              portfolio,
+                              algo_datetime,
+                              algo_current_data)
+        finally:
+            self._batch_violations = None
+
+        self._batch_metadata = violations
+        mask = np.zeros(len(assets), dtype=bool)
+        mask[sorted(violations)] = True
+        return mask
+
+    def batch_violation_metadata(self, index):
+        """
+        The metadata of each violation of the order at `index` in the last
+        validate_batch(), to pass to handle_violation. [None] when the
+        control does not give any.
+        """
+        return self._batch_metadata.get(index, [None])
+
+    def _asset_mask(self, assets):
+        asset = getattr(self, 'asset', None)
+        if asset is None:
+            return np.ones(len(assets), dtype=bool)
+        return np.array([a == asset for a in assets], dtype=bool)
+
     def _constraint_msg(self, metadata):
         constraint = repr(self)
         if metadata:
@@ -78,6 +134,12 @@ class TradingControl(with_metaclass(abc.ABCMeta)):
         If dynamic information should be displayed as well, pass it in via
         `metadata`.
         """
+        if self._batch_violations is not None:
+            # validating a batch, handled by the caller
+            self._batch_violations.setdefault(
+                self._batch_index, []).append(metadata)
+            return
+
         constraint = self._constraint_msg(metadata)
 
         if self.on_error == 'fail':
@@ -130,6 +192,27 @@ class MaxOrderCount(TradingControl):
             self.handle_violation(asset, amount, algo_datetime)
         self.orders_placed += 1
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Flag the orders beyond self.max_count for today.
+        """
+        algo_date = algo_datetime.date()
+
+        if self.current_date and self.current_date != algo_date:
+            self.orders_placed = 0
+        self.current_date = algo_date
+
+        placed = self.orders_placed + np.arange(len(assets))
+        self.orders_placed += len(assets)
+        return placed >= self.max_count
+
 
 class RestrictedListOrder(TradingControl):
     """TradingControl representing a restricted list of assets that
@@ -157,6 +240,22 @@ class RestrictedListOrder(TradingControl):
         if self.restrictions.is_restricted(asset, algo_datetime):
             self.handle_violation(asset, amount, algo_datetime)
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Flag the orders for assets in the restricted_list.
+        """
+        if not len(assets):
+            return np.zeros(0, dtype=bool)
+        restricted = self.restrictions.is_restricted(assets, algo_datetime)
+        return np.asarray(restricted, dtype=bool)
+
 
 class MaxOrderSize(TradingControl):
     """
@@ -216,6 +315,21 @@ class MaxOrderSize(TradingControl):
         if too_much_value:
             self.handle_violation(asset, amount, algo_datetime)
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Flag the orders whose magnitude exceeds either self.max_shares or
+        self.max_notional.
+        """
+        return self._asset_mask(assets) & _exceeds(
+            amounts, prices, self.max_shares, self.max_notional)
+
 
 class MaxPositionSize(TradingControl):
     """
@@ -280,6 +394,21 @@ class MaxPositionSize(TradingControl):
         if too_much_value:
             self.handle_violation(asset, amount, algo_datetime)
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Flag the orders which would cause the magnitude of the position to
+        be greater than self.max_shares or self.max_notional.
+        """
+        return self._asset_mask(assets) & _exceeds(
+            positions + amounts, prices, self.max_shares, self.max_notional)
+
 
 class LongOnly(TradingControl):
     """
@@ -302,6 +431,19 @@ class LongOnly(TradingControl):
         if portfolio.positions[asset].amount + amount < 0:
             self.handle_violation(asset, amount, algo_datetime)
 
+    def validate_batch(self,
+                       assets,
+                       amounts,
+                       positions,
+                       prices,
+                       portfolio,
+                       algo_datetime,
+                       algo_current_data):
+        """
+        Flag the orders which would leave a negative position.
+        """
+        return positions + amounts < 0
+
 
 class AssetDateBounds(TradingControl):
     """
@@ -348,6 +490,17 @@ class AssetDateBounds(TradingControl):
                     asset, amount, algo_datetime, metadata=metadata)
 
 
+def _exceeds(shares, prices, max_shares, max_notional):
+    mask = np.zeros(len(shares), dtype=bool)
+    if max_shares is not None:
+        mask |= np.abs(shares) > max_shares
+    if max_notional is not None:
+        # no violation for unknown prices, as in validate()
+        with np.errstate(invalid='ignore'):
+            mask |= np.abs(shares * prices) > max_notional
+    return mask
+
+
 class AccountControl(with_metaclass(abc.ABCMeta)):
     """
     Abstract base class representing a fail-safe control on the behavior of any
@@ -99,7 +99,15 @@ class Order:
         return dct
 
     def to_api_obj(self):
-        return proto.Order(initial_values=self.to_dict())
+        # same as proto.Order(self.to_dict()), without the dict
+        obj = proto.Order()
+        for name in _API_FIELDS:
+            setattr(obj, name, getattr(self, name))
+        if self.broker_order_id is not None:
+            obj.broker_order_id = self.broker_order_id
+        obj.sid = self.asset
+        obj.status = self.status
+        return obj
 
     @property
     def sid(self):
@@ -129,3 +137,9 @@ class Order:
         String representation for this object.
         """
         return "Order(%s)" % self.to_dict().__repr__()
+
+
+_API_FIELDS = tuple(
+    name for name in Order.__slots__
+    if name not in ORDER_FIELDS_TO_IGNORE and name != 'broker_order_id'
+)
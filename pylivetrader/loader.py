@@ -56,6 +56,9 @@ def get_algomodule(script, filename=None):
 
     code = compile(script, filename, 'exec')
 
+    # registers the api methods to pylivetrader.api
+    import pylivetrader.algorithm  # noqa
+
     ns = {}
     for name in api.__all__:
         ns[name] = getattr(api, name)
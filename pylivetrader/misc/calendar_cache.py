@@ -0,0 +1,235 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+_Session = namedtuple('_Session', [
+    'index', 'label', 'label_ns', 'prev_label',
+    'open', 'open_ns', 'close', 'close_ns',
+    'prev_close', 'prev_close_ns', 'next_open', 'next_open_ns',
+    'minutes', 'minutes_ns', 'contiguous',
+])
+
+_MINUTE_NS = 60 * 10 ** 9
+_MIN_NS = int(np.iinfo(np.int64).min)
+_MAX_NS = int(np.iinfo(np.int64).max)
+
+
+def _ns(dt):
+    try:
+        return dt.value
+    except AttributeError:
+        return pd.Timestamp(dt).value
+
+
+def _utc(ns):
+    return pd.Timestamp(ns, tz='UTC')
+
+
+class SessionCalendar:
+    '''
+    Trading calendar facade that answers the per-minute queries about the
+    current session from precomputed int64 nanoseconds, instead of going
+    through the pandas indexes of the whole calendar.
+
+    The current session is set by `set_session()` at the session start,
+    and rolls forward by itself when asked about a later minute. Queries
+    outside of the current session, and any other attribute, fall back
+    to the wrapped calendar.
+    '''
+
+    def __init__(self, calendar):
+        if isinstance(calendar, SessionCalendar):
+            calendar = calendar.calendar
+        self.calendar = calendar
+
+        # the calendar's own arrays, mapped from the snapshot if restored
+        self._sessions_ns = calendar.all_sessions.asi8
+        self._opens_ns = calendar.market_opens_nanos
+        self._closes_ns = calendar.market_closes_nanos
+        self._session = None
+        self._previous_minute_memo = (None, None)
+
+    def __getattr__(self, name):
+        if name == 'calendar':
+            # not initialized yet, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.calendar, name)
+
+    def __getstate__(self):
+        return {'calendar': self.calendar}
+
+    def __setstate__(self, state):
+        self.__init__(state['calendar'])
+
+    @property
+    def current_session(self):
+        session = self._session
+        return session.label if session is not None else None
+
+    def set_session(self, session_label):
+        '''
+        Precompute the given session, or the next one if it is not a
+        trading day.
+        '''
+        label_ns = _ns(pd.Timestamp(session_label).normalize())
+        idx = np.searchsorted(self._sessions_ns, label_ns)
+        if idx >= len(self._sessions_ns):
+            raise ValueError(
+                '{} is out of the calendar range'.format(session_label))
+        self._set_index(idx)
+        return self._session.label
+
+    def _set_index(self, idx):
+        # plain ints, comparing with numpy scalars is much slower
+        sessions = self._sessions_ns
+        open_ns = int(self._opens_ns[idx])
+        close_ns = int(self._closes_ns[idx])
+        has_prev = idx > 0
+        has_next = idx + 1 < len(sessions)
+        prev_close_ns = int(self._closes_ns[idx - 1]) if has_prev else _MIN_NS
+        next_open_ns = int(self._opens_ns[idx + 1]) if has_next else _MAX_NS
+
+        label = _utc(sessions[idx])
+        minutes = self.calendar.minutes_for_session(label)
+        self._session = _Session(
+            index=idx,
+            label=label,
+            label_ns=int(sessions[idx]),
+            prev_label=_utc(sessions[idx - 1]) if has_prev else None,
+            open=_utc(open_ns),
+            open_ns=open_ns,
+            close=_utc(close_ns),
+            close_ns=close_ns,
+            prev_close=_utc(prev_close_ns) if has_prev else None,
+            prev_close_ns=prev_close_ns,
+            next_open=_utc(next_open_ns) if has_next else None,
+            next_open_ns=next_open_ns,
+            minutes=minutes,
+            minutes_ns=minutes.asi8,
+            contiguous=(
+                len(minutes) == (close_ns - open_ns) // _MINUTE_NS + 1),
+        )
+
+    def _session_for(self, v):
+        '''
+        Return the current session if v falls between the previous close
+        and the next open, rolling forward if v is in a later session.
+        '''
+        session = self._session
+        if session is None or v >= session.next_open_ns:
+            # first minute after the previous close is in the session
+            idx = np.searchsorted(self._closes_ns, v)
+            if idx >= len(self._closes_ns):
+                return None
+            if session is None or idx > session.index:
+                self._set_index(idx)
+            session = self._session
+        if session.prev_close_ns < v < session.next_open_ns:
+            return session
+        return None
+
+    def _for_label(self, session_label):
+        session = self._session
+        if session is not None and _ns(session_label) == session.label_ns:
+            return session
+        return None
+
+    # minute queries
+
+    def is_open_on_minute(self, dt, *args, **kwargs):
+        v = _ns(dt)
+        session = self._session_for(v)
+        if session is None or args or kwargs:
+            return self.calendar.is_open_on_minute(dt, *args, **kwargs)
+        return session.open_ns <= v <= session.close_ns
+
+    def minute_to_session_label(self, dt, direction='next'):
+        v = _ns(dt)
+        session = self._session_for(v)
+        if session is not None and v <= session.close_ns:
+            if v >= session.open_ns or direction == 'next':
+                return session.label
+            if direction == 'previous' and session.prev_label is not None:
+                return session.prev_label
+        return self.calendar.minute_to_session_label(dt, direction)
+
+    def next_open(self, dt):
+        v = _ns(dt)
+        session = self._session_for(v)
+        if session is not None:
+            if v < session.open_ns:
+                return session.open
+            if session.next_open is not None:
+                return session.next_open
+        return self.calendar.next_open(dt)
+
+    def previous_minute(self, dt):
+        v = _ns(dt)
+        session = self._session_for(v)
+        if session is not None:
+            if v > session.close_ns:
+                return session.close
+            if v > session.open_ns:
+                # the same minute is asked many times within a bar
+                memo = self._previous_minute_memo
+                if memo[0] == v:
+                    return memo[1]
+                if session.contiguous:
+                    prev = _utc(session.open_ns + (
+                        v - 1 - session.open_ns) // _MINUTE_NS * _MINUTE_NS)
+                else:
+                    prev = _utc(session.minutes_ns[
+                        np.searchsorted(session.minutes_ns, v) - 1])
+                self._previous_minute_memo = (v, prev)
+                return prev
+            if session.prev_close is not None:
+                return session.prev_close
+        return self.calendar.previous_minute(dt)
+
+    # session queries
+
+    def is_session(self, dt):
+        if self._for_label(dt) is not None:
+            return True
+        return self.calendar.is_session(dt)
+
+    def session_open(self, session_label):
+        session = self._for_label(session_label)
+        if session is not None:
+            return session.open
+        return self.calendar.session_open(session_label)
+
+    def session_close(self, session_label):
+        session = self._for_label(session_label)
+        if session is not None:
+            return session.close
+        return self.calendar.session_close(session_label)
+
+    def open_and_close_for_session(self, session_label):
+        session = self._for_label(session_label)
+        if session is not None:
+            return session.open, session.close
+        return self.calendar.open_and_close_for_session(session_label)
+
+    def minutes_for_session(self, session_label):
+        session = self._for_label(session_label)
+        if session is not None:
+            return session.minutes
+        return self.calendar.minutes_for_session(session_label)
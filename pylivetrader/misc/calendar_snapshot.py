@@ -0,0 +1,334 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Trading calendars restored from a snapshot on disk.
+
+Constructing a trading calendar computes three decades of sessions,
+opens, closes and minutes from the holiday rules, which takes a good
+part of the start-up. The first process that needs a calendar saves
+the attributes the constructor set, the large arrays as a single int64
+.npy file, and the next ones memory-map it and fill in a calendar
+instance without running its constructor. The restored instance is
+registered to trading_calendars, so that `get_calendar()` returns the
+same instance anywhere in the process, and the mapped pages are shared
+by the processes on the host.
+
+The snapshot also keeps the first and last opens and closes of the
+constructed calendar. A restored calendar that does not answer the same
+is dropped and the calendar is constructed as usual, as is one whose
+attributes can not be saved.
+
+The snapshots are kept in $PYLIVETRADER_CACHE_DIR, or in
+~/.cache/pylivetrader by default, and are rebuilt when the installed
+trading_calendars changes or the snapshot does not reach far enough
+into the future.
+'''
+
+import collections
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+import trading_calendars
+from logbook import Logger
+from trading_calendars import TradingCalendar, register_calendar, \
+    resolve_alias
+from trading_calendars import get_calendar as _get_calendar
+from trading_calendars.calendar_utils import _default_calendar_factories
+
+log = Logger('CalendarSnapshot')
+
+
+SNAPSHOT_VERSION = 2
+
+# a snapshot is rebuilt once it covers less than this ahead of today
+MIN_COVERAGE = pd.Timedelta(days=180)
+
+_lock = threading.Lock()
+_calendars = {}
+
+
+def cache_dir():
+    path = os.environ.get('PYLIVETRADER_CACHE_DIR')
+    if not path:
+        path = os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or
+            os.path.join(os.path.expanduser('~'), '.cache'),
+            'pylivetrader')
+    return path
+
+
+def snapshot_path(name, directory=None):
+    return os.path.join(
+        directory or cache_dir(),
+        'calendars',
+        '{}-v{}-tc{}.npy'.format(
+            name, SNAPSHOT_VERSION, trading_calendars.__version__))
+
+
+def get_calendar(name):
+    '''
+    Return the process-wide calendar instance for the name, restored
+    from the snapshot if there is a fresh one, else constructed and
+    saved for the next process.
+    '''
+    name = resolve_alias(name)
+    try:
+        return _calendars[name]
+    except KeyError:
+        pass
+
+    with _lock:
+        if name in _calendars:
+            return _calendars[name]
+
+        path = snapshot_path(name)
+        calendar = None
+        if _restorable(name):
+            calendar = load_snapshot(name, path)
+        if calendar is not None:
+            register_calendar(name, calendar, force=True)
+        else:
+            calendar = _get_calendar(name)
+            if _restorable(name):
+                try:
+                    save_snapshot(calendar, path)
+                except (OSError, ValueError) as e:
+                    log.warn('could not save calendar snapshot {}: {}'.format(
+                        path, e))
+        _calendars[name] = calendar
+    return calendar
+
+
+def _restorable(name):
+    # only the calendars computed entirely by the base constructor
+    factory = _default_calendar_factories.get(name)
+    return (isinstance(factory, type) and
+            issubclass(factory, TradingCalendar) and
+            factory.__init__ is TradingCalendar.__init__)
+
+
+class _LRU:
+    '''
+    Stands in for the lru-dict caches of the constructor, which can not
+    be saved.
+    '''
+
+    def __init__(self, size):
+        self._size = size
+        self._items = collections.OrderedDict()
+
+    def get_size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __getitem__(self, key):
+        value = self._items[key]
+        self._items.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self._size:
+            self._items.popitem(last=False)
+
+
+def _checks(calendar):
+    '''What the restored calendar has to answer as the constructed one.'''
+    first = calendar.first_trading_session
+    last = calendar.last_trading_session
+    return (
+        first,
+        last,
+        tuple(calendar.open_and_close_for_session(first)),
+        tuple(calendar.open_and_close_for_session(last)),
+        len(calendar.all_minutes),
+    )
+
+
+def _is_field(values):
+    # the arrays mapped from the file
+    return (isinstance(values, np.ndarray) and values.ndim == 1 and
+            values.dtype.kind in 'iufMm' and values.dtype.itemsize == 8)
+
+
+def _describe(name, value, fields):
+    '''
+    The manifest entry of an attribute, appending its arrays to fields.
+    '''
+    if _is_field(value):
+        fields.append(value.view(np.int64))
+        return name, 'array', value.dtype.str
+    if isinstance(value, pd.DatetimeIndex):
+        fields.append(value.asi8)
+        return name, 'index', (value.tz, value.name)
+    if isinstance(value, pd.DataFrame) and \
+            isinstance(value.index, pd.DatetimeIndex) and \
+            all(_is_field(value[c].values) for c in value.columns):
+        fields.append(value.index.asi8)
+        dtypes = []
+        for column in value.columns:
+            fields.append(value[column].values.view(np.int64))
+            dtypes.append(value[column].values.dtype.str)
+        return name, 'frame', (
+            value.index.tz, value.index.name, list(value.columns), dtypes)
+    try:
+        return name, 'value', pickle.dumps(value)
+    except Exception:
+        pass
+    if hasattr(value, 'get_size'):
+        return name, 'lru', value.get_size()
+    raise ValueError('can not save the attribute {} of type {}'.format(
+        name, type(value).__name__))
+
+
+def save_snapshot(calendar, path):
+    '''
+    Write the attributes of the calendar to `path` as one int64 array:
+    the length of the pickled manifest, the manifest padded to 8 bytes,
+    then the arrays of the attributes.
+
+    Raise ValueError if an attribute can not be saved.
+    '''
+    fields = []
+    attributes = [
+        _describe(name, value, fields)
+        for name, value in sorted(vars(calendar).items())
+    ]
+    manifest = pickle.dumps({
+        'attributes': attributes,
+        'lengths': [len(f) for f in fields],
+        'checks': _checks(calendar),
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    padded = manifest + b'\0' * (-len(manifest) % 8)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.save(f, np.concatenate(
+            [np.array([len(manifest)], dtype=np.int64),
+             np.frombuffer(padded, dtype=np.int64)] + fields))
+    os.replace(tmp, path)
+
+
+def _read_snapshot(path):
+    try:
+        # copy-on-write, as some pandas routines refuse read-only buffers,
+        # the pages are still shared as long as nobody writes to them
+        data = np.load(path, mmap_mode='c')
+    except (OSError, ValueError):
+        return None
+    if data.dtype != np.int64 or data.ndim != 1 or len(data) < 1:
+        return None
+    size = int(data[0])
+    words = (size + 7) // 8
+    if size <= 0 or 1 + words > len(data):
+        return None
+    try:
+        manifest = pickle.loads(data[1:1 + words].tobytes()[:size])
+        lengths = manifest['lengths']
+    except Exception:
+        return None
+    if 1 + words + sum(lengths) != len(data):
+        return None
+    fields = []
+    offset = 1 + words
+    for n in lengths:
+        fields.append(data[offset:offset + n])
+        offset += n
+    return manifest, fields
+
+
+def load_snapshot(name, path, min_end=None):
+    '''
+    Restore the calendar from the snapshot at `path`, or return None if
+    it is missing, broken, ends before `min_end` (defaults to today plus
+    MIN_COVERAGE) or restores a calendar different from the one saved.
+    '''
+    snapshot = _read_snapshot(path)
+    if snapshot is None:
+        return None
+    manifest, fields = snapshot
+    if min_end is None:
+        min_end = pd.Timestamp.utcnow().normalize() + MIN_COVERAGE
+    checks = manifest['checks']
+    if checks[1] < pd.Timestamp(min_end):
+        return None
+    try:
+        calendar = _restore(
+            _default_calendar_factories[name], manifest['attributes'],
+            fields)
+        restored = _checks(calendar)
+    except Exception as e:
+        log.warn('could not restore calendar snapshot {}: {}'.format(
+            path, e))
+        return None
+    if restored != checks:
+        log.warn('calendar snapshot {} differs from the calendar, '
+                 'ignoring it'.format(path))
+        return None
+    return calendar
+
+
+def _datetimes(values, tz, name=None):
+    index = pd.DatetimeIndex(values.view('M8[ns]'), name=name)
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index
+
+
+def _restore(cls, attributes, fields):
+    '''
+    Fill in the attributes TradingCalendar.__init__ set in the saved
+    calendar.
+    '''
+    calendar = cls.__new__(cls)
+    fields = iter(fields)
+    for name, kind, spec in attributes:
+        if kind == 'array':
+            value = next(fields).view(np.dtype(spec))
+        elif kind == 'index':
+            value = _datetimes(next(fields), *spec)
+        elif kind == 'frame':
+            tz, index_name, columns, dtypes = spec
+            index = _datetimes(next(fields), tz, index_name)
+            value = pd.DataFrame(
+                collections.OrderedDict(
+                    (column, next(fields).view(np.dtype(dtype)))
+                    for column, dtype in zip(columns, dtypes)),
+                index=index,
+                columns=columns,
+            )
+        elif kind == 'lru':
+            value = _LRU(spec)
+        else:
+            value = pickle.loads(spec)
+        setattr(calendar, name, value)
+
+    # all_minutes is memoized by the class, seed it with the mapped array
+    all_minutes = getattr(cls, 'all_minutes', None)
+    minutes = getattr(calendar, '_trading_minutes_nanos', None)
+    if hasattr(all_minutes, '_cache') and minutes is not None:
+        all_minutes._cache[calendar] = _datetimes(minutes, 'UTC')
+    return calendar
@@ -0,0 +1,141 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Measure where the start-up time goes.
+
+ImportProfiler records how long each module not loaded yet takes to
+import, like `python -X importtime` but from within the running process,
+so it can be turned on from the command line. Named phases (loading the
+algorithm file, connecting to the backend, ...) are timed alongside.
+'''
+
+import importlib._bootstrap as _bootstrap
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+
+class ImportProfiler:
+    '''
+    Record the import time of each module loaded while enabled.
+
+    The self time of a module excludes the modules it imports in turn,
+    so the self times add up to the total import time.
+    '''
+
+    def __init__(self):
+        self.imports = OrderedDict()
+        self.phases = OrderedDict()
+        self._stack = []
+        self._saved = None
+
+    def start(self):
+        if self._saved is not None:
+            return
+        # every module not in sys.modules yet is loaded through this
+        # function, whether by the import statement, a from-list or
+        # importlib.import_module. `python -X importtime` hooks the
+        # same place.
+        self._saved = orig = _bootstrap._find_and_load
+
+        def profiled_find_and_load(name, *args, **kwargs):
+            with self._measure(name):
+                return orig(name, *args, **kwargs)
+
+        _bootstrap._find_and_load = profiled_find_and_load
+
+    def stop(self):
+        if self._saved is None:
+            return
+        _bootstrap._find_and_load = self._saved
+        self._saved = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @contextmanager
+    def _measure(self, name):
+        if name in sys.modules:
+            # e.g. a parent package imported for a relative import
+            yield
+            return
+        # [name, start, time spent in the nested imports]
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if name in sys.modules and name not in self.imports:
+                self.imports[name] = (elapsed, elapsed - frame[2])
+
+    @contextmanager
+    def phase(self, name):
+        '''Time a named step of the start-up.'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    @property
+    def total_import_time(self):
+        return sum(t for _, t in self.imports.values())
+
+    def by_package(self):
+        '''
+        Return [(top level package, self time, number of modules)],
+        slowest first.
+        '''
+        times = defaultdict(float)
+        counts = defaultdict(int)
+        for name, (_, self_time) in self.imports.items():
+            top = name.split('.', 1)[0]
+            times[top] += self_time
+            counts[top] += 1
+        return sorted(
+            ((top, times[top], counts[top]) for top in times),
+            key=lambda row: -row[1])
+
+    def report(self, limit=20):
+        '''Format the breakdown as text lines.'''
+        lines = []
+        if self.phases:
+            lines.append('start-up phases:')
+            for name, elapsed in self.phases.items():
+                lines.append('  {:>9.1f} ms  {}'.format(elapsed * 1e3, name))
+        lines.append('imports: {} modules in {:.1f} ms'.format(
+            len(self.imports), self.total_import_time * 1e3))
+        lines.append('  {:>12}  {:>7}  package'.format('self', 'modules'))
+        packages = self.by_package()
+        for top, self_time, count in packages[:limit]:
+            lines.append('  {:>9.1f} ms  {:>7}  {}'.format(
+                self_time * 1e3, count, top))
+        if len(packages) > limit:
+            rest = packages[limit:]
+            lines.append('  {:>9.1f} ms  {:>7}  ({} more)'.format(
+                sum(row[1] for row in rest) * 1e3,
+                sum(row[2] for row in rest),
+                len(rest)))
+        return lines
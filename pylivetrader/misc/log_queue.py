@@ -0,0 +1,212 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Log handler writing to the stream from a background thread.
+
+`StreamHandler` writes and flushes the stream in the thread that logs,
+so a slow stdout, such as a pipe to a container log driver under
+backpressure, stalls the bar that logs. `QueuedStreamHandler` only puts
+the record into a bounded queue, and a background thread formats the
+records in batches and writes each batch at once.
+
+Warnings repeated with the same message, e.g. the same symbol failing
+every bar, are written once per `dedup_interval` seconds. Once the
+interval is over, or when the handler is closed, the last of the
+repeats left out is written with their number. When the queue is full
+the records are dropped and the number of the dropped records is
+written once the thread catches up.
+
+The locks the logging threads take are held across a fork, so that a
+forked process, such as a pipeline worker, does not inherit them held
+by the writer thread.
+'''
+
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+
+from logbook import StreamHandler, WARNING
+
+_STOP = object()
+
+# seconds the writer thread waits for records before it looks for the
+# repeats to report
+_POLL_INTERVAL = 1
+
+_handlers = weakref.WeakSet()
+# the locks taken before the fork in progress
+_fork_locks = []
+
+
+class QueuedStreamHandler(StreamHandler):
+    '''
+    param: stream: the stream to write to, stdout by default
+    param: maxsize: number of records the queue holds
+    param: batch_size: maximum number of records written at once
+    param: dedup_interval: seconds a repeated warning is left out for
+    param: dedup_level: lowest level to leave out the repeats of
+    '''
+
+    def __init__(self, stream=None, maxsize=10000, batch_size=100,
+                 dedup_interval=60, dedup_level=WARNING, **kwargs):
+        StreamHandler.__init__(
+            self, stream if stream is not None else sys.stdout, **kwargs)
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.dedup_interval = dedup_interval
+        self.dedup_level = dedup_level
+
+        self.dropped = 0
+        self._reported_dropped = 0
+        # (channel, level, message) -> [first seen, repeats, last repeat]
+        self._seen = {}
+        self._seen_lock = threading.Lock()
+        _handlers.add(self)
+
+        self._thread = threading.Thread(
+            target=self._run, name='QueuedStreamHandler', daemon=True)
+        self._thread.start()
+
+    # the logging threads
+
+    def emit(self, record):
+        # the frame and the arguments are gone once the caller moves on
+        record.pull_information()
+        if record.level >= self.dedup_level and self._repeated(record):
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._seen_lock:
+                self.dropped += 1
+
+    def _repeated(self, record):
+        key = (record.channel, record.level, record.message)
+        now = time.monotonic()
+        with self._seen_lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.dedup_interval:
+                seen[1] += 1
+                seen[2] = record
+                return True
+            self._seen[key] = [now, 0, None]
+            if seen is not None and seen[1] > 0:
+                record.message = _summary(
+                    record.message, seen[1], now - seen[0])
+            if len(self._seen) > 10000:
+                self._expire(now)
+        return False
+
+    def _expire(self, now):
+        for key, (first, repeats, _) in list(self._seen.items()):
+            # the repeats are reported by the writer thread first
+            if now - first >= self.dedup_interval and repeats == 0:
+                del self._seen[key]
+
+    def _repeat_summaries(self, force=False):
+        '''
+        The last record of the repeats left out, with their number, for
+        each message whose interval is over, or all of them if force.
+        '''
+        now = time.monotonic()
+        records = []
+        with self._seen_lock:
+            for seen in self._seen.values():
+                first, repeats, last = seen
+                if repeats == 0 or \
+                        (not force and now - first < self.dedup_interval):
+                    continue
+                last.message = _summary(last.message, repeats, now - first)
+                records.append(last)
+                seen[1] = 0
+                seen[2] = None
+        return records
+
+    # the writer thread
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=_POLL_INTERVAL)]
+            except queue.Empty:
+                batch = []
+            while batch and batch[-1] is not _STOP and \
+                    len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = len(batch) > 0 and batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            batch += self._repeat_summaries(force=stop)
+            try:
+                self._write_batch(batch)
+            except Exception:
+                # nowhere to log it to
+                pass
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        lines = [self.format(record) for record in batch]
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped += dropped
+            lines.append(
+                'dropped {} log records, the log queue was full'.format(
+                    dropped))
+        if not lines:
+            return
+        with self.lock:
+            self.ensure_stream_is_open()
+            self.write(self.encode('\n'.join(lines)))
+            self.flush()
+
+    def close(self):
+        '''Write out the queued records and stop the thread.'''
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        StreamHandler.close(self)
+
+
+def _before_fork():
+    for handler in list(_handlers):
+        for lock in (handler._seen_lock, handler.queue.mutex):
+            lock.acquire()
+            _fork_locks.append(lock)
+
+
+def _after_fork():
+    while _fork_locks:
+        _fork_locks.pop().release()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork,
+                        after_in_parent=_after_fork,
+                        after_in_child=_after_fork)
+
+
+def _summary(message, repeats, seconds):
+    return '{} (repeated {} times in {:.0f} s)'.format(
+        message, repeats, seconds)
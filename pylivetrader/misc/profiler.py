@@ -0,0 +1,297 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Sampling profiler for the algorithm thread.
+
+A background thread looks at the stack of the algorithm thread at a fixed
+interval, only while the executor is running a bar or another event, and
+counts the samples per stack, per bar and per kind of code:
+
+- user: the algorithm file
+- data: pylivetrader.data and pylivetrader.assets
+- backend: pylivetrader.backend and the network libraries below it
+- pylivetrader: the rest of pylivetrader
+
+Each sample goes to the first of those found from the innermost frame
+out, so pandas called from the algorithm counts as user code and a socket
+read under the data layer counts as backend I/O.
+
+At the end of every session it writes <name>-<session>.collapsed, one
+`frame;frame;... count` line per stack for flamegraph.pl or speedscope,
+and <name>-<session>.txt, the slowest bars and the top functions of each
+kind.
+'''
+
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+from logbook import Logger
+
+log = Logger('Profiler')
+
+
+CATEGORIES = ('user', 'data', 'backend', 'pylivetrader')
+
+_BACKEND_PACKAGES = {
+    'alpaca_trade_api', 'requests', 'urllib3', 'http', 'socket', 'ssl',
+    'websocket', 'websockets', 'asyncio', 'selectors',
+}
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Section:
+
+    def __init__(self, profiler, dt, phase):
+        self.profiler = profiler
+        self.context = (dt, phase)
+
+    def __enter__(self):
+        self.profiler._context = self.context
+
+    def __exit__(self, *args):
+        self.profiler._context = None
+
+
+class SamplingProfiler:
+    '''
+    param: output_dir: directory to write the session files to
+    param: name: prefix of the file names, e.g. the algorithm name
+    param: interval: seconds between samples
+    param: user_files: file names of the algorithm code
+    param: top: number of entries in each table of the report
+    '''
+
+    def __init__(self, output_dir, name='algo', interval=0.01,
+                 user_files=(), top=20):
+        self.output_dir = output_dir
+        self.name = name
+        self.interval = interval
+        self.top = top
+        self._user_files = {
+            os.path.abspath(f) for f in user_files} | set(user_files)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_id = None
+        # (bar dt, phase) while the executor runs an event
+        self._context = None
+        self._session = None
+        self._frames = {}
+        self._reset()
+
+    def _reset(self):
+        self.stacks = Counter()
+        self.bars = Counter()
+        self.callbacks = defaultdict(Counter)
+        self.functions = {c: Counter() for c in CATEGORIES}
+        self.samples = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def section(self, dt, phase):
+        '''
+        Context manager around an event run by the executor, the samples
+        taken in it are attributed to the bar `dt`.
+        '''
+        return _Section(self, dt, phase)
+
+    def start_session(self, session_label):
+        '''Write out the previous session and start a new one.'''
+        self.flush()
+        self._session = pd.Timestamp(session_label).strftime('%Y-%m-%d')
+
+    # sampling
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            context = self._context
+            if context is None:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            try:
+                self._sample(frame, context)
+            except Exception as e:
+                log.warn('profiler sample failed: {}'.format(e))
+            finally:
+                del frame
+
+    def _describe(self, code):
+        try:
+            return self._frames[code]
+        except KeyError:
+            pass
+        filename = code.co_filename
+        path = os.path.abspath(filename)
+        if filename in self._user_files or path in self._user_files:
+            category = 'user'
+            short = os.path.basename(filename)
+        elif path.startswith(_PACKAGE_DIR + os.sep):
+            short = os.path.relpath(path, os.path.dirname(_PACKAGE_DIR))
+            module = short.split(os.sep)[1]
+            if module == 'backend' or short.endswith(
+                    os.path.join('smoke', 'backend.py')):
+                category = 'backend'
+            elif module in ('data', 'assets'):
+                category = 'data'
+            elif module == 'executor':
+                category = 'executor'
+            else:
+                category = 'pylivetrader'
+        else:
+            short = _short_path(path)
+            top = short.split(os.sep, 1)[0].split('.', 1)[0]
+            category = 'backend' if top in _BACKEND_PACKAGES else None
+        described = self._frames[code] = (
+            '{}:{}'.format(short.replace(os.sep, '/'), code.co_name),
+            category,
+            short.endswith('events.py') and code.co_name == 'handle_data',
+        )
+        return described
+
+    def _sample(self, frame, context):
+        described = []
+        while frame is not None:
+            described.append(self._describe(frame.f_code))
+            frame = frame.f_back
+        described.reverse()
+
+        # start below the executor
+        start = 0
+        for i, (_, category, _) in enumerate(described):
+            if category == 'executor':
+                start = i + 1
+        described = described[start:]
+
+        dt, phase = context
+        callback = phase
+        # the function called by the innermost events.py handle_data
+        for i, (_, _, is_dispatch) in enumerate(described[:-1]):
+            if is_dispatch and not described[i + 1][2]:
+                callback = described[i + 1][0].rsplit(':', 1)[1]
+
+        category, function = 'pylivetrader', phase
+        for label, c, _ in reversed(described):
+            if c in CATEGORIES:
+                category, function = c, label
+                break
+
+        stack = ';'.join([phase] + [label for label, _, _ in described])
+        with self._lock:
+            self.samples += 1
+            self.stacks[stack] += 1
+            self.bars[(dt, phase)] += 1
+            self.callbacks[(dt, phase)][callback] += 1
+            self.functions[category][function] += 1
+
+    # output
+
+    def flush(self):
+        with self._lock:
+            if self.samples == 0:
+                self._reset()
+                return
+            session = self._session or 'session'
+            stacks = self.stacks
+            report = self.report()
+            self._reset()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(
+            self.output_dir, '{}-{}'.format(self.name, session))
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write('{} {}\n'.format(stack, count))
+        with open(base + '.txt', 'w') as f:
+            f.write('\n'.join(report) + '\n')
+        log.info('wrote the profile of {} to {}.*'.format(session, base))
+
+    def report(self):
+        '''The top-N report of the current session as text lines.'''
+        total = self.samples
+        lines = ['{} samples every {:.0f} ms, {:.1f} s'.format(
+            total, self.interval * 1e3, total * self.interval)]
+
+        def pct(n):
+            return '{:5.1f}%'.format(100.0 * n / total if total else 0)
+
+        by_category = {c: sum(self.functions[c].values()) for c in CATEGORIES}
+        lines.append('  '.join(
+            '{} {}'.format(c, pct(by_category[c]).strip())
+            for c in CATEGORIES))
+
+        lines += ['', 'slowest bars', '{:>8} {:>7}  {:<26} {}'.format(
+            'samples', '', 'bar', 'callback')]
+        for (dt, phase), n in self.bars.most_common(self.top):
+            callback = self.callbacks[(dt, phase)].most_common(1)[0][0]
+            lines.append('{:>8} {}  {:<26} {}'.format(
+                n, pct(n), '{} {}'.format(
+                    pd.Timestamp(dt).strftime('%Y-%m-%d %H:%M'), phase),
+                callback))
+
+        titles = {
+            'user': 'user code',
+            'data': 'data layer',
+            'backend': 'backend I/O',
+            'pylivetrader': 'pylivetrader',
+        }
+        for c in CATEGORIES:
+            functions = self.functions[c]
+            if not functions:
+                continue
+            lines += ['', 'top {}'.format(titles[c]),
+                      '{:>8} {:>7}  function'.format('samples', '')]
+            for function, n in functions.most_common(self.top):
+                lines.append('{:>8} {}  {}'.format(n, pct(n), function))
+        return lines
+
+
+def _short_path(path):
+    best = None
+    for entry in sys.path:
+        entry = os.path.abspath(entry or '.')
+        if path.startswith(entry + os.sep) and (
+                best is None or len(entry) > len(best)):
+            best = entry
+    return os.path.relpath(path, best) if best else os.path.basename(path)
@@ -0,0 +1,258 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Bounded history of the values passed to `record()`.
+
+Each recorded name gets a preallocated ring buffer of timestamps and
+float values, so recording a value is two array writes and the memory
+stays the same however long the algorithm runs. When a directory is
+given, the values recorded since the last flush are written in a
+background thread every `flush_interval` of algorithm time, one .npz
+file of `dt`, `name` and `value` columns per flush, partitioned by
+the UTC date:
+
+    <directory>/2018-11-23/143000-000001.npz
+
+`load_recorded()` reads them back as a DataFrame.
+'''
+
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from numbers import Number
+
+import numpy as np
+import pandas as pd
+from logbook import Logger
+
+log = Logger('Recorder')
+
+
+# five sessions of minute bars
+DEFAULT_CAPACITY = 390 * 5
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+DEFAULT_FLUSH_INTERVAL = pd.Timedelta(minutes=15)
+
+# a timestamp and a value
+_ROW_BYTES = 16
+
+
+class _Ring:
+
+    def __init__(self, capacity):
+        self.dts = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        # number of values ever appended, and flushed
+        self.count = 0
+        self.flushed = 0
+
+    def append(self, dt, value):
+        i = self.count % len(self.dts)
+        self.dts[i] = dt
+        self.values[i] = value
+        self.count += 1
+
+    def last(self, n):
+        '''The last n rows, oldest first, as copies.'''
+        capacity = len(self.dts)
+        n = min(n, self.count, capacity)
+        end = self.count % capacity
+        start = end - n
+        if start >= 0:
+            return self.dts[start:end].copy(), self.values[start:end].copy()
+        return (
+            np.concatenate([self.dts[start:], self.dts[:end]]),
+            np.concatenate([self.values[start:], self.values[:end]]),
+        )
+
+
+class Recorder:
+    '''
+    param: capacity: number of values kept per name
+    param: max_bytes: memory cap of the buffers, the names recorded
+        after it is reached are not kept
+    param: directory: where to flush the values to, None to keep them
+        in memory only
+    param: flush_interval: pd.Timedelta of algorithm time between flushes
+    '''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_bytes=DEFAULT_MAX_BYTES,
+                 directory=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.flush_interval = pd.Timedelta(flush_interval)
+
+        self._rings = {}
+        self._skipped = set()
+        self._last_flush = None
+        self._sequence = 0
+        self._executor = None
+
+    @property
+    def nbytes(self):
+        return len(self._rings) * self.capacity * _ROW_BYTES
+
+    def record(self, dt, name, value):
+        ring = self._rings.get(name)
+        if ring is None:
+            ring = self._add(name, value)
+            if ring is None:
+                return
+        if not isinstance(value, Number):
+            if value is not None:
+                return
+            value = np.nan
+
+        dt = pd.Timestamp(dt).value
+        ring.append(dt, value)
+
+        if self.directory is None:
+            return
+        if self._last_flush is None:
+            self._last_flush = dt
+        elif dt - self._last_flush >= self.flush_interval.value or \
+                ring.count - ring.flushed >= self.capacity:
+            self.flush(dt)
+
+    def _add(self, name, value):
+        if name in self._skipped:
+            return None
+        if not isinstance(value, Number) and value is not None:
+            self._skipped.add(name)
+            log.info('not keeping the history of {}, '
+                     'not a number: {!r}'.format(name, value))
+            return None
+        if self.nbytes + self.capacity * _ROW_BYTES > self.max_bytes:
+            self._skipped.add(name)
+            log.warn('not keeping the history of {}, the recorder is '
+                     'at its {} bytes cap'.format(name, self.max_bytes))
+            return None
+        ring = self._rings[name] = _Ring(self.capacity)
+        return ring
+
+    def history(self, name, window=None):
+        '''
+        The last `window` values recorded for the name as a pd.Series
+        indexed by UTC timestamps, all of the kept ones if window is None.
+        '''
+        ring = self._rings.get(name)
+        if ring is None:
+            if name in self._skipped:
+                raise ValueError(
+                    'the history of {} is not kept'.format(name))
+            return pd.Series([], index=pd.DatetimeIndex([], tz='UTC'),
+                             name=name, dtype=np.float64)
+        dts, values = ring.last(self.capacity if window is None else window)
+        return pd.Series(
+            values,
+            index=pd.DatetimeIndex(dts, tz='UTC'),
+            name=name)
+
+    # flush
+
+    def flush(self, dt=None):
+        '''
+        Hand the values recorded since the last flush to the background
+        writer.
+        '''
+        if self.directory is None:
+            return
+        names = []
+        columns = []
+        for name, ring in self._rings.items():
+            pending = ring.count - ring.flushed
+            if pending <= 0:
+                continue
+            if pending > self.capacity:
+                log.warn('{} values of {} were overwritten before '
+                         'they were flushed'.format(
+                             pending - self.capacity, name))
+            columns.append(ring.last(pending))
+            names.append(name)
+            ring.flushed = ring.count
+        if dt is not None:
+            self._last_flush = dt
+        if not names:
+            return
+
+        self._sequence += 1
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor.submit(
+            self._write, names, columns, self._sequence)
+
+    def close(self):
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _write(self, names, columns, sequence):
+        try:
+            codes = np.concatenate([
+                np.full(len(dts), i, dtype=np.int32)
+                for i, (dts, _) in enumerate(columns)])
+            dts = np.concatenate([dts for dts, _ in columns])
+            values = np.concatenate([values for _, values in columns])
+
+            # partitioned by the date of the first value
+            first = pd.Timestamp(dts.min(), tz='UTC')
+            partition = os.path.join(
+                self.directory, first.strftime('%Y-%m-%d'))
+            os.makedirs(partition, exist_ok=True)
+            path = os.path.join(partition, '{}-{:06d}.npz'.format(
+                first.strftime('%H%M%S'), sequence))
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.savez(
+                    f,
+                    names=np.array(names, dtype=np.unicode_),
+                    name=codes, dt=dts, value=values)
+            os.replace(tmp, path)
+        except Exception:
+            log.exception('failed to flush the recorded values')
+
+
+def load_recorded(directory, start=None, end=None):
+    '''
+    Read the values flushed to the directory, between the `start` and
+    `end` dates if given, as a DataFrame indexed by timestamp
+    with a column per name.
+    '''
+    frames = []
+    for partition in sorted(glob.glob(os.path.join(directory, '*'))):
+        date = os.path.basename(partition)
+        if start is not None and date < pd.Timestamp(start).strftime(
+                '%Y-%m-%d'):
+            continue
+        if end is not None and date > pd.Timestamp(end).strftime(
+                '%Y-%m-%d'):
+            continue
+        for path in sorted(glob.glob(os.path.join(partition, '*.npz'))):
+            with np.load(path) as f:
+                frames.append(pd.DataFrame({
+                    'dt': pd.DatetimeIndex(f['dt'], tz='UTC'),
+                    'name': f['names'][f['name']],
+                    'value': f['value'],
+                }))
+    if not frames:
+        return pd.DataFrame()
+    records = pd.concat(frames, ignore_index=True)
+    records = records.drop_duplicates(['dt', 'name'], keep='last')
+    return records.pivot(index='dt', columns='name', values='value')
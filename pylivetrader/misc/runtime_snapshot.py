@@ -0,0 +1,149 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Snapshot of the runtime caches for a warm restart.
+
+The context is saved by the state store, but what the algorithm has
+fetched to run, such as the asset index of the whole broker universe and
+the pipeline outputs of the session, starts empty in a new process and
+is fetched again during the open. `RuntimeSnapshot` pickles those caches
+to a local file every `interval` seconds from a background thread and
+when the algorithm stops, and a restarted algorithm reloads them if the
+snapshot was taken in the same session against the same backend.
+
+The snapshot is only a cache: a missing, stale or broken one is ignored
+and the caches are fetched as usual.
+'''
+
+import hashlib
+import os
+import pickle
+import threading
+
+from logbook import Logger
+
+log = Logger('RuntimeSnapshot')
+
+
+SNAPSHOT_VERSION = 1
+
+DEFAULT_INTERVAL = 300
+
+
+def backend_identity(backend):
+    '''
+    A digest telling apart the backends, and the accounts of a backend,
+    so that a snapshot is not restored against another broker.
+    '''
+    cls = type(backend)
+    identity = getattr(backend, 'identity', None)
+    identity = '{}.{}:{}'.format(
+        cls.__module__, cls.__qualname__,
+        identity() if identity is not None else '')
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class RuntimeSnapshot:
+    '''
+    param: path: the snapshot file
+    param: interval: seconds between the background saves, None to save
+        only when stopped
+    '''
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._collect = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def save(self, key, caches):
+        '''Write the caches to the file, tagged with the key.'''
+        data = pickle.dumps({
+            'version': SNAPSHOT_VERSION,
+            'key': key,
+            'caches': caches,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+
+    def load(self, key):
+        '''
+        Return the caches saved with the same key, or None if there is
+        no such snapshot.
+        '''
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            log.warn('ignoring broken runtime snapshot {}: {}'.format(
+                self.path, e))
+            return None
+        if not isinstance(snapshot, dict) or \
+                snapshot.get('version') != SNAPSHOT_VERSION:
+            log.info('ignoring runtime snapshot {} of another version'.format(
+                self.path))
+            return None
+        if snapshot.get('key') != key:
+            log.info('ignoring runtime snapshot {} of another session '
+                     'or backend'.format(self.path))
+            return None
+        return snapshot['caches']
+
+    # background saves
+
+    def start(self, collect):
+        '''
+        Save every `interval` seconds in a background thread.
+
+        param: collect: function() returning the (key, caches) to save
+        '''
+        self._collect = collect
+        if self.interval is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='RuntimeSnapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''Stop the background saves and save once more.'''
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._collect is not None:
+            self._save_collected()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._save_collected()
+
+    def _save_collected(self):
+        try:
+            self.save(*self._collect())
+        except Exception as e:
+            log.warn('failed to save the runtime snapshot {}: {}'.format(
+                self.path, e))
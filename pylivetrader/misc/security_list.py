@@ -14,10 +14,12 @@
 # limitations under the License.
 
 import warnings
+from bisect import bisect_right
 from datetime import datetime
 from os import listdir
 import os.path
 
+import numpy as np
 import pandas as pd
 import pytz
 import pylivetrader
@@ -47,9 +49,12 @@ class SecurityList(object):
         self._knowledge_dates = self.make_knowledge_dates(self.data)
         self.current_date = current_date_func
         self.count = 0
-        self._current_set = set()
         self.asset_finder = asset_finder
 
+        # compiled on the first use, see _compile()
+        self._sid_index = None
+        self._bitmaps = None
+
     def make_knowledge_dates(self, data):
         knowledge_dates = sorted(
             [pd.Timestamp(k) for k in data.keys()])
@@ -74,40 +79,75 @@ class SecurityList(object):
         return item in self.current_securities(self.current_date())
 
     def current_securities(self, dt):
+        pos = self._knowledge_date_position(dt)
+        securities = self._cache.get(pos)
+        if securities is None:
+            bitmap = self._bitmaps[pos]
+            securities = self._cache[pos] = frozenset(
+                sid for sid, i in self._sid_index.items() if bitmap[i])
+        return securities
+
+    def contains(self, assets, dt):
+        """
+        Return the boolean array of whether each asset is in the list
+        on the dt.
+        """
+        bitmap = self._bitmaps[self._knowledge_date_position(dt)]
+        # the last entry is for the sids not in the list
+        index = [self._sid_index.get(asset.sid, -1) for asset in assets]
+        return bitmap[np.array(index, dtype=np.intp)]
+
+    def _knowledge_date_position(self, dt):
+        if self._bitmaps is None:
+            self._compile()
+        # the number of knowledge dates on or before dt
+        return bisect_right(self._knowledge_dates, dt)
+
+    def _compile(self):
+        """
+        Resolve the symbols once, and build the membership bitmap over
+        the sids of the list as of each knowledge date.
+        """
+        resolved = {}
+        changes = []
         for kd in self._knowledge_dates:
-            if dt < kd:
-                break
-            if kd in self._cache:
-                self._current_set = self._cache[kd]
-                continue
-
-            for effective_date, changes in iter(self.data[kd].items()):
-                self.update_current(
-                    effective_date,
-                    changes['add'],
-                    self._current_set.add
-                )
-
-                self.update_current(
-                    effective_date,
-                    changes['delete'],
-                    self._current_set.remove
-                )
-
-            self._cache[kd] = self._current_set
-        return self._current_set
-
-    def update_current(self, effective_date, symbols, change_func):
-        for symbol in symbols:
+            kd_changes = []
+            for effective_date, change in sorted(self.data[kd].items()):
+                for key, added in (('add', True), ('delete', False)):
+                    for symbol in change.get(key, ()):
+                        sid = self._resolve(symbol, effective_date, resolved)
+                        if sid is not None:
+                            kd_changes.append((sid, added))
+            changes.append(kd_changes)
+
+        sid_index = {}
+        for kd_changes in changes:
+            for sid, _ in kd_changes:
+                sid_index.setdefault(sid, len(sid_index))
+
+        bitmap = np.zeros(len(sid_index) + 1, dtype=bool)
+        bitmaps = [bitmap]
+        for kd_changes in changes:
+            bitmap = bitmap.copy()
+            for sid, added in kd_changes:
+                bitmap[sid_index[sid]] = added
+            bitmaps.append(bitmap)
+
+        self._sid_index = sid_index
+        self._bitmaps = bitmaps
+
+    def _resolve(self, symbol, effective_date, resolved):
+        key = (symbol, effective_date)
+        if key not in resolved:
             try:
-                asset = self.asset_finder.lookup_symbol(
+                resolved[key] = self.asset_finder.lookup_symbol(
                     symbol,
                     as_of_date=effective_date
-                )
+                ).sid
             # Pass if no Asset exists for the symbol
             except SymbolNotFound:
-                continue
-            change_func(asset.sid)
+                resolved[key] = None
+        return resolved[key]
 
 
 class SecurityListSet(object):
@@ -0,0 +1,154 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Run a pipeline over shards of the asset universe in a process pool.
+
+Each shard is computed by its own LivePipelineEngine in a worker process
+and the partial outputs are concatenated in symbol order. Pipelines are
+often built from classes defined in the algorithm file, which cannot be
+pickled by reference, so the workers are forked and inherit the pipeline
+through a module global instead of receiving it as an argument.
+
+A forked worker only gets the thread that forked it, and deadlocks on a
+lock another thread held at that moment. `ShardPool` forks all of its
+workers when it is created, which `attach_pipeline` does from the
+algorithm's thread in `initialize`, so that the pipelines computed later,
+from the background thread as well, do not fork any more.
+
+Since every shard only sees its own symbols, cross-sectional terms
+(rank, zscore, top, ...) are computed per shard. Those steps should be
+done on the merged output instead, e.g. with the `reduce` function of
+`attach_pipeline`.
+'''
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from logbook import Logger
+
+log = Logger('ShardedPipeline')
+
+
+_lock = threading.Lock()
+
+# the pipeline being computed, inherited by the forked workers
+_pipeline = None
+
+
+def _run_shard(symbols, pipeline=None):
+    from pipeline_live.engine import LivePipelineEngine
+
+    engine = LivePipelineEngine(lambda: symbols)
+    return engine.run_pipeline(pipeline if pipeline is not None else _pipeline)
+
+
+def split_shards(symbols, shards):
+    '''Split the sorted symbols into at most `shards` contiguous lists.'''
+    symbols = sorted(symbols)
+    size = -(-len(symbols) // max(shards, 1))
+    return [
+        symbols[i:i + size]
+        for i in range(0, len(symbols), size or 1)
+    ]
+
+
+def _fork_executor(max_workers):
+    if sys.version_info >= (3, 7):
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            return None
+        return ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=context)
+    if multiprocessing.get_start_method() != 'fork':
+        return None
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+class ShardPool:
+    '''
+    Worker processes forked once to compute the shards of a pipeline.
+
+    param: pipeline: the pipeline the workers compute
+    param: processes: number of workers, defaults to the number of CPUs
+    '''
+
+    def __init__(self, pipeline, processes=None):
+        global _pipeline
+
+        self.pipeline = pipeline
+        self.processes = processes or os.cpu_count() or 1
+        with _lock:
+            _pipeline = pipeline
+            try:
+                self._executor = _fork_executor(self.processes)
+                if self._executor is None:
+                    log.warn('fork is not available, pipeline shards '
+                             'will run sequentially')
+                else:
+                    # all of the workers are forked on the first
+                    # submission, while the pipeline is set
+                    futures = [self._executor.submit(os.getpid)
+                               for _ in range(self.processes)]
+                    for future in futures:
+                        future.result()
+            finally:
+                _pipeline = None
+
+    def run(self, symbols, shards):
+        '''
+        Compute the pipeline for `symbols` split into `shards`.
+
+        Return: pd.DataFrame indexed by symbol
+        '''
+        chunks = split_shards(symbols, shards)
+        if len(chunks) <= 1:
+            return _run_shard(chunks[0] if chunks else [], self.pipeline)
+        if self._executor is None:
+            return pd.concat([
+                _run_shard(chunk, self.pipeline) for chunk in chunks])
+        futures = [
+            self._executor.submit(_run_shard, chunk) for chunk in chunks]
+        return pd.concat([future.result() for future in futures])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def run_sharded_pipeline(pipeline, symbols, shards, processes=None):
+    '''
+    Compute the pipeline for `symbols` split into `shards` in a pool of
+    `processes` workers (defaults to the number of CPUs) forked for this
+    call only.
+
+    Return: pd.DataFrame indexed by symbol
+    '''
+    chunks = split_shards(symbols, shards)
+    if len(chunks) <= 1:
+        return _run_shard(chunks[0] if chunks else [], pipeline)
+
+    pool = ShardPool(
+        pipeline, min(processes or os.cpu_count() or 1, len(chunks)))
+    try:
+        return pool.run(symbols, shards)
+    finally:
+        pool.shutdown()
@@ -16,6 +16,7 @@
 
 from warnings import warn
 
+import numpy as np
 import pandas as pd
 
 from pylivetrader.assets import Asset
@@ -109,13 +110,91 @@ def _deprecated_getitem_method(name, attrs):
         """
         warn(msg.format(name=name, attr=key), DeprecationWarning, stacklevel=2)
         if key in attrs:
-            return self.__dict__[key]
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
         raise KeyError(key)
 
     return __getitem__
 
 
-class Order(Event):
+class _Slotted(object):
+    """
+    Base of the API objects. Their attributes are stored in slots, so
+    that the many of them built on each refresh do not allocate a dict
+    per instance. They pickle as a plain dict of the attributes, and can
+    be restored from the state of the former dict based objects.
+    """
+    __slots__ = ()
+
+    # the attributes to report and pickle, defaults to the slots
+    _fields = None
+
+    def _asdict(self):
+        values = {}
+        for name in self._fields or self.__slots__:
+            if name == '__dict__':
+                continue
+            try:
+                values[name] = getattr(self, name)
+            except AttributeError:
+                # not set
+                pass
+        extra = getattr(self, '__dict__', None)
+        if extra:
+            values.update(extra)
+        return values
+
+    def __getstate__(self):
+        return self._asdict()
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # (dict, slots) of the default protocol
+            merged = {}
+            for part in state:
+                if part:
+                    merged.update(part)
+            state = merged
+        for name, value in state.items():
+            try:
+                setattr(self, name, value)
+            except AttributeError:
+                # the attribute has been removed since it was stored
+                pass
+
+
+class Order(_Slotted):
+    # Slots for the attributes set by finance.order.Order.to_api_obj, and
+    # a dict for any other.
+    __slots__ = (
+        'id', 'dt', 'reason', 'created', 'amount', 'filled', 'commission',
+        'stop', 'limit', 'stop_reached', 'limit_reached', 'sid', 'status',
+        'broker_order_id', '__dict__',
+    )
+
+    def __init__(self, initial_values=None):
+        if initial_values:
+            for name, value in initial_values.items():
+                setattr(self, name, value)
+
+    def keys(self):
+        return self._asdict().keys()
+
+    def __eq__(self, other):
+        return isinstance(other, _Slotted) and \
+            self._asdict() == other._asdict()
+
+    def __contains__(self, name):
+        return hasattr(self, name)
+
+    def __repr__(self):
+        return "Event({0})".format(self._asdict())
+
+    def to_series(self, index=None):
+        return pd.Series(self._asdict(), index=index)
+
     # If you are adding new attributes, don't update this set. This method
     # is deprecated to normal attribute access so we don't want to encourage
     # new usages.
@@ -136,7 +215,11 @@ class Order(Event):
     )
 
 
-class Portfolio(object):
+class Portfolio(_Slotted):
+    __slots__ = (
+        'capital_used', 'starting_cash', 'portfolio_value', 'pnl', 'returns',
+        'cash', 'positions', 'start_date', 'positions_value',
+    )
 
     def __init__(self):
         self.capital_used = 0.0
@@ -150,7 +233,7 @@ class Portfolio(object):
         self.positions_value = 0.0
 
     def __repr__(self):
-        return "Portfolio({0})".format(self.__dict__)
+        return "Portfolio({0})".format(self._asdict())
 
     # If you are adding new attributes, don't update this set. This method
     # is deprecated to normal attribute access so we don't want to encourage
@@ -170,13 +253,22 @@ class Portfolio(object):
     )
 
 
-class Account(object):
+class Account(_Slotted):
     '''
     The account object tracks information about the trading account. The
     values are updated as the algorithm runs and its keys remain unchanged.
     If connected to a broker, one can update these values with the trading
     account values as reported by the broker.
     '''
+    __slots__ = (
+        'settled_cash', 'accrued_interest', 'buying_power',
+        'equity_with_loan', 'total_positions_value',
+        'total_positions_exposure', 'regt_equity', 'regt_margin',
+        'initial_margin_requirement', 'maintenance_margin_requirement',
+        'available_funds', 'excess_liquidity', 'cushion',
+        'day_trades_remaining', 'leverage', 'net_leverage',
+        'net_liquidation',
+    )
 
     def __init__(self):
         self.settled_cash = 0.0
@@ -198,7 +290,7 @@ class Account(object):
         self.net_liquidation = 0.0
 
     def __repr__(self):
-        return "Account({0})".format(self.__dict__)
+        return "Account({0})".format(self._asdict())
 
     # If you are adding new attributes, don't update this set. This method
     # is deprecated to normal attribute access so we don't want to encourage
@@ -226,14 +318,58 @@ class Account(object):
     )
 
 
-class Position(object):
+class Position(_Slotted):
+    __slots__ = (
+        'asset', '_amount', '_cost_basis', '_last_sale_price',
+        'last_sale_date', '_book',
+    )
+    _fields = (
+        'asset', 'amount', 'cost_basis', 'last_sale_price', 'last_sale_date',
+    )
 
-    def __init__(self, asset):
+    def __init__(self, asset, amount=0, cost_basis=0.0,
+                 last_sale_price=0.0, last_sale_date=None):
+        # the Positions whose arrays this position writes through to
+        self._book = None
         self.asset = asset
-        self.amount = 0
-        self.cost_basis = 0.0  # per share
-        self.last_sale_price = 0.0
-        self.last_sale_date = None
+        self.amount = amount
+        self.cost_basis = cost_basis  # per share
+        self.last_sale_price = last_sale_price
+        self.last_sale_date = last_sale_date
+
+    def __setstate__(self, state):
+        self._book = None
+        super(Position, self).__setstate__(state)
+
+    @property
+    def amount(self):
+        return self._amount
+
+    @amount.setter
+    def amount(self, value):
+        self._amount = value
+        if self._book is not None:
+            self._book._update(self, 'amount', value)
+
+    @property
+    def cost_basis(self):
+        return self._cost_basis
+
+    @cost_basis.setter
+    def cost_basis(self, value):
+        self._cost_basis = value
+        if self._book is not None:
+            self._book._update(self, 'cost_basis', value)
+
+    @property
+    def last_sale_price(self):
+        return self._last_sale_price
+
+    @last_sale_price.setter
+    def last_sale_price(self, value):
+        self._last_sale_price = value
+        if self._book is not None:
+            self._book._update(self, 'last_sale_price', value)
 
     @property
     def sid(self):
@@ -241,7 +377,7 @@ class Position(object):
         return self.asset
 
     def __repr__(self):
-        return "Position({0})".format(self.__dict__)
+        return "Position({0})".format(self._asdict())
 
     # If you are adding new attributes, don't update this set. This method
     # is deprecated to normal attribute access so we don't want to encourage
@@ -260,7 +396,11 @@ class Position(object):
 # Copied from Position and renamed.  This is used to handle cases where a user
 # does something like `context.portfolio.positions[100]` instead of
 # `context.portfolio.positions[sid(100)]`.
-class _DeprecatedSidLookupPosition(object):
+class _DeprecatedSidLookupPosition(_Slotted):
+    __slots__ = (
+        'sid', 'amount', 'cost_basis', 'last_sale_price', 'last_sale_date',
+    )
+
     def __init__(self, sid):
         self.sid = sid
         self.amount = 0
@@ -269,7 +409,7 @@ class _DeprecatedSidLookupPosition(object):
         self.last_sale_date = None
 
     def __repr__(self):
-        return "_DeprecatedSidLookupPosition({0})".format(self.__dict__)
+        return "_DeprecatedSidLookupPosition({0})".format(self._asdict())
 
     # If you are adding new attributes, don't update this set. This method
     # is deprecated to normal attribute access so we don't want to encourage
@@ -285,7 +425,46 @@ class _DeprecatedSidLookupPosition(object):
     )
 
 
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def _clone(position):
+    return Position(
+        position.asset,
+        amount=position.amount,
+        cost_basis=position.cost_basis,
+        last_sale_price=position.last_sale_price,
+        last_sale_date=position.last_sale_date,
+    )
+
+
 class Positions(dict):
+    """
+    Dict of Position by asset. The amount, cost basis and last sale price
+    of the positions are also kept in parallel arrays, which the Position
+    objects write through to, for the vectorized aggregates over the book.
+    A Position writes through to a single book, so a copy of the book, or
+    a book given a position held by another one, holds a copy of it.
+    """
+
+    _ARRAYS = ('amount', 'cost_basis', 'last_sale_price')
+
+    # set on the first insertion, also when unpickled from the former
+    # plain dict, which does not call __init__
+    _rows = None
+
+    def __init__(self, *args, **kwargs):
+        super(Positions, self).__init__()
+        self.update(*args, **kwargs)
+
+    def _init_arrays(self):
+        self._rows = {}
+        self._assets = []
+        self._arrays = {
+            name: np.empty(8, dtype=np.float64) for name in self._ARRAYS
+        }
+
     def __missing__(self, key):
         if isinstance(key, Asset):
             return Position(key)
@@ -297,3 +476,152 @@ class Positions(dict):
                  " instead.".format(type(key).__name__))
 
         return _DeprecatedSidLookupPosition(key)
+
+    # dict interface, keeping the arrays in sync
+
+    def __setitem__(self, key, position):
+        if isinstance(position, Position) and position._book is not None \
+                and position._book is not self and \
+                dict.get(position._book, position.asset) is position:
+            # the book holding it keeps the write-through, as after copy()
+            position = _clone(position)
+        if key in self:
+            self._remove(key)
+        super(Positions, self).__setitem__(key, position)
+        self._add(key, position)
+
+    def __delitem__(self, key):
+        super(Positions, self).__delitem__(key)
+        self._remove(key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super(Positions, self).pop(key, *default)
+        position = self[key]
+        del self[key]
+        return position
+
+    def popitem(self):
+        key, position = super(Positions, self).popitem()
+        self._remove(key)
+        return key, position
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, position in dict(*args, **kwargs).items():
+            self[key] = position
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+    def copy(self):
+        return Positions(self)
+
+    def __reduce__(self):
+        return (Positions, (dict(self),))
+
+    def _add(self, key, position):
+        if self._rows is None:
+            self._init_arrays()
+        row = len(self._assets)
+        if row == len(self._arrays['amount']):
+            for name, array in self._arrays.items():
+                grown = np.empty(row * 2, dtype=np.float64)
+                grown[:row] = array
+                self._arrays[name] = grown
+        self._rows[key] = row
+        self._assets.append(key)
+        for name in self._ARRAYS:
+            self._arrays[name][row] = _float(getattr(position, name, None))
+        if isinstance(position, Position):
+            position._book = self
+
+    def _remove(self, key):
+        # move the last row into the hole
+        row = self._rows.pop(key)
+        last = len(self._assets) - 1
+        if row != last:
+            moved = self._assets[last]
+            self._assets[row] = moved
+            self._rows[moved] = row
+            for array in self._arrays.values():
+                array[row] = array[last]
+        self._assets.pop()
+
+    def _update(self, position, name, value):
+        if self._rows is None:
+            return
+        row = self._rows.get(position.asset)
+        if row is not None and dict.get(self, position.asset) is position:
+            self._arrays[name][row] = _float(value)
+
+    # vectorized
+
+    @property
+    def assets(self):
+        if self._rows is None:
+            self._init_arrays()
+        return list(self._assets)
+
+    def array(self, name):
+        '''
+        The float array of 'amount', 'cost_basis' or 'last_sale_price' of
+        the positions, in the order of `assets`. Unknown values are NaN.
+        '''
+        if self._rows is None:
+            self._init_arrays()
+        return self._arrays[name][:len(self._assets)]
+
+    def amounts(self, assets):
+        '''The float array of the amounts held of the assets.'''
+        if self._rows is None:
+            self._init_arrays()
+        rows = self._rows
+        amount = self._arrays['amount']
+        return np.array([
+            amount[rows[asset]] if asset in rows else 0.0
+            for asset in assets
+        ], dtype=np.float64)
+
+    def _values(self):
+        # the last sale price, or the cost basis when not known
+        price = self.array('last_sale_price')
+        cost_basis = self.array('cost_basis')
+        price = np.where(np.isnan(price), cost_basis, price)
+        return self.array('amount') * price
+
+    @property
+    def market_value(self):
+        return float(np.nansum(self._values()))
+
+    @property
+    def net_exposure(self):
+        return self.market_value
+
+    @property
+    def gross_exposure(self):
+        return float(np.nansum(np.abs(self._values())))
+
+    @property
+    def long_exposure(self):
+        values = self._values()
+        return float(np.nansum(values[values > 0]))
+
+    @property
+    def short_exposure(self):
+        values = self._values()
+        return float(np.nansum(values[values < 0]))
+
+    @property
+    def cost_value(self):
+        return float(np.nansum(
+            self.array('amount') * self.array('cost_basis')))
+
+    @property
+    def unrealized_pnl(self):
+        return self.market_value - self.cost_value
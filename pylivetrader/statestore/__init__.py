@@ -20,6 +20,28 @@ import os
 VERSION_LABEL = '_stateversion_'
 CHECKSUM_KEY = '__state_checksum'
 
+STATE_FORMATS = ('pickle', 'columnar')
+
+
+def get_state_store(path, state_format='pickle'):
+    '''
+    Return the state store of the format, `pickle` for a single pickle
+    file, `columnar` for a directory with the large arrays memory-mapped
+    (look for pylivetrader.statestore.columnar).
+    '''
+    if state_format == 'pickle':
+        return StateStore(path)
+    if state_format == 'columnar':
+        from pylivetrader.statestore.columnar import ColumnarStateStore
+        return ColumnarStateStore(path)
+    raise ValueError('unknown state format {}'.format(state_format))
+
+
+def default_state_path(algoname, state_format='pickle'):
+    if state_format == 'pickle':
+        return '{}-state.pkl'.format(algoname)
+    return '{}-state'.format(algoname)
+
 
 class StateStore:
 
@@ -0,0 +1,273 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+State store keeping the large arrays of the context in separate files.
+
+The state is a directory. The numeric ndarrays, Series and DataFrames of
+the context, and their datetime and numeric indexes, are written as .npy
+blobs named by the hash of their content and memory-mapped on load. The
+rest of the context, the checksum and the references to the blobs are
+pickled into a small manifest, which is replaced atomically.
+
+A save writes only the blobs that are not on disk yet and skips the
+manifest if nothing changed, so its cost is hashing the arrays plus
+writing what changed, instead of pickling the whole context.
+'''
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from pylivetrader.statestore import CHECKSUM_KEY, VERSION_LABEL
+
+FORMAT_VERSION = 1
+
+MANIFEST = 'manifest.pkl'
+
+# arrays smaller than this stay in the manifest
+MIN_BLOB_BYTES = 1 << 16
+
+# bool, int, uint, float, complex, timedelta and datetime
+_BLOB_KINDS = 'biufcmM'
+
+
+def _blobbable(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in _BLOB_KINDS
+
+
+def _digest(array):
+    h = hashlib.sha1('{}{}'.format(array.dtype.str, array.shape).encode())
+    h.update(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+    return h.hexdigest()
+
+
+class ColumnarStateStore:
+    '''
+    param: path: the state directory
+    param: min_blob_bytes: arrays smaller than this are pickled
+    '''
+
+    def __init__(self, path, min_blob_bytes=MIN_BLOB_BYTES):
+        self.path = path
+        self.min_blob_bytes = min_blob_bytes
+        self._last_manifest = None
+        # digests of the blobs referenced by the manifest on disk
+        self._stored = None
+
+    def _blob_path(self, digest):
+        return os.path.join(self.path, digest + '.npy')
+
+    # encoding
+
+    def _array(self, array, blobs):
+        array = np.asarray(array)
+        if not _blobbable(array.dtype) or \
+                array.nbytes < self.min_blob_bytes:
+            return ('value', array)
+        digest = _digest(array)
+        blobs[digest] = array
+        return ('blob', digest)
+
+    def _index(self, index, blobs):
+        if isinstance(index, pd.DatetimeIndex):
+            return {
+                'type': 'datetimeindex',
+                'data': self._array(index.asi8, blobs),
+                'tz': index.tz,
+                'freq': index.freqstr,
+                'name': index.name,
+            }
+        if not isinstance(index, (pd.MultiIndex, pd.RangeIndex)) and \
+                _blobbable(index.dtype) and index.dtype.kind in 'iuf':
+            return {
+                'type': 'index',
+                'data': self._array(index.values, blobs),
+                'name': index.name,
+            }
+        return {'type': 'value', 'data': index}
+
+    def _encode(self, value, blobs):
+        if isinstance(value, np.ndarray) and _blobbable(value.dtype):
+            return {'type': 'ndarray', 'data': self._array(value, blobs)}
+
+        if isinstance(value, pd.Series) and _blobbable(value.dtype):
+            return {
+                'type': 'series',
+                'data': self._array(value.values, blobs),
+                'index': self._index(value.index, blobs),
+                'name': value.name,
+            }
+
+        if isinstance(value, pd.DataFrame) and value.columns.is_unique:
+            dtypes = set(value.dtypes)
+            if len(dtypes) == 1 and _blobbable(dtypes.pop()):
+                # a single block, restored without a copy
+                data = self._array(value.values, blobs)
+            else:
+                data = [
+                    self._array(column.values, blobs)
+                    if _blobbable(column.dtype)
+                    else ('value', column.reset_index(drop=True))
+                    for _, column in value.iteritems()
+                ]
+            return {
+                'type': 'frame',
+                'data': data,
+                'index': self._index(value.index, blobs),
+                'columns': value.columns,
+            }
+
+        return {'type': 'value', 'data': value}
+
+    # decoding
+
+    def _load_array(self, ref):
+        kind, data = ref
+        if kind == 'value':
+            return data
+        # copy-on-write, the algorithm may modify the restored arrays
+        return np.load(self._blob_path(data), mmap_mode='c')
+
+    def _load_index(self, spec):
+        if spec['type'] == 'datetimeindex':
+            index = pd.DatetimeIndex(
+                self._load_array(spec['data']), name=spec['name'])
+            if spec['tz'] is not None:
+                index = index.tz_localize('UTC').tz_convert(spec['tz'])
+            if spec.get('freq') is not None:
+                index = pd.DatetimeIndex(index, freq=spec['freq'])
+            return index
+        if spec['type'] == 'index':
+            return pd.Index(
+                self._load_array(spec['data']), name=spec['name'])
+        return spec['data']
+
+    def _decode(self, spec):
+        kind = spec['type']
+        if kind == 'value':
+            return spec['data']
+        if kind == 'ndarray':
+            return self._load_array(spec['data'])
+        if kind == 'series':
+            return pd.Series(
+                self._load_array(spec['data']),
+                index=self._load_index(spec['index']),
+                name=spec['name'],
+                copy=False)
+        if kind == 'frame':
+            index = self._load_index(spec['index'])
+            if isinstance(spec['data'], tuple):
+                return pd.DataFrame(
+                    self._load_array(spec['data']),
+                    index=index,
+                    columns=spec['columns'],
+                    copy=False)
+            frame = pd.DataFrame({
+                i: self._load_array(ref)
+                for i, ref in enumerate(spec['data'])
+            }, columns=range(len(spec['data'])))
+            frame.index = index
+            frame.columns = spec['columns']
+            return frame
+        raise ValueError('unknown state field type {}'.format(kind))
+
+    # StateStore interface
+
+    def save(self, context, checksum, exclude_list):
+        fields_to_store = sorted(set(context.__dict__.keys()) -
+                                 set(exclude_list))
+
+        blobs = {}
+        fields = {}
+        for field in fields_to_store:
+            fields[field] = self._encode(getattr(context, field), blobs)
+
+        manifest = pickle.dumps({
+            VERSION_LABEL: FORMAT_VERSION,
+            CHECKSUM_KEY: checksum,
+            'fields': fields,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        # the blob digests are in the manifest
+        if manifest == self._last_manifest:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        for digest, array in blobs.items():
+            path = self._blob_path(digest)
+            if (self._stored is not None and digest in self._stored) or \
+                    os.path.exists(path):
+                continue
+            tmp = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+
+        path = os.path.join(self.path, MANIFEST)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(manifest)
+        os.replace(tmp, path)
+        self._last_manifest = manifest
+
+        if self._stored != set(blobs):
+            self._remove_unused(blobs)
+            self._stored = set(blobs)
+
+    def _remove_unused(self, used):
+        for name in os.listdir(self.path):
+            if name.endswith('.npy') and name[:-4] not in used:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def load(self, context, checksum):
+        path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'rb') as f:
+            try:
+                manifest = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError, IndexError):
+                raise ValueError("Corrupt state file: {}".format(path))
+
+        if CHECKSUM_KEY not in manifest or \
+                manifest[CHECKSUM_KEY] != checksum:
+            raise ValueError(
+                "Checksum mismatch during state load. "
+                "The given state file was not created "
+                "for the algorithm in use")
+
+        try:
+            loaded_state = {
+                k: self._decode(spec)
+                for k, spec in manifest['fields'].items()
+            }
+        except (OSError, ValueError, KeyError) as e:
+            raise ValueError("Corrupt state file: {}: {}".format(
+                self.path, e))
+
+        self._stored = {
+            name[:-4] for name in os.listdir(self.path)
+            if name.endswith('.npy')
+        }
+
+        for k, v in loaded_state.items():
+            setattr(context, k, v)
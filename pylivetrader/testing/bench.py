@@ -0,0 +1,247 @@
+#
+# Copyright 2018 Alpaca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Reproducible performance runs of an algorithm.
+
+The algorithm runs against the smoke backend and the fake time clock
+for a number of past sessions, on synthesic or recorded bars, and the
+run reports the handle_data latency percentiles, the backend call
+counts, the cache hit rates and the peak RSS.
+'''
+
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from pylivetrader.algorithm import Algorithm
+from pylivetrader.executor.executor import AlgorithmExecutor
+from pylivetrader.loader import get_algomodule_by_path, get_api_functions
+from pylivetrader.misc.api_context import LiveTraderAPI
+from pylivetrader.testing.smoke import backend as smoke_backend
+from pylivetrader.testing.smoke.clock import FaketimeClock
+from pylivetrader.testing.smoke.harness import DefaultPipelineHooker
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+PERCENTILES = (50, 90, 99)
+
+
+class CountingProxy:
+    '''
+    Proxy to an object (the backend, the data portal) which counts the
+    calls and property reads made through it.
+    '''
+
+    def __init__(self, target):
+        self._target = target
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name.startswith('_'):
+            return value
+        if callable(value):
+            calls = self.calls
+
+            def counted(*args, **kwargs):
+                calls[name] += 1
+                return value(*args, **kwargs)
+            return counted
+        self.calls[name] += 1
+        return value
+
+
+class _Timer:
+
+    def __init__(self):
+        self.samples = []
+
+    def wrap(self, f):
+        samples = self.samples
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        samples = np.array(self.samples) * 1e3
+        out = {'count': len(samples)}
+        if len(samples) == 0:
+            return out
+        out['mean'] = float(samples.mean())
+        for p, v in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+            out['p{}'.format(p)] = float(v)
+        out['max'] = float(samples.max())
+        return out
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss / 1024
+
+
+def _cache_stats(requests, fetches):
+    return {
+        'requests': requests,
+        'fetches': fetches,
+        'hit_rate': (
+            max(requests - fetches, 0) / requests if requests else None),
+    }
+
+
+def run_bench(algofile, sessions=1, universe=50, data=None,
+              data_frequency='minute'):
+    '''
+    Run the algorithm file for `sessions` past sessions and return the
+    report as a dict.
+
+    param: algofile: path to the algorithm
+    param: sessions: number of sessions to simulate, ending at the last
+        close before now, or at the end of the recorded data
+    param: universe: number of synthesic stocks
+    param: data: directory of recorded minute bars, one <SYMBOL>.csv per
+        stock, replayed instead of the synthesic data
+    param: data_frequency: 'minute' or 'daily'
+    '''
+    backend = smoke_backend.Backend(size=universe, data=data)
+    calendar = backend._data_proxy._cal
+    end = None
+    if data is not None:
+        last = backend._data_proxy.last_minute
+        end = calendar.session_close(
+            calendar.minute_to_session_label(last, direction='previous'))
+    clock = FaketimeClock(
+        calendar, minute_emission=data_frequency == 'minute', end=end)
+    if sessions > 1:
+        clock.rollback(sessions - 1)
+    backend._clock = backend._data_proxy._clock = clock
+    counting = CountingProxy(backend)
+
+    functions = get_api_functions(get_algomodule_by_path(algofile))
+    with tempfile.TemporaryDirectory() as tmp:
+        algo = Algorithm(
+            backend=counting,
+            data_frequency=data_frequency,
+            algoname=os.path.basename(algofile).rsplit('.', 1)[0],
+            statefile=os.path.join(tmp, 'state.pkl'),
+            **functions
+        )
+        if data_frequency == 'daily':
+            clock.daily_bar_offset = algo.daily_bar_offset
+        hooker = DefaultPipelineHooker()
+        algo.pipeline_output = lambda name: hooker.output(algo, name)
+
+        # what the algorithm asks the data portal for, against what the
+        # backend is asked for
+        requests = CountingProxy(algo.data_portal)
+        for name in ('get_spot_value', 'get_history_window'):
+            setattr(algo.data_portal, name, getattr(requests, name))
+
+        handle_data = _Timer()
+        before_trading_start = _Timer()
+        start = time.perf_counter()
+        with LiveTraderAPI(algo):
+            algo._assets_from_source = \
+                algo.asset_finder.retrieve_all(algo.asset_finder.sids)
+            algo.initialize()
+            executor = algo.executor = AlgorithmExecutor(
+                algo, algo.data_portal, clock=clock)
+            executor.every_bar = handle_data.wrap(executor.every_bar)
+            executor.before_trading_start = before_trading_start.wrap(
+                executor.before_trading_start)
+            executor.run()
+        wall_time = time.perf_counter() - start
+
+    return {
+        'algo': algofile,
+        'sessions': sessions,
+        'universe': len(backend.get_equities()),
+        'data': data or 'synthesic',
+        'data_frequency': data_frequency,
+        'wall_time': wall_time,
+        'latency_ms': {
+            'handle_data': handle_data.summary(),
+            'before_trading_start': before_trading_start.summary(),
+        },
+        'backend_calls': dict(counting.calls),
+        'cache': {
+            'spot_value': _cache_stats(
+                requests.calls['get_spot_value'],
+                counting.calls['get_spot_value']),
+            'history': _cache_stats(
+                requests.calls['get_history_window'],
+                counting.calls['get_bars']),
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _fmt(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return '{:.3f}'.format(value)
+    return str(value)
+
+
+def format_report(report):
+    '''Format the report of `run_bench()` as text lines.'''
+    lines = [
+        'algo: {algo}  sessions: {sessions}  universe: {universe}  '
+        'data: {data} ({data_frequency})'.format(**report),
+        'wall time: {:.2f} s  peak RSS: {} MB'.format(
+            report['wall_time'], _fmt(report['peak_rss_mb'])),
+        '',
+        '{:<22} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+            'latency (ms)', 'count', 'mean', 'p50', 'p90', 'p99', 'max'),
+    ]
+    for name, stats in report['latency_ms'].items():
+        lines.append('{:<22} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+            name, stats['count'],
+            *(_fmt(stats.get(k))
+              for k in ('mean', 'p50', 'p90', 'p99', 'max'))))
+
+    lines += ['', '{:<22} {:>7}'.format('backend call', 'count')]
+    for name, count in sorted(
+            report['backend_calls'].items(), key=lambda kv: -kv[1]):
+        lines.append('{:<22} {:>7}'.format(name, count))
+
+    lines += [
+        '',
+        '{:<22} {:>9}'.format('cache', 'hit rate'),
+    ]
+    for name, stats in report['cache'].items():
+        lines.append('{:<22} {:>9}  ({} requests, {} fetches)'.format(
+            name, _fmt(stats['hit_rate']),
+            stats['requests'], stats['fetches']))
+    return lines
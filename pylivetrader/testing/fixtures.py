@@ -5,7 +5,7 @@ from pylivetrader.data.data_portal import DataPortal
 from pylivetrader.assets import AssetFinder
 from pylivetrader.assets import Equity
 from pylivetrader.misc.pd_utils import normalize_date
-from trading_calendars import get_calendar
+from pylivetrader.misc.calendar_snapshot import get_calendar
 
 
 def get_fixture_data_portal(**kwargs):
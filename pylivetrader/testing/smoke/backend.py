@@ -7,10 +7,11 @@ from pylivetrader.finance.order import (
     Order as ZPOrder,
 )
 from pylivetrader.backend.base import BaseBackend
+import os
 import pandas as pd
 import numpy as np
 import string
-from trading_calendars import get_calendar
+from pylivetrader.misc.calendar_snapshot import get_calendar
 
 from logbook import Logger
 
@@ -69,16 +70,18 @@ class Backend(BaseBackend):
     The price data is supplied by fake data generator.
     '''
 
-    def __init__(self, cash=1e6, size=50, clock=None):
+    def __init__(self, cash=1e6, size=50, clock=None, data=None):
         '''
         paramters:
             cash: initial cash balance
             size: the number of stocks in universe
             clock: soft clock
+            data: directory of recorded minute bars to replay instead of
+                  the synthesic data (see RecordedDataBackend)
         '''
         self._account = zp.Account()
         self._account.buying_power = cash
-        self._account.total_position_value = 0
+        self._account.total_positions_value = 0
         self._portfolio = zp.Portfolio()
         self._portfolio.cash = cash
         self._portfolio.positions = self._positions = zp.Positions()
@@ -87,7 +90,10 @@ class Backend(BaseBackend):
         self._clock = clock
         self._last_process_time = None
 
-        self._data_proxy = FakeDataBackend(size=size, clock=clock)
+        if data is not None:
+            self._data_proxy = RecordedDataBackend(data, clock=clock)
+        else:
+            self._data_proxy = FakeDataBackend(size=size, clock=clock)
 
     @property
     def now(self):
@@ -111,7 +117,7 @@ class Backend(BaseBackend):
             return
         volume = price * order.amount
         self._portfolio.cash -= volume
-        self._account.cash = self._portfolio.cash
+        self._account.settled_cash = self._portfolio.cash
         self._account.buying_power -= volume
 
         if new_amount == 0:
@@ -135,9 +141,8 @@ class Backend(BaseBackend):
             if _check_fill(order, price_df):
                 self._fill(order, price_df.close.values[-1])
 
-        posval = self._portfolio.positions_value = sum([
-            p.cost_basis * p.amount for p in self._positions.values()
-        ])
+        posval = self._portfolio.positions_value = \
+            self._positions.cost_value
         self._portfolio.portfolio_value = self._portfolio.cash + posval
         self._last_process_time = self.now
 
@@ -312,3 +317,58 @@ class FakeDataBackend:
         if self._clock is not None:
             return self._clock.now
         return pd.Timestamp.now(tz='America/New_York')
+
+
+class RecordedDataBackend(FakeDataBackend):
+    '''A data backend that replays recorded minute bars instead of the
+    synthesic ones. The universe is the CSV files in the directory, one
+    per symbol (e.g. AAPL.csv), with a timestamp index (UTC unless
+    given) and open, high, low, close and volume columns.
+    '''
+
+    def __init__(self, path, clock=None):
+        self._recorded = {}
+        for name in sorted(os.listdir(path)):
+            if not name.endswith('.csv'):
+                continue
+            df = pd.read_csv(
+                os.path.join(path, name), index_col=0, parse_dates=True)
+            if df.index.tz is None:
+                df.index = df.index.tz_localize('utc')
+            self._recorded[name[:-4]] = df.tz_convert('America/New_York')
+        if not self._recorded:
+            raise ValueError('no recorded bars in {}'.format(path))
+        super().__init__(size=len(self._recorded), clock=clock)
+
+    @property
+    def last_minute(self):
+        '''The last recorded minute.'''
+        return max(df.index[-1] for df in self._recorded.values())
+
+    def get_equities(self):
+        return [
+            Equity(
+                sid=i + 1,
+                symbol=symbol,
+                asset_name=symbol,
+                exchange='NYSE',
+                start_date=pd.Timestamp('1970-01-01', tz='utc'),
+                end_date=pd.Timestamp('2050-01-01', tz='utc'),
+            ) for i, symbol in enumerate(self._recorded)
+        ]
+
+    def _populate_missing(self, assets, data_frequency):
+        bars = self._fake_bars[data_frequency]
+        for asset in assets:
+            if asset in bars:
+                continue
+            df = self._recorded[asset.symbol]
+            if data_frequency == '1d':
+                df = df.resample('1D').agg({
+                    'open': 'first',
+                    'high': 'max',
+                    'low': 'min',
+                    'close': 'last',
+                    'volume': 'sum',
+                }).dropna()
+            bars[asset] = df
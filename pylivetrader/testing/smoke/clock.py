@@ -1,5 +1,6 @@
 import pandas as pd
-from trading_calendars import get_calendar
+
+from pylivetrader.misc.calendar_snapshot import get_calendar
 
 BAR = 0
 SESSION_START = 1
@@ -21,21 +22,29 @@ class FaketimeClock(object):
             'America/New_York'),
         minute_emission=True,
         time_skew=None,
+        end=None,
+        daily_bar_offset=None,
     ):
+        '''
+        end: the last minute to simulate, defaults to the previous close
+        daily_bar_offset: emit a single bar per session this long before
+                          the close (see RealtimeClock)
+        '''
         if calendar is None:
             calendar = get_calendar('NYSE')
         self.calendar = calendar
         self.before_trading_start_minute = before_trading_start_minute
         self.minute_emission = minute_emission
+        self.daily_bar_offset = daily_bar_offset
         self._last_emit = None
         self._before_trading_start_bar_yielded = False
 
-        now = pd.Timestamp.utcnow()
-        prev_close = calendar.previous_close(now)
+        if end is None:
+            end = calendar.previous_close(pd.Timestamp.utcnow())
 
-        current = self._set_before_trading_start(prev_close)
+        current = self._set_before_trading_start(end)
         self._current_time = current
-        self._fake_end = prev_close
+        self._fake_end = end
 
     def _set_before_trading_start(self, t):
         start_minute = self.before_trading_start_minute
@@ -60,6 +69,7 @@ class FaketimeClock(object):
                   before_trading_start_minute=None,
                   minute_emission=None,
                   current_time=None,
+                  daily_bar_offset=None,
                   ):
         if calendar is not None:
             self._calendar = calendar
@@ -69,6 +79,8 @@ class FaketimeClock(object):
             self.minute_emission = minute_emission
         if current_time is not None:
             self._current_time = current_time
+        if daily_bar_offset is not None:
+            self.daily_bar_offset = daily_bar_offset
 
     @property
     def end_time(self):
@@ -89,7 +101,12 @@ class FaketimeClock(object):
         current_session = None
 
         while True:
-            server_time = self._next()
+            try:
+                server_time = self._next()
+            except StopIteration:
+                # a StopIteration raised in a generator is a RuntimeError
+                # since PEP 479
+                return
 
             session_label = server_time.floor('1D')
             if not self.calendar.is_session(session_label):
@@ -101,6 +118,7 @@ class FaketimeClock(object):
                 yield session_label, SESSION_START
                 current_session = session_label
                 self._before_trading_start_bar_yielded = False
+                self._daily_bar_yielded = False
 
             delta = pd.Timedelta(
                 hours=self.before_trading_start_minute[0].hour,
@@ -124,6 +142,17 @@ class FaketimeClock(object):
             elif server_time < session_open:
                 # sleep(1)
                 pass
+            elif (session_open <= server_time < session_close and
+                    self.daily_bar_offset is not None):
+                if (not self._daily_bar_yielded and
+                        server_time >=
+                        session_close - self.daily_bar_offset):
+                    self._last_emit = server_time
+                    self._daily_bar_yielded = True
+                    yield server_time, BAR
+                else:
+                    # sleep(1)
+                    pass
             elif (session_open <= server_time < session_close):
                 if (self._last_emit is None or
                         server_time - self._last_emit >=
@@ -135,12 +164,17 @@ class FaketimeClock(object):
                 else:
                     # sleep(1)
                     pass
-            elif server_time == session_close:
+            elif (server_time == session_close and
+                    self._last_emit != server_time):
                 self._last_emit = server_time
-                yield server_time, BAR
-                if self.minute_emission:
-                    yield server_time, MINUTE_END
+                if not self._daily_bar_yielded:
+                    yield server_time, BAR
+                    if self.minute_emission:
+                        yield server_time, MINUTE_END
                 yield server_time, SESSION_END
+            elif server_time == session_close:
+                # sleep(1)
+                pass
             elif server_time > session_close:
                 # sleep(1)
                 pass
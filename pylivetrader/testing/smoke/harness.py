@@ -4,6 +4,7 @@ from unittest.mock import patch
 
 from pylivetrader.algorithm import Algorithm
 from pylivetrader.misc.api_context import LiveTraderAPI
+from pylivetrader.misc.profiler import SamplingProfiler
 from . import clock, backend
 
 
@@ -42,16 +43,33 @@ def noop(*args, **kwargs):
     pass
 
 
-def run_smoke(algo, before_run_hook=None, pipeline_hook=None):
+def run_smoke(algo, before_run_hook=None, pipeline_hook=None,
+              profile=None, profile_interval=0.01):
+    '''
+    profile: directory to write the sampling profile of the run to
+             (see pylivetrader.misc.profiler)
+    profile_interval: seconds between the samples of the profile
+    '''
     fake_clock = clock.FaketimeClock()
     # fake_clock.rollback(1)
     be = backend.Backend(clock=fake_clock)
 
+    profiler = None
+    if profile is not None:
+        algofile = getattr(algo, '__file__', None)
+        profiler = SamplingProfiler(
+            profile,
+            name=getattr(algo, '__name__', 'algo').rsplit('.', 1)[-1],
+            interval=profile_interval,
+            user_files=[algofile] if algofile else [],
+        )
+
     a = Algorithm(
         initialize=getattr(algo, 'initialize', noop),
         handle_data=getattr(algo, 'handle_data', noop),
         before_trading_start=getattr(algo, 'before_trading_start', noop),
         backend=be,
+        profiler=profiler,
     )
 
     if pipeline_hook is not None:
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def cache_dir(tmp_path_factory):
+    # keep the calendar snapshots out of ~/.cache/pylivetrader
+    saved = os.environ.get('PYLIVETRADER_CACHE_DIR')
+    os.environ['PYLIVETRADER_CACHE_DIR'] = str(
+        tmp_path_factory.mktemp('cache'))
+    yield
+    if saved is None:
+        del os.environ['PYLIVETRADER_CACHE_DIR']
+    else:
+        os.environ['PYLIVETRADER_CACHE_DIR'] = saved
@@ -19,6 +19,7 @@ import pytest
 import pandas as pd
 
 from pylivetrader.errors import (
+    CircuitBreakerOpen,
     SymbolNotFound,
     OrderDuringInitialize,
     TradingControlViolation,
@@ -28,10 +29,20 @@ import pylivetrader.protocol as proto
 from pylivetrader.misc import events
 from pylivetrader.algorithm import Algorithm
 from pylivetrader.executor.executor import AlgorithmExecutor
+from pylivetrader.executor.realtimeclock import (
+    BAR, SESSION_START, BEFORE_TRADING_START_BAR,
+)
 from pylivetrader.misc.api_context import LiveTraderAPI
 from pylivetrader.loader import get_functions
+from pylivetrader.misc.recorder import load_recorded
+
+from unittest.mock import Mock, patch
 
-from unittest.mock import Mock
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # the algorithms save their state to the working directory by default
+    monkeypatch.chdir(tmp_path)
 
 
 def get_algo(script, **kwargs):
@@ -109,6 +120,58 @@ def before_trading_start(ctx, data):
     assert algo.recorded_vars['value'] == 1
 
 
+def test_recorded_history():
+    algo = get_algo('''
+def handle_data(ctx, data):
+    record(value=2, label='x')
+    ctx.history = recorded_history('value')
+    ''')
+
+    simulate_init_and_handle(algo)
+
+    assert algo.recorded_vars['label'] == 'x'
+    assert list(algo.history) == [2]
+    assert algo.history.index[0] == algo.get_datetime()
+
+
+def test_recorded_on_exit(tmp_path):
+    algo = get_algo('''
+def handle_data(ctx, data):
+    record(value=1)
+    ''', record_dir=str(tmp_path / 'records'))
+    algo.initialize()
+    algo._assets_from_source = []
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor = AlgorithmExecutor(
+        algo, algo.data_portal, clock=[(minute, BAR)])
+    executor.run()
+
+    # written when the executor stops, before the flush interval
+    assert list(load_recorded(str(tmp_path / 'records'))['value']) == [1]
+
+
+def test_executor_survives_open_breaker():
+    algo = get_algo('''
+def handle_data(ctx, data):
+    ctx.bars = getattr(ctx, 'bars', 0) + 1
+    ''')
+
+    def before_trading_start(ctx, data):
+        raise CircuitBreakerOpen(endpoint='trading', retry_in=10)
+    algo._before_trading_start = before_trading_start
+    algo.initialize()
+    algo._assets_from_source = []
+    session = pd.Timestamp('2018-08-13', tz='UTC')
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor = AlgorithmExecutor(algo, algo.data_portal, clock=[
+        (session, SESSION_START),
+        (minute - pd.Timedelta('45min'), BEFORE_TRADING_START_BAR),
+        (minute, BAR),
+    ])
+    executor.run()
+    assert algo.bars == 1
+
+
 def test_datetime_bad_params():
     algo = get_algo("""
 from pytz import timezone
@@ -273,6 +336,103 @@ def initialize(ctx):
     algo.order(algo.sid('asset-1'), 1)
 
 
+def test_batch_order_controls():
+
+    algo = get_algo('''
+def initialize(ctx):
+    set_long_only()
+    set_max_order_size(max_shares=10)
+    ''')
+
+    simulate_init_and_handle(algo)
+
+    class portfolio:
+        portfolio_value = 1000.0
+        positions = proto.Positions()
+
+    class order:
+        id = 'oid'
+
+    submitted = []
+
+    def batch_order(args):
+        submitted.extend(args)
+        return [order() for _ in args]
+
+    algo._backend.portfolio = portfolio
+    algo._backend.batch_order = batch_order
+
+    asset0, asset1 = algo.sid('asset-0'), algo.sid('asset-1')
+
+    # nothing is placed when an order of the list violates a control
+    with pytest.raises(TradingControlViolation):
+        algo.batch_order([(asset0, 1), (asset1, -1)])
+    with pytest.raises(TradingControlViolation):
+        algo.batch_market_order(pd.Series([1.0, 11.0], index=[asset0, asset1]))
+    assert submitted == []
+
+    assert algo.batch_order([(asset0, 1), (asset1, 0), (asset1, 2.0)]) == [
+        'oid', None, 'oid']
+    assert [(a, amount) for a, amount, _ in submitted] == [
+        (asset0, 1), (asset1, 2)]
+
+
+def test_order_target_portfolio():
+
+    algo = get_algo('''
+def initialize(ctx):
+    set_max_order_size(sid('asset-0'), max_shares=60)
+    ''')
+
+    simulate_init_and_handle(algo)
+
+    asset0, asset1, asset2 = [
+        algo.sid('asset-{}'.format(i)) for i in range(3)]
+
+    positions = proto.Positions()
+    positions[asset1] = proto.Position(asset1)
+    positions[asset1].amount = 50
+
+    class portfolio:
+        portfolio_value = 1000000.0
+
+    portfolio.positions = positions
+
+    class order:
+
+        def __init__(self, asset):
+            self.id = asset.sid
+
+    batches = []
+
+    def batch_order(args):
+        batches.append([(a, amount) for a, amount, _ in args])
+        return [order(a) for a, _, _ in args]
+
+    algo._backend.portfolio = portfolio
+    algo._backend.batch_order = batch_order
+
+    prices = algo.executor.current_data.current(
+        [asset0, asset1, asset2], 'price')
+    weights = pd.Series([0.5, 0.0, 0.25], index=[asset0, asset1, asset2])
+
+    # asset0 exceeds the max order size
+    with pytest.raises(TradingControlViolation):
+        algo.order_target_portfolio(weights)
+    assert batches == []
+
+    weights[asset0] = 0.04
+    result = algo.order_target_portfolio(weights)
+    expected0 = int(40000.0 / prices[asset0])
+    expected2 = int(250000.0 / prices[asset2])
+    # sells first
+    assert batches == [
+        [(asset1, -50)],
+        [(asset0, expected0), (asset2, expected2)],
+    ]
+    assert result == {a: a.sid for a in (asset0, asset1, asset2)}
+
+
 def test_post_init():
     algo = get_algo('')
 
@@ -315,6 +475,58 @@ def handle_data(ctx, data):
         algo.initialize()
 
 
+def test_state_restore_columnar(tmp_path):
+    script = '''
+import numpy as np
+
+def handle_data(ctx, data):
+    ctx.value = 1
+    ctx.history = np.arange(100000)
+    '''
+    statefile = str(tmp_path / 'algo-state')
+    algo = get_algo(script, statefile=statefile, state_format='columnar')
+    simulate_init_and_handle(algo)
+    assert (tmp_path / 'algo-state' / 'manifest.pkl').exists()
+
+    algo = get_algo(script, statefile=statefile, state_format='columnar')
+    algo.initialize()
+    assert algo.value == 1
+    assert algo.history[-1] == 99999
+
+
+def test_runtime_snapshot(tmp_path):
+    script = '''
+def initialize(ctx):
+    attach_pipeline(ctx.pipe, 'mock')
+    '''
+    output = pd.DataFrame([[42.0]], index=['ASSET0'], columns=['close'])
+    options = dict(
+        statefile=str(tmp_path / 'algo-state.pkl'),
+        runtime_snapshot=str(tmp_path / 'runtime.pkl'),
+    )
+
+    def run(self):
+        algo = self.algo
+        algo._pipeline_cache['mock'] = (algo._pipeline_session(), output)
+
+    algo = get_algo(script, **options)
+    algo.pipe = Mock()
+    with patch.object(AlgorithmExecutor, 'run', run):
+        algo.run()
+    assert (tmp_path / 'runtime.pkl').exists()
+
+    # restarted in the same session
+    algo = get_algo(script, **options)
+    algo.pipe = Mock()
+    algo._backend.get_equities = Mock(wraps=algo._backend.get_equities)
+    with patch.object(AlgorithmExecutor, 'run'):
+        algo.run()
+    assert algo._backend.get_equities.call_count == 0
+    assert algo.asset_finder.retrieve_asset('asset-0').symbol == 'ASSET0'
+    with LiveTraderAPI(algo):
+        assert algo.pipeline_output('mock')['close'][0] == 42.0
+
+
 def test_pipeline():
     algo = get_algo('')
     pipe = Mock()
@@ -345,6 +557,92 @@ def test_pipeline():
     res = algo.pipeline_output('mock')
     assert res.index[0].symbol == 'ASSET0'
 
+    # memoized in the session
+    res['close'] = 0
+    res = algo.pipeline_output('mock')
+    assert res['close'][0] == 42.0
+    assert eng.run_pipeline.call_count == 1
+
+    algo.refresh_pipeline('mock')
+    algo.pipeline_output('mock')
+    assert eng.run_pipeline.call_count == 2
+
+    algo.on_dt_changed(pd.Timestamp('2018-08-14 13:31', tz='UTC'))
+    algo.pipeline_output('mock')
+    assert eng.run_pipeline.call_count == 3
+
+    del sys.modules[pkg]
+
+
+def test_pipeline_background():
+    import sys
+    import threading
+
+    algo = get_algo('', pipeline_background=True)
+    algo.attach_pipeline(Mock(), 'eager')
+    algo.attach_pipeline(Mock(), 'lazy', eager=False)
+
+    pkg = 'pipeline_live.engine'
+    mod = Mock()
+    sys.modules[pkg] = mod
+
+    threads = []
+
+    def run_pipeline(pipe):
+        threads.append(threading.current_thread())
+        return pd.DataFrame([[42.0]], index=['ASSET0'], columns=['close'])
+
+    eng = mod.LivePipelineEngine.return_value
+    eng.run_pipeline.side_effect = run_pipeline
+
+    algo.on_dt_changed(pd.Timestamp('2018-08-14', tz='UTC'))
+    algo.start_pipelines()
+    _, future = algo._pipeline_futures['eager']
+    future.result()
+    assert 'lazy' not in algo._pipeline_futures
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+
+    algo.on_dt_changed(pd.Timestamp('2018-08-14 13:31', tz='UTC'))
+    res = algo.pipeline_output('eager')
+    assert res.index[0].symbol == 'ASSET0'
+    algo.pipeline_output('lazy')
+    assert eng.run_pipeline.call_count == 2
+    assert threads[1] is threading.current_thread()
+    # the engine is created once
+    assert mod.LivePipelineEngine.call_count == 1
+
+    del sys.modules[pkg]
+
+
+def test_pipeline_shards():
+    import sys
+
+    algo = get_algo('', pipeline_processes=4)
+    pipe = Mock()
+
+    def run_sharded(symbols, shards):
+        assert shards == 2
+        return pd.DataFrame(
+            {'close': [3.0, 2.0, 1.0]}, index=symbols)
+
+    with patch('pylivetrader.algorithm.ShardPool') as pool:
+        pool.return_value.run.side_effect = run_sharded
+        algo.attach_pipeline(
+            pipe, 'sharded', shards=2,
+            reduce=lambda df: df[df['close'] > 1].sort_values('close'))
+    # the workers are forked when the pipeline is attached
+    pool.assert_called_once_with(pipe, 2)
+
+    pkg = 'pipeline_live.engine'
+    sys.modules[pkg] = Mock()
+
+    res = algo.pipeline_output('sharded')
+    assert pool.return_value.run.call_count == 1
+    assert [a.symbol for a in res.index] == ['ASSET1', 'ASSET0']
+    # the engine of the unsharded pipelines is not created
+    assert sys.modules[pkg].LivePipelineEngine.call_count == 0
+
     del sys.modules[pkg]
 
 
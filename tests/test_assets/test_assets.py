@@ -57,3 +57,41 @@ def test_asset():
     assert asset.is_alive_for_session(pd.Timestamp('2018/08/13', tz='UTC'))
 
     assert not asset.is_alive_for_session(pd.Timestamp('2018/08/10', tz='UTC'))
+
+
+def test_exchange_calendar():
+    from trading_calendars import get_calendar, register_calendar_alias
+    from pylivetrader.assets import (
+        intern_calendar, bind_exchange_calendars, exchanges_open,
+    )
+    from pylivetrader.misc.calendar_cache import SessionCalendar
+
+    register_calendar_alias('TEST-ARCA', 'NYSE', force=True)
+    assets = [
+        Asset('asset-0', 'NYSE', symbol='A'),
+        Asset('asset-1', 'TEST-ARCA', symbol='B'),
+        Asset('asset-2', 'CME', symbol='C'),
+        Asset('asset-3', 'TEST-UNKNOWN', symbol='D'),
+    ]
+    bind_exchange_calendars(assets)
+
+    # aliases share one handle
+    nyse = intern_calendar(get_calendar('NYSE'))
+    assert isinstance(nyse, SessionCalendar)
+    assert assets[0].exchange_calendar is nyse
+    assert assets[1].exchange_calendar is nyse
+    assert assets[2].exchange_calendar is not nyse
+    assert intern_calendar(nyse) is nyse
+    assert assets[3]._exchange_calendar is None
+    assets = assets[:3]
+
+    # CME is open on sunday evening, NYSE is not
+    dt = pd.Timestamp('2018/08/12 20:00', tz='America/New_York')
+    assert exchanges_open(assets, dt) == [False, False, True]
+    assert [a.is_exchange_open(dt) for a in assets] == [False, False, True]
+
+    # the handle is not pickled, and bound again on use
+    import pickle
+    asset = pickle.loads(pickle.dumps(assets[1]))
+    assert '_exchange_calendar' not in asset.__dict__
+    assert asset.exchange_calendar is nyse
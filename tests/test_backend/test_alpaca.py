@@ -3,12 +3,14 @@ from unittest.mock import Mock, patch
 from requests.exceptions import HTTPError
 import pytest
 import pandas as pd
+import time
 import numpy as np
 
 from alpaca_trade_api.entity import Asset, Account, Position, Order
 from alpaca_trade_api.polygon.entity import Aggs, Trade
 from alpaca_trade_api.rest import APIError
 
+from pylivetrader.backend.ratelimit import EndpointLimiter
 from pylivetrader.misc.api_context import LiveTraderAPI
 from pylivetrader.finance.execution import (
     MarketOrder,
@@ -38,8 +40,76 @@ def test_skip_http_error():
         internal_server_error()
 
 
-def test_orders():
+def test_parallelize_deadline():
+    def fetch(symbol):
+        if symbol == 'SLOW':
+            time.sleep(1)
+        return symbol.lower()
+
+    start = time.time()
+    res = alpaca.parallelize(fetch, deadline=time.time() + 0.1)(
+        ['A', 'SLOW', 'B'])
+    assert time.time() - start < 0.5
+    assert res['A'] == 'a'
+    assert res['B'] == 'b'
+    assert res['SLOW'] is alpaca.MISSING
+
+    def fail(symbol):
+        raise ValueError(symbol)
+
+    with pytest.raises(ValueError):
+        alpaca.parallelize(fail, deadline=time.time() + 1)(['A'])
+
+
+def test_parallelize_hedge():
+    limiter = EndpointLimiter('test')
+    for _ in range(limiter.latency.min_samples):
+        limiter.latency.add(0.01)
+
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        # only the first request of SLOW stalls
+        if symbol == 'SLOW' and calls.count(symbol) == 1:
+            time.sleep(1)
+        return symbol.lower()
+
+    start = time.time()
+    res = alpaca.parallelize(fetch, limiter=limiter, hedge=True)(
+        ['A', 'SLOW', 'B'])
+    assert time.time() - start < 0.5
+    assert res == {'A': 'a', 'SLOW': 'slow', 'B': 'b'}
+    assert calls.count('SLOW') == 2
+    assert calls.count('A') == 1
+
+
+def test_missed_deadline():
     backend = alpaca.Backend('key-id', 'secret-key')
+    # off by default
+    assert backend._bar_deadline() is None
+    assert not backend._hedge
+    assert backend.missed_deadline() == frozenset()
+
+    def last_trade(symbol):
+        if symbol == 'SLOW':
+            time.sleep(1)
+        return Mock(price=1.0)
+
+    with patch.object(backend._api, 'polygon') as polygon, \
+            patch.object(backend, '_bar_deadline',
+                         return_value=time.time() + 0.1):
+        polygon.last_trade = last_trade
+        assets = [Mock(symbol='A'), Mock(symbol='SLOW')]
+        prices = backend.get_spot_value(assets, 'price', None, None)
+    assert prices[0] == 1.0
+    assert np.isnan(prices[1])
+    assert backend.missed_deadline() == {'SLOW'}
+
+
+def test_orders():
+    backend = alpaca.Backend(
+        'key-id', 'secret-key', rate_limits={'trading': {'rate': 1000}})
     with patch.object(backend, '_api') as _api:
         _api.list_assets.return_value = [
             Asset({'id': 'bcfdb21a-760c-44a6-a3af-6264851b5c1b',
@@ -223,10 +293,36 @@ def test_orders():
 
             backend.cancel_order('some-id')
 
+            # submitted concurrently, in the order of the arguments
+            _api.submit_order.reset_mock()
+            res = backend.batch_order([
+                (aapl, i + 1, MarketOrder()) for i in range(5)])
+            assert len(res) == 5
+            assert _api.submit_order.call_count == 5
+            assert sorted(
+                c[1]['qty'] for c in _api.submit_order.call_args_list
+            ) == [1, 2, 3, 4, 5]
+
             # order submission fail
             _api.submit_order.side_effect = APIError({'message': 'test'})
             res = backend.order(aapl, -1, MarketOrder())
             assert res is None
+            assert backend.batch_order([(aapl, -1, MarketOrder())]) == [None]
+
+            # any error fails only its own order
+            placed = _api.submit_order.return_value
+
+            def submit_order(qty, **kwargs):
+                if qty == 2:
+                    raise ConnectionError('connection reset')
+                if qty == 3:
+                    raise APIError({'message': 'test'})
+                return placed
+
+            _api.submit_order.side_effect = submit_order
+            res = backend.batch_order([
+                (aapl, i + 1, MarketOrder()) for i in range(4)])
+            assert [o is not None for o in res] == [True, False, False, True]
 
 
 def test_data():
@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from requests.exceptions import ConnectionError, HTTPError
+
+from pylivetrader.backend.circuitbreaker import (
+    CircuitBreaker, CLOSED, OPEN, HALF_OPEN,
+)
+from pylivetrader.backend.ratelimit import EndpointLimiter, RateLimiter
+from pylivetrader.errors import CircuitBreakerOpen
+
+
+def http_error(status):
+    response = Mock()
+    response.status_code = status
+    return HTTPError(response=response)
+
+
+def test_circuit_breaker_trial_call():
+    breaker = CircuitBreaker(
+        'test', min_calls=4, failure_rate=0.5, reset_timeout=0.05)
+    for failed in (False, True, False):
+        breaker.before_call()
+        breaker.on_failure() if failed else breaker.on_success()
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    with pytest.raises(CircuitBreakerOpen) as e:
+        breaker.before_call()
+    assert 'test calls are failing' in str(e.value)
+
+    time.sleep(0.06)
+    assert not breaker.is_open
+    # one trial call at a time
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitBreakerOpen):
+        breaker.before_call()
+    # failed, open twice as long
+    breaker.on_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.is_open
+    time.sleep(0.05)
+    breaker.before_call()
+    breaker.on_success()
+    assert breaker.state == CLOSED
+    assert not breaker.is_open
+
+
+def test_circuit_breaker_probe():
+    probed = threading.Event()
+    probe = Mock(side_effect=[ConnectionError(), None])
+
+    def run_probe():
+        try:
+            return probe()
+        finally:
+            if probe.call_count == 2:
+                probed.set()
+
+    breaker = CircuitBreaker(
+        'test', min_calls=2, reset_timeout=0.01, probe=run_probe)
+    breaker.on_failure()
+    breaker.on_failure()
+    assert breaker.state == OPEN
+    assert probed.wait(1)
+    for _ in range(100):
+        if breaker.state == CLOSED:
+            break
+        time.sleep(0.01)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_endpoint_limiter_breaker():
+    limiter = EndpointLimiter(
+        'test', rate=1000, max_retries=5, retry_wait=0.001,
+        circuit_breaker=dict(min_calls=3, reset_timeout=60))
+
+    # errors the endpoint answered do not count
+    func = Mock(side_effect=http_error(404))
+    for _ in range(5):
+        with pytest.raises(HTTPError):
+            limiter.call(func)
+    assert limiter.breaker.state == CLOSED
+
+    rates = RateLimiter()
+    rates._families['test'] = limiter
+    assert rates.is_alive()
+
+    # the retries stop once half of the calls in the window failed
+    func = Mock(side_effect=http_error(503))
+    with pytest.raises(CircuitBreakerOpen):
+        limiter.call(func)
+    assert func.call_count == 5
+    assert not rates.is_alive()
+
+    func = Mock(return_value='ok')
+    with pytest.raises(CircuitBreakerOpen):
+        limiter.call(func)
+    assert func.call_count == 0
+    assert limiter.concurrency.inflight == 0
+
+    limiter = EndpointLimiter('test', circuit_breaker=False)
+    assert limiter.breaker is None
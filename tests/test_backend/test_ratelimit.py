@@ -0,0 +1,147 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from requests.exceptions import HTTPError, ConnectionError
+
+from pylivetrader.backend import alpaca
+from pylivetrader.backend.ratelimit import (
+    TokenBucket, AdaptiveConcurrency, EndpointLimiter, RateLimiter,
+    status_of,
+)
+
+
+def http_error(status, headers=None):
+    return HTTPError(response=Mock(status_code=status, headers=headers or {}))
+
+
+def test_status_of():
+    assert status_of(http_error(429)) == 429
+    assert status_of(ConnectionError()) == 0
+    assert status_of(ValueError()) is None
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=5)
+    start = time.time()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 tokens of burst, then 10 more at 100/s
+    assert time.time() - start >= 0.09
+
+    bucket.pause(0.05)
+    start = time.time()
+    bucket.acquire()
+    assert time.time() - start >= 0.04
+
+
+def test_adaptive_concurrency():
+    c = AdaptiveConcurrency(initial=4, max_limit=6)
+
+    for _ in range(20):
+        c.acquire()
+        c.release(0.01)
+    assert c.limit == 6
+    assert c.baseline == pytest.approx(0.01)
+
+    c.release(0.01, throttled=True)
+    assert c.limit == 3
+    # the next failure within the same round trip is ignored
+    c.release(0.01, throttled=True)
+    assert c.limit == 3
+
+    time.sleep(0.02)
+    c.release(0.5)
+    assert c.limit == pytest.approx(2.7)
+
+    # limit caps the calls in flight
+    c = AdaptiveConcurrency(initial=2)
+    c.acquire()
+    c.acquire()
+    acquired = threading.Event()
+
+    def third():
+        c.acquire()
+        acquired.set()
+
+    t = threading.Thread(target=third)
+    t.start()
+    assert not acquired.wait(0.05)
+    c.release(0.01)
+    assert acquired.wait(1)
+    t.join()
+
+
+def test_endpoint_limiter_retry():
+    limiter = EndpointLimiter('test', rate=1000, retry_wait=0.001)
+
+    func = Mock(side_effect=[
+        http_error(429, {'Retry-After': '0.01'}),
+        http_error(504),
+        'ok',
+    ])
+    assert limiter.call(func, 'a', b=1) == 'ok'
+    assert func.call_count == 3
+    func.assert_called_with('a', b=1)
+    assert limiter.concurrency.inflight == 0
+
+    # not retryable
+    func = Mock(side_effect=http_error(404))
+    with pytest.raises(HTTPError):
+        limiter.call(func)
+    assert func.call_count == 1
+
+    # nor taken for a fast success
+    limit = limiter.concurrency.limit
+    baseline = limiter.concurrency.baseline
+    for _ in range(10):
+        with pytest.raises(HTTPError):
+            limiter.call(func)
+    assert limiter.concurrency.limit == limit
+    assert limiter.concurrency.baseline == baseline
+
+    # retries exhausted
+    func = Mock(side_effect=http_error(503))
+    with pytest.raises(HTTPError):
+        limiter.call(func)
+    assert func.call_count == limiter.max_retries + 1
+
+    func = Mock(side_effect=[http_error(503), 'ok'])
+    with pytest.raises(HTTPError):
+        limiter.call_once(func)
+    assert func.call_count == 1
+    assert limiter.concurrency.inflight == 0
+
+
+def test_rate_limiter_shared():
+    limiter = RateLimiter({'polygon': {'max_concurrency': 3}, 'other': {}})
+    assert limiter.get('polygon') is limiter.get('polygon')
+    assert limiter.get('polygon').max_concurrency == 3
+    assert limiter.get('other').bucket is None
+    assert limiter.call('trading', lambda x: x * 2, 2) == 4
+
+
+def test_parallelize_with_limiter():
+    limiter = EndpointLimiter('test', concurrency=2, max_concurrency=4)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(symbol):
+        with lock:
+            running.append(symbol)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(symbol)
+        return symbol.lower()
+
+    def fetch(symbol):
+        return limiter.call(work, symbol)
+
+    symbols = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+    result = alpaca.parallelize(fetch, limiter=limiter)(symbols)
+    assert result == {s: s.lower() for s in symbols}
+    assert max(peak) <= 4
+    assert alpaca.parallelize(fetch, limiter=limiter)([]) == {}
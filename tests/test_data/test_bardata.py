@@ -72,9 +72,25 @@ def test_bardata():
         end_date=pd.Timestamp('2018/08/13', tz='UTC'),
     )
     assert data.can_trade(asset_to_check)
+    assert data.can_trade([asset_to_check]).all()
     assert not data.is_stale(asset_to_check)
 
     data.datetime = pd.Timestamp('2018-08-14', tz='UTC')
     assert not data.can_trade(asset_to_check)
+    assert not data.can_trade([asset_to_check]).any()
     # when asset is not tradable, return false
     assert not data.is_stale(asset_to_check)
+
+
+def test_is_missing():
+    portal = get_fixture_data_portal()
+
+    asset0 = portal.asset_finder.retrieve_asset('asset-0')
+    asset2 = portal.asset_finder.retrieve_asset('asset-2')
+
+    data = BarData(portal, 'minute')
+
+    assert not data.is_missing(asset0)
+    portal.backend.missed_deadline = lambda: frozenset(['ASSET0'])
+    assert data.is_missing(asset0)
+    assert list(data.is_missing([asset0, asset2])) == [True, False]
@@ -0,0 +1,134 @@
+import time
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pandas as pd
+
+from pylivetrader.data.shared_cache import (
+    SharedMarketDataCache, DataDaemon, RETIRED,
+)
+from pylivetrader.testing.fixtures import get_fixture_data_portal
+
+
+def test_trade_roundtrip(tmpdir):
+    cache = SharedMarketDataCache(str(tmpdir))
+
+    assert cache.read_trade('AAPL') is None
+    assert cache.subscriptions()['trade'] == {'AAPL': 1}
+
+    ts = pd.Timestamp('2018-08-13 10:00', tz='America/New_York')
+    cache.write_trade('AAPL', 207.5, ts)
+    cache.write_trade('BRK.B', np.nan, None)
+
+    reader = SharedMarketDataCache(str(tmpdir))
+    price, dt = reader.read_trade('AAPL')
+    assert price == 207.5
+    assert dt == ts
+    assert str(dt.tz) == 'America/New_York'
+
+    price, dt = reader.read_trade('BRK.B')
+    assert np.isnan(price)
+    assert dt is pd.NaT
+
+
+def test_bars_grow(tmpdir):
+    writer = SharedMarketDataCache(str(tmpdir))
+    reader = SharedMarketDataCache(str(tmpdir))
+
+    index = pd.date_range(
+        '2018-08-13 13:31', periods=10, freq='1min', tz='UTC')
+    df = pd.DataFrame({
+        'open': np.arange(10.),
+        'high': np.arange(10.) + 1,
+        'low': np.arange(10.) - 1,
+        'close': np.arange(10.) + .5,
+        'volume': np.full(10, 100.),
+    }, index=index)
+
+    writer.write_bars('AAPL', '1m', df.iloc[:4])
+    bars = reader.read_bars('AAPL', '1m', 3)
+    assert list(bars.close) == [1.5, 2.5, 3.5]
+    assert list(bars.index) == list(index[1:4])
+    # not enough bars
+    assert reader.read_bars('AAPL', 'minute', 5) is None
+    old = reader._readers[writer._path('minute', 'AAPL')]
+
+    # does not fit the capacity, so the segment is replaced
+    writer.write_bars('AAPL', '1m', df)
+    assert old.seq == RETIRED
+    bars = reader.read_bars('AAPL', '1m', 10)
+    np.testing.assert_array_equal(bars.values, df[bars.columns].values)
+    assert list(bars.index) == list(index)
+
+    # daily bars are kept apart
+    assert reader.read_bars('AAPL', '1d', 1) is None
+
+
+def test_data_portal_with_daemon(tmpdir):
+    data_portal = get_fixture_data_portal()
+    backend = data_portal.backend
+    backend.get_last_trades = Mock(side_effect=lambda assets: {
+        asset: Mock(price=12.5, timestamp=pd.Timestamp(
+            '2018-08-13 15:59', tz='UTC'))
+        for asset in assets
+    })
+    asset0 = data_portal.asset_finder.retrieve_asset('asset-0')
+    asset1 = data_portal.asset_finder.retrieve_asset('asset-1')
+
+    data_portal.shared_cache = SharedMarketDataCache(str(tmpdir))
+    daemon = DataDaemon(backend, SharedMarketDataCache(str(tmpdir)))
+
+    # nothing is published yet, so it goes to the backend
+    assert data_portal.get_spot_value(asset0, 'price', None, '1m') == 789
+    expected = data_portal.get_history_window(
+        [asset0, asset1], None, 10, '1m', 'close', 'minute')
+
+    subscriptions = daemon.run_once()
+    assert subscriptions['trade'] == {'ASSET0': 1}
+    assert subscriptions['minute'] == {'ASSET0': 10, 'ASSET1': 10}
+
+    backend.get_bars = Mock(side_effect=backend.get_bars)
+    data_portal.cache_clear()
+
+    assert data_portal.get_spot_value(asset0, 'price', None, '1m') == 12.5
+    assert data_portal.get_spot_value(
+        asset0, 'last_traded', None, '1m') == pd.Timestamp(
+            '2018-08-13 15:59', tz='UTC')
+
+    values = data_portal.get_history_window(
+        [asset0, asset1], None, 10, '1m', 'close', 'minute')
+    assert backend.get_bars.call_count == 0
+    np.testing.assert_array_equal(values.values, expected.values)
+    assert list(values.columns) == [asset0, asset1]
+
+    # partially published
+    asset2 = data_portal.asset_finder.retrieve_asset('asset-2')
+    values = data_portal.get_history_window(
+        [asset0, asset2], None, 10, '1m', 'close', 'minute')
+    assert backend.get_bars.call_count == 1
+    assert backend.get_bars.call_args[0][0] == [asset2]
+    assert list(values.columns) == [asset0, asset2]
+
+    # the trades read in one pass, the misses fetched in one request
+    backend.get_spot_value = Mock(side_effect=backend.get_spot_value)
+    prices = data_portal.get_spot_value(
+        [asset0, asset2, asset1], 'price', None, '1m')
+    assert prices[0] == 12.5
+    assert backend.get_spot_value.call_count == 1
+    assert backend.get_spot_value.call_args[0][0] == [asset2, asset1]
+
+
+def test_read_does_not_wait(tmpdir):
+    writer = SharedMarketDataCache(str(tmpdir))
+    reader = SharedMarketDataCache(str(tmpdir))
+    # published and followed since a past minute
+    past_ns = int((time.time() - 120) * 1e9)
+    with patch('pylivetrader.data.shared_cache._now_ns',
+               return_value=past_ns):
+        writer.write_trade(
+            'AAPL', 1.0, pd.Timestamp('2018-08-13', tz='UTC'))
+        assert reader.read_trade('AAPL')[0] == 1.0
+
+    started = time.time()
+    assert reader.read_trades(['AAPL', 'MSFT']) == [None, None]
+    assert time.time() - started < 0.5
@@ -0,0 +1,75 @@
+from unittest.mock import Mock
+
+import pandas as pd
+
+from pylivetrader.data.bardata import BarData
+from pylivetrader.data.snapshot import BarSnapshot
+from pylivetrader.testing.fixtures import get_fixture_data_portal
+
+
+def test_bar_snapshot():
+    calls = []
+
+    def fetch(assets, field, dt, data_frequency):
+        calls.append(assets)
+        if isinstance(assets, list):
+            return [len(calls)] * len(assets)
+        return len(calls)
+
+    portfolio = Mock(side_effect=lambda: object())
+    snapshot = BarSnapshot('dt', fetch, portfolio, lambda: 'account')
+
+    assert snapshot.get_spot_value('A', 'price', 'dt', 'minute') == 1
+    assert snapshot.get_spot_value('A', 'price', 'dt', 'minute') == 1
+    # only the assets not seen yet are fetched
+    assert snapshot.get_spot_value(
+        ['A', 'B', 'C'], 'price', 'dt', 'minute') == [1, 2, 2]
+    assert snapshot.get_spot_value('C', 'price', 'dt', 'minute') == 2
+    assert snapshot.get_spot_value('C', 'volume', 'dt', 'minute') == 3
+    assert calls == ['A', ['B', 'C'], 'C']
+
+    assert snapshot.portfolio is snapshot.portfolio
+    assert portfolio.call_count == 1
+    assert snapshot.account == 'account'
+
+
+def test_snapshot_with_account():
+    fetch = Mock(return_value=1)
+    snapshot = BarSnapshot('dt', fetch)
+    first = snapshot.with_account(lambda: 'p1', lambda: 'a1')
+    second = snapshot.with_account(lambda: 'p2', lambda: 'a2')
+
+    # the spot values are shared, the portfolio and account are not
+    assert first.get_spot_value('A', 'price', 'dt', 'minute') == 1
+    assert second.get_spot_value('A', 'price', 'dt', 'minute') == 1
+    assert fetch.call_count == 1
+    assert (first.portfolio, first.account) == ('p1', 'a1')
+    assert (second.portfolio, second.account) == ('p2', 'a2')
+    assert first.with_account(lambda: 'p3', None).portfolio == 'p3'
+    assert snapshot.requests() == {('price', 'minute'): {'A'}}
+
+
+def test_data_portal_snapshot():
+    data_portal = get_fixture_data_portal()
+    backend = data_portal.backend
+    backend.get_spot_value = Mock(wraps=backend.get_spot_value)
+    assets = data_portal.asset_finder.retrieve_all(
+        ['asset-0', 'asset-1', 'asset-2'])
+
+    data = BarData(data_portal, 'minute')
+    data.datetime = pd.Timestamp('2018-08-13 14:00', tz='UTC')
+
+    data_portal.snapshot = BarSnapshot(
+        data.datetime, data_portal.fetch_spot_value)
+    price = data.current(assets[0], 'price')
+    prices = data.current(assets, 'price')
+    assert prices[assets[0]] == price
+    assert data.can_trade(assets).all()
+    assert data.can_trade(assets[1])
+    assert backend.get_spot_value.call_count == 2
+
+    # without the snapshot, every read is a round trip
+    data_portal.snapshot = None
+    data.current(assets, 'price')
+    data.current(assets, 'price')
+    assert backend.get_spot_value.call_count == 4
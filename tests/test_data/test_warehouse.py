@@ -0,0 +1,153 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pylivetrader.data.data_portal import DataPortal
+from pylivetrader.data.warehouse import BarWarehouse
+from pylivetrader.assets import AssetFinder
+from pylivetrader.testing.fixtures import Backend
+
+
+class CountingBackend(Backend):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+    def get_bars(self, assets, data_frequency, bar_count=500):
+        self.requests.append((len(assets), bar_count))
+        return super().get_bars(assets, data_frequency, bar_count=bar_count)
+
+
+def test_restart_fetches_tail(tmpdir):
+    backend = CountingBackend()
+    assets = backend.get_equities()
+    end_dt = pd.Timestamp('2018-08-14 20:00', tz='UTC')
+
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    bars = warehouse.get_bars(backend, assets, 'minute', 100, end_dt)
+    assert backend.requests == [(3, 100)]
+    assert len(bars) == 100
+    warehouse.flush()
+    assert os.path.exists(
+        tmpdir.join('minute', '2018-08-14', 'ASSET0.npy').strpath)
+
+    # a restarted algorithm
+    backend.requests = []
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    restarted = warehouse.get_bars(backend, assets, 'minute', 100, end_dt)
+    assert len(backend.requests) == 1
+    assert backend.requests[0][1] <= 4
+    assert (restarted.values == bars.values).all()
+    assert restarted.index.equals(bars.index)
+
+    # more bars than kept on disk
+    backend.requests = []
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    warehouse.get_bars(backend, assets, 'minute', 500, end_dt)
+    assert backend.requests == [(3, 500)]
+
+
+def test_daily(tmpdir):
+    backend = CountingBackend()
+    assets = backend.get_equities()
+    end_dt = pd.Timestamp('2018-08-14 19:55', tz='UTC')
+
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    bars = warehouse.get_bars(backend, assets, '1d', 2, end_dt)
+    warehouse.flush()
+    assert os.path.exists(
+        tmpdir.join('daily', '2018', 'ASSET0.npy').strpath)
+
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    restarted = warehouse.get_bars(backend, assets, '1d', 2, end_dt)
+    assert backend.requests[-1][1] < 2 + 2
+    assert (restarted.values == bars.values).all()
+
+
+def test_evict(tmpdir):
+    backend = Backend()
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    for partition in ('minute/2018-07-01', 'minute/2018-08-13',
+                      'daily/2014', 'daily/2018'):
+        tmpdir.join(partition).ensure(dir=True)
+
+    warehouse.evict(pd.Timestamp('2018-08-20', tz='UTC'))
+    assert sorted(os.listdir(tmpdir.join('minute').strpath)) == [
+        '2018-08-13']
+    assert sorted(os.listdir(tmpdir.join('daily').strpath)) == ['2018']
+
+
+def test_data_portal(tmpdir):
+    backend = CountingBackend()
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    data_portal = DataPortal(
+        backend, AssetFinder(backend), backend._calendar,
+        warehouse=warehouse)
+    asset = data_portal.asset_finder.retrieve_asset('asset-0')
+    end_dt = pd.Timestamp('2018-08-14 20:00', tz='UTC')
+
+    values = data_portal.get_history_window(
+        [asset], end_dt, 10, '1m', 'close', 'minute')
+    assert len(values) == 10
+    assert values[asset].iloc[-1] == 780 + 10 - 1
+
+    data_portal.cache_clear()
+    data_portal.get_history_window(
+        [asset], end_dt + pd.Timedelta(minutes=1), 10, '1m', 'close',
+        'minute')
+    assert backend.requests[-1][1] < 10
+
+
+class SparseBackend(CountingBackend):
+    '''ASSET1 trades every other minute.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        asset = self.get_equities()[1]
+        self._minutely_bars[asset] = self._minutely_bars[asset].iloc[::2]
+
+
+def test_sparse_bars(tmpdir):
+    backend = SparseBackend()
+    assets = backend.get_equities()
+    end_dt = pd.Timestamp('2018-08-14 20:00', tz='UTC')
+
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    bars = warehouse.get_bars(backend, assets, 'minute', 100, end_dt)
+    warehouse.flush()
+    # the minutes only the other assets traded in are not kept
+    data = np.load(
+        tmpdir.join('minute', '2018-08-14', 'ASSET1.npy').strpath)
+    assert len(data[0]) == 100 - 1
+    assert not np.isnan(data[1:].view(np.float64)).any()
+
+    # and do not make the tail look short of the bars kept
+    backend.requests = []
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar)
+    restarted = warehouse.get_bars(backend, assets, 'minute', 100, end_dt)
+    assert len(backend.requests) == 1
+    assert backend.requests[0][1] < 10
+    assert restarted[assets[1]].dropna(how='all').equals(
+        bars[assets[1]].dropna(how='all'))
+
+
+def test_flush_in_background(tmpdir):
+    backend = Backend()
+    assets = backend.get_equities()
+    end_dt = pd.Timestamp('2018-08-14 20:00', tz='UTC')
+    warehouse = BarWarehouse(str(tmpdir), backend._calendar, flush_interval=0)
+
+    flushed = threading.Event()
+    threads = []
+
+    def flush():
+        threads.append(threading.current_thread())
+        flushed.set()
+    warehouse.flush = flush
+
+    warehouse.get_bars(backend, assets, 'minute', 10, end_dt)
+    assert flushed.wait(5)
+    assert threads[0] is not threading.current_thread()
@@ -0,0 +1,202 @@
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pytest
+
+from pylivetrader.algorithm import Algorithm
+from pylivetrader.api import symbol
+from pylivetrader.assets import AssetFinder
+from pylivetrader.data.data_portal import DataPortal
+from pylivetrader.errors import CircuitBreakerOpen
+from pylivetrader.executor.multi import MultiAlgorithmExecutor
+from pylivetrader.executor.realtimeclock import (
+    BAR, SESSION_START, BEFORE_TRADING_START_BAR
+)
+from pylivetrader.loader import get_functions
+from pylivetrader.misc.recorder import load_recorded
+from pylivetrader.testing.fixtures import Backend
+
+
+SCRIPT = '''
+def initialize(ctx):
+    ctx.asset = symbol({symbol!r})
+    ctx.prices = []
+    ctx.events = []
+
+def before_trading_start(ctx, data):
+    ctx.events.append('before_trading_start')
+
+def handle_data(ctx, data):
+    ctx.prices.append(data.current(ctx.asset, 'price'))
+'''
+
+
+def make_algos(tmp_path, backend, portal, symbols):
+    # the market data of `backend`, each on its own account
+    return [
+        Algorithm(
+            backend=Backend(),
+            data_portal=portal,
+            algoname='algo{}'.format(i),
+            statefile=str(tmp_path / 'algo{}-state.pkl'.format(i)),
+            **get_functions(SCRIPT.format(symbol=symbol)))
+        for i, symbol in enumerate(symbols)
+    ]
+
+
+def test_multi_algorithm_executor(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(
+        tmp_path, backend, portal, ['ASSET0', 'ASSET1', 'ASSET0'])
+    assert all(algo.asset_finder is portal.asset_finder for algo in algos)
+    assert all(algo.trading_calendar is algos[0].trading_calendar
+               for algo in algos)
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    session = pd.Timestamp('2018-08-13', tz='UTC')
+    minutes = pd.date_range(
+        '2018-08-13 13:31', periods=3, freq='1min', tz='UTC')
+    executor.clock = [
+        (session, SESSION_START),
+        (minutes[0] - pd.Timedelta('45min'), BEFORE_TRADING_START_BAR),
+    ] + [(m, BAR) for m in minutes]
+
+    with patch.object(
+            backend, 'get_spot_value', wraps=backend.get_spot_value) as spot:
+        executor.run()
+
+    for algo in algos:
+        assert algo.initialized
+        assert algo.executor.current_data.datetime == minutes[-1]
+        assert algo.events == ['before_trading_start']
+        assert len(algo.prices) == 3
+    assert algos[0].prices == algos[2].prices
+    assert algos[0].prices != algos[1].prices
+
+    # the first bar fetches what each algorithm asks for, the next
+    # ones fetch the union of the previous bar up front
+    calls = [c[0][0] for c in spot.call_args_list]
+    assert len(calls) == 2 + 1 + 1
+    assert all(isinstance(assets, list) for assets in calls[2:])
+    assert {a.symbol for a in calls[-1]} == {'ASSET0', 'ASSET1'}
+
+
+def test_multi_algorithm_executor_isolation(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(tmp_path, backend, portal, ['ASSET0', 'ASSET1'])
+
+    def fail(ctx, data):
+        raise ValueError('broken algorithm')
+    algos[0]._handle_data = fail
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor.clock = [(minute, BAR)]
+    executor.run()
+    assert len(algos[1].prices) == 1
+
+    other = Algorithm(backend=backend, data_frequency='daily')
+    with pytest.raises(ValueError):
+        MultiAlgorithmExecutor([algos[0], other], portal)
+
+
+def test_multi_algorithm_executor_prefetch(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(tmp_path, backend, portal, ['ASSET0'])
+
+    # ASSET1 is read on the first bar only
+    def handle_data(ctx, data):
+        ctx.prices.append(data.current(ctx.asset, 'price'))
+        if len(ctx.prices) == 1:
+            data.current(symbol('ASSET1'), 'price')
+    algos[0]._handle_data = handle_data
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    minutes = pd.date_range(
+        '2018-08-13 13:31', periods=3, freq='1min', tz='UTC')
+    executor.clock = [(m, BAR) for m in minutes]
+
+    with patch.object(
+            backend, 'get_spot_value', wraps=backend.get_spot_value) as spot:
+        executor.run()
+
+    calls = [c[0][0] for c in spot.call_args_list]
+    # bar 1 fetches both, bar 2 prefetches both, bar 3 only ASSET0
+    assert {a.symbol for a in calls[-2]} == {'ASSET0', 'ASSET1'}
+    assert [a.symbol for a in calls[-1]] == ['ASSET0']
+
+
+def test_multi_algorithm_executor_record(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(tmp_path, backend, portal, ['ASSET0'])
+    algos[0] = Algorithm(
+        backend=backend,
+        data_portal=portal,
+        statefile=str(tmp_path / 'recorded-state.pkl'),
+        record_dir=str(tmp_path / 'records'),
+        handle_data=lambda ctx, data: ctx.record(value=1),
+    )
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor.clock = [(minute, BAR)]
+    executor.run()
+
+    # written when the executor stops, before the flush interval
+    assert list(load_recorded(str(tmp_path / 'records'))['value']) == [1]
+
+
+def test_multi_algorithm_executor_open_breaker(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(tmp_path, backend, portal, ['ASSET0', 'ASSET1'])
+
+    def before_trading_start(ctx, data):
+        raise CircuitBreakerOpen(endpoint='trading', retry_in=10)
+    algos[0]._before_trading_start = before_trading_start
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    executor.executors[0].start_session = Mock(
+        side_effect=CircuitBreakerOpen(endpoint='polygon', retry_in=10))
+    session = pd.Timestamp('2018-08-13', tz='UTC')
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor.clock = [
+        (session, SESSION_START),
+        (minute - pd.Timedelta('45min'), BEFORE_TRADING_START_BAR),
+        (minute, BAR),
+    ]
+    executor.run()
+    assert algos[1].events == ['before_trading_start']
+    assert [len(algo.prices) for algo in algos] == [1, 1]
+
+
+def test_multi_algorithm_executor_accounts(tmp_path):
+    backend = Backend()
+    portal = DataPortal(backend, AssetFinder(backend), backend._calendar)
+    algos = make_algos(tmp_path, backend, portal, ['ASSET0', 'ASSET1'])
+    for i, algo in enumerate(algos):
+        algo._backend.portfolio = 'portfolio{}'.format(i)
+        algo._handle_data = lambda ctx, data: ctx.prices.append(
+            ctx.portfolio)
+
+    executor = MultiAlgorithmExecutor(algos, portal)
+    minute = pd.Timestamp('2018-08-13 13:31', tz='UTC')
+    executor.clock = [(minute, BAR)]
+    executor.run()
+    assert [algo.prices for algo in algos] == [
+        ['portfolio0'], ['portfolio1']]
+
+    # algorithms on one account see the orders of each other
+    algos[1]._backend = algos[0]._backend
+    with pytest.raises(ValueError):
+        MultiAlgorithmExecutor(algos, portal)
+
+    for algo in algos:
+        algo._backend = Backend()
+        algo._backend.identity = lambda: 'paper:KEY'
+    with pytest.raises(ValueError):
+        MultiAlgorithmExecutor(algos, portal)
@@ -0,0 +1,117 @@
+import datetime
+
+import pandas as pd
+
+from pylivetrader.executor import realtimeclock
+from pylivetrader.executor.realtimeclock import (
+    RealtimeClock, BAR, SESSION_START, SESSION_END, MINUTE_END,
+    BEFORE_TRADING_START_BAR,
+)
+from pylivetrader.misc.calendar_snapshot import get_calendar
+from pylivetrader.testing.smoke.clock import FaketimeClock
+
+
+BTS_MINUTE = (datetime.time(8, 45), 'America/New_York')
+
+
+def run_realtime(monkeypatch, start, **kwargs):
+    now = [pd.Timestamp(start, tz='UTC')]
+    to_datetime = pd.to_datetime
+
+    def fake_to_datetime(arg, *args, **kw):
+        if arg == 'now':
+            return now[0]
+        return to_datetime(arg, *args, **kw)
+
+    def fake_sleep(seconds):
+        now[0] += pd.Timedelta(seconds=30)
+
+    monkeypatch.setattr(realtimeclock.pd, 'to_datetime', fake_to_datetime)
+    monkeypatch.setattr(realtimeclock, 'sleep', fake_sleep)
+
+    clock = RealtimeClock(get_calendar('NYSE'), BTS_MINUTE, **kwargs)
+    events = []
+    for dt, action in clock:
+        events.append((dt, action))
+        if action == SESSION_END:
+            return events
+
+
+def bars(events):
+    return [dt for dt, action in events if action == BAR]
+
+
+def test_realtime_daily(monkeypatch):
+    # the half day after thanksgiving closes at 18:00 UTC
+    events = run_realtime(
+        monkeypatch, '2018-11-23 12:00',
+        minute_emission=False, daily_bar_offset=pd.Timedelta('5min'))
+    assert [action for _, action in events] == [
+        SESSION_START, BEFORE_TRADING_START_BAR, BAR, SESSION_END]
+    assert bars(events) == [pd.Timestamp('2018-11-23 17:55', tz='UTC')]
+
+    # started in the last minutes
+    events = run_realtime(
+        monkeypatch, '2018-11-23 17:58',
+        minute_emission=False, daily_bar_offset=pd.Timedelta('5min'))
+    assert bars(events) == [pd.Timestamp('2018-11-23 17:58', tz='UTC')]
+
+    # at the close
+    events = run_realtime(
+        monkeypatch, '2018-11-23 12:00',
+        minute_emission=False, daily_bar_offset=pd.Timedelta(0))
+    assert bars(events) == [pd.Timestamp('2018-11-23 18:00', tz='UTC')]
+
+
+def test_realtime_minute(monkeypatch):
+    events = run_realtime(
+        monkeypatch, '2018-11-23 12:00', minute_emission=True)
+    assert bars(events) == list(pd.date_range(
+        '2018-11-23 14:31', '2018-11-23 18:00', freq='min', tz='UTC'))
+    assert len([e for e in events if e[1] == MINUTE_END]) == 210
+
+
+def test_faketime_daily():
+    cal = get_calendar('NYSE')
+    clock = FaketimeClock(
+        cal, minute_emission=False,
+        end=pd.Timestamp('2018-11-26 21:00', tz='UTC'),
+        daily_bar_offset=pd.Timedelta('10min'))
+    clock.rollback(1)
+    events = list(clock)
+    assert bars(events) == [
+        pd.Timestamp('2018-11-23 17:50', tz='UTC'),
+        pd.Timestamp('2018-11-26 20:50', tz='UTC'),
+    ]
+    assert len([e for e in events if e[1] == SESSION_END]) == 2
+
+
+def test_realtime_skips_bars_while_broker_is_down(monkeypatch):
+    down = (pd.Timestamp('2018-11-23 15:00', tz='UTC'),
+            pd.Timestamp('2018-11-23 15:10', tz='UTC'))
+
+    def is_broker_alive():
+        now = realtimeclock.pd.to_datetime('now', utc=True)
+        return not (down[0] <= now < down[1])
+
+    events = run_realtime(
+        monkeypatch, '2018-11-23 12:00',
+        minute_emission=False, is_broker_alive=is_broker_alive)
+    emitted = bars(events)
+    assert len(emitted) == 210 - 10
+    assert not any(down[0] <= dt < down[1] for dt in emitted)
+
+
+def test_realtime_holds_before_trading_start_while_broker_is_down(
+        monkeypatch):
+    # before_trading_start is at 13:45 UTC
+    def is_broker_alive():
+        now = realtimeclock.pd.to_datetime('now', utc=True)
+        return now >= pd.Timestamp('2018-11-23 13:50', tz='UTC')
+
+    events = run_realtime(
+        monkeypatch, '2018-11-23 12:00',
+        minute_emission=False, is_broker_alive=is_broker_alive)
+    bts = [dt for dt, action in events
+           if action == BEFORE_TRADING_START_BAR]
+    assert bts == [pd.Timestamp('2018-11-23 13:50', tz='UTC')]
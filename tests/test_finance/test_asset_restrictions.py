@@ -0,0 +1,87 @@
+import pandas as pd
+
+from pylivetrader.assets import Equity
+from pylivetrader.errors import SymbolNotFound
+from pylivetrader.finance.asset_restrictions import (
+    Restriction, HistoricalRestrictions, SecurityListRestrictions,
+    StaticRestrictions, RESTRICTION_STATES as states,
+)
+from pylivetrader.misc.security_list import SecurityList
+
+
+def ts(s):
+    return pd.Timestamp(s, tz='UTC')
+
+
+def test_historical_restrictions():
+    a, b, c = [Equity('asset-{}'.format(i), 'NYSE') for i in range(3)]
+    restrictions = HistoricalRestrictions([
+        Restriction(a, ts('2018-01-05'), states.ALLOWED),
+        Restriction(a, ts('2018-01-02'), states.FROZEN),
+        Restriction(b, ts('2018-01-03'), states.FROZEN),
+        Restriction(b, ts('2018-01-03 12:00'), states.ALLOWED),
+    ])
+
+    expected = {
+        '2018-01-01': [False, False, False],
+        '2018-01-02': [True, False, False],
+        '2018-01-03': [True, True, False],
+        '2018-01-03 11:59': [True, True, False],
+        '2018-01-03 12:00': [True, False, False],
+        '2018-01-05': [False, False, False],
+    }
+    for dt, mask in expected.items():
+        result = restrictions.is_restricted([a, b, c], ts(dt))
+        assert list(result) == mask, dt
+        assert list(result.index) == [a, b, c]
+        assert [restrictions.is_restricted(x, ts(dt))
+                for x in (a, b, c)] == mask
+
+    union = restrictions | StaticRestrictions([c])
+    assert list(union.is_restricted([a, b, c], ts('2018-01-02'))) == \
+        [True, False, True]
+    assert len(HistoricalRestrictions([]).is_restricted(
+        [a], ts('2018-01-02'))) == 1
+
+
+class Finder:
+
+    def __init__(self, assets):
+        self.assets = {asset.symbol: asset for asset in assets}
+        self.lookups = 0
+
+    def lookup_symbol(self, symbol, as_of_date=None):
+        self.lookups += 1
+        if symbol not in self.assets:
+            raise SymbolNotFound(symbol=symbol)
+        return self.assets[symbol]
+
+
+def test_security_list():
+    a, b, c = [Equity('asset-{}'.format(i), 'NYSE', symbol=s)
+               for i, s in enumerate('ABC')]
+    finder = Finder([a, b, c])
+    data = {
+        ts('2018-01-01'): {
+            ts('2017-12-01'): {'add': ['A', 'B', 'X'], 'delete': []},
+            ts('2017-12-15'): {'add': [], 'delete': ['B']},
+        },
+        ts('2018-02-01'): {
+            ts('2018-01-20'): {'add': ['C'], 'delete': ['A']},
+        },
+    }
+    security_list = SecurityList(data, lambda: ts('2018-03-01'), finder)
+
+    assert security_list.current_securities(ts('2017-12-31')) == set()
+    assert security_list.current_securities(ts('2018-01-01')) == {'asset-0'}
+    assert security_list.current_securities(ts('2018-03-01')) == {'asset-2'}
+    # earlier knowledge dates are not affected by the later ones
+    assert security_list.current_securities(ts('2018-01-15')) == {'asset-0'}
+    # resolved once, when compiled
+    assert finder.lookups == 6
+
+    restrictions = SecurityListRestrictions(security_list)
+    assert restrictions.is_restricted(a, ts('2018-01-15'))
+    assert not restrictions.is_restricted(a, ts('2018-02-15'))
+    assert list(restrictions.is_restricted([a, b, c], ts('2018-02-15'))) == \
+        [False, False, True]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylivetrader.assets import Equity
+from pylivetrader.errors import TradingControlViolation
+from pylivetrader.finance.asset_restrictions import StaticRestrictions
+from pylivetrader.finance.controls import (
+    MaxOrderCount, MaxOrderSize, MaxPositionSize, LongOnly,
+    RestrictedListOrder, AssetDateBounds,
+)
+import pylivetrader.protocol as proto
+
+
+class CurrentData:
+
+    def __init__(self, prices):
+        self.prices = prices
+
+    def current(self, asset, field):
+        return self.prices[asset]
+
+
+def test_validate_batch():
+    assets = [Equity('asset-{}'.format(i), 'NYSE', symbol='A{}'.format(i),
+                     start_date=pd.Timestamp('2018-01-01', tz='UTC'),
+                     end_date=pd.Timestamp('2018-08-10', tz='UTC'))
+              for i in range(4)]
+    amounts = np.array([10., -30., 5., -1.])
+    prices = np.array([10., 1., np.nan, 100.])
+    positions = np.array([0., 20., 0., 3.])
+    current_data = CurrentData(dict(zip(assets, prices)))
+    dt = pd.Timestamp('2018-08-13 14:00', tz='UTC')
+
+    portfolio = proto.Portfolio()
+    for asset, amount in zip(assets, positions):
+        position = portfolio.positions[asset] = proto.Position(asset)
+        position.amount = amount
+
+    controls = [
+        MaxOrderSize('log', max_shares=20),
+        MaxOrderSize('log', max_notional=99),
+        MaxOrderSize('log', asset=assets[1], max_shares=5),
+        MaxPositionSize('log', max_shares=10),
+        MaxPositionSize('log', max_notional=150),
+        LongOnly('log'),
+        RestrictedListOrder('log', StaticRestrictions(assets[2:3])),
+        AssetDateBounds('log'),
+    ]
+    expected = [
+        [False, True, False, False],
+        [True, False, False, True],
+        [False, True, False, False],
+        [False, False, False, False],
+        [False, False, False, True],
+        [False, True, False, False],
+        [False, False, True, False],
+        # default, one by one
+        [True, True, True, True],
+    ]
+    for control, mask in zip(controls, expected):
+        result = control.validate_batch(
+            assets, amounts, positions, prices, portfolio, dt, current_data)
+        assert list(result) == mask, repr(control)
+
+    # the default does not handle the violations itself
+    control = AssetDateBounds('fail')
+    assert control.validate_batch(
+        assets, amounts, positions, prices, portfolio, dt, current_data).all()
+    with pytest.raises(TradingControlViolation):
+        control.validate(assets[0], 1, portfolio, dt, current_data)
+    # with what violated it
+    assert control.batch_violation_metadata(0) == [
+        {'asset_end_date': pd.Timestamp('2018-08-10', tz='UTC')}]
+    metadata, = control.batch_violation_metadata(0)
+    with pytest.raises(TradingControlViolation) as e:
+        control.handle_violation(assets[0], 1, dt, metadata=metadata)
+    assert 'asset_end_date' in str(e.value)
+    assert MaxOrderSize('log', max_shares=20).batch_violation_metadata(1) == \
+        [None]
+
+    control = MaxOrderCount('log', max_count=3)
+    control.validate(assets[0], 1, portfolio, dt, current_data)
+    assert list(control.validate_batch(
+        assets, amounts, positions, prices, portfolio, dt, current_data)) == \
+        [False, False, True, True]
+    assert control.orders_placed == 5
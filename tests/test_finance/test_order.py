@@ -19,3 +19,5 @@ def test_order():
     assert not o.open
 
     assert type(o.to_api_obj()) == proto.Order
+    assert o.to_api_obj() == proto.Order(o.to_dict())
+    assert 'broker_order_id' not in o.to_api_obj()
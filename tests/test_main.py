@@ -0,0 +1,98 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from pylivetrader.__main__ import main
+from pylivetrader.algorithm import Algorithm
+from pylivetrader.misc.import_profile import ImportProfiler
+
+
+def test_lazy_imports():
+    code = '''
+import sys
+import pylivetrader.__main__
+print(','.join(m for m in (
+    'pandas', 'numpy', 'trading_calendars', 'alpaca_trade_api',
+    'pylivetrader.algorithm') if m in sys.modules))
+'''
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.decode().strip() == ''
+
+    # still reachable from the package
+    code = '''
+import pylivetrader
+from pylivetrader.api import order
+print(pylivetrader.Algorithm.__name__, order.__name__)
+'''
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.decode().split() == ['Algorithm', 'order']
+
+
+def test_import_profiler(tmp_path, monkeypatch):
+    pkg = tmp_path / 'profiled_pkg'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('from . import child\n')
+    (pkg / 'child.py').write_text(
+        'import time\ntime.sleep(0.05)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    profiler = ImportProfiler()
+    with profiler:
+        with profiler.phase('load'):
+            import profiled_pkg  # noqa
+    sys.modules.pop('profiled_pkg.child')
+    sys.modules.pop('profiled_pkg')
+
+    total, self_time = profiler.imports['profiled_pkg']
+    child_total, child_self = profiler.imports['profiled_pkg.child']
+    assert child_total >= 0.05
+    assert total >= child_total
+    assert self_time < 0.05
+    assert profiler.by_package()[0][0] == 'profiled_pkg'
+    assert profiler.by_package()[0][2] == 2
+    assert profiler.phases['load'] >= 0.05
+
+    report = '\n'.join(profiler.report())
+    assert 'load' in report
+    assert 'profiled_pkg' in report
+
+
+def test_run_profile_startup(tmp_path, monkeypatch):
+    algofile = tmp_path / 'algo.py'
+    algofile.write_text('def initialize(ctx):\n    pass\n')
+    monkeypatch.setattr(Algorithm, 'run', lambda self: None)
+
+    result = CliRunner().invoke(main, [
+        'run', '-f', str(algofile),
+        '-b', 'pylivetrader.testing.smoke.backend',
+        '-s', str(tmp_path / 'state.pkl'),
+        '--profile-startup',
+    ])
+    assert result.exit_code == 0, result.output
+    assert 'load algorithm file' in result.output
+    assert 'create algorithm and backend' in result.output
+    assert 'imports:' in result.output
+
+
+def test_run_many_accounts(tmp_path):
+    algofiles = []
+    for name in ['algo1', 'algo2']:
+        algofile = tmp_path / '{}.py'.format(name)
+        algofile.write_text('def initialize(ctx):\n    pass\n')
+        algofiles.append(str(algofile))
+    config = tmp_path / 'config.yaml'
+    config.write_text('key_id: KEY\n')
+
+    result = CliRunner().invoke(main, [
+        'run-many', '-b', 'pylivetrader.testing.smoke.backend',
+    ] + algofiles)
+    assert result.exit_code != 0
+    assert 'same account' in result.output
+
+    result = CliRunner().invoke(main, [
+        'run-many', '-b', 'pylivetrader.testing.smoke.backend',
+        '--account-config', str(config),
+    ] + algofiles)
+    assert result.exit_code != 0
+    assert 'one --account-config per algorithm file' in result.output
@@ -0,0 +1,61 @@
+import copy
+
+import pandas as pd
+import pytest
+from trading_calendars import get_calendar
+
+from pylivetrader.misc.calendar_cache import SessionCalendar
+
+
+def test_minute_queries():
+    cal = get_calendar('NYSE')
+    scal = SessionCalendar(cal)
+
+    # around thanksgiving and the early close on the day after
+    minutes = pd.date_range(
+        '2018-11-21 00:00', '2018-11-27 00:00', freq='7min', tz='UTC')
+    for m in minutes:
+        assert scal.is_open_on_minute(m) == cal.is_open_on_minute(m)
+        assert scal.next_open(m) == cal.next_open(m)
+        assert scal.previous_minute(m) == cal.previous_minute(m)
+        for direction in ('next', 'previous'):
+            assert scal.minute_to_session_label(m, direction) == \
+                cal.minute_to_session_label(m, direction)
+        if not cal.is_open_on_minute(m):
+            with pytest.raises(ValueError):
+                scal.minute_to_session_label(m, 'none')
+
+    # rolled forward with the minutes
+    assert scal.current_session == pd.Timestamp('2018-11-26', tz='UTC')
+
+    # going back in time falls back to the calendar
+    m = pd.Timestamp('2018-11-20 15:00', tz='UTC')
+    assert scal.previous_minute(m) == cal.previous_minute(m)
+    assert scal.current_session == pd.Timestamp('2018-11-26', tz='UTC')
+
+
+def test_session_queries():
+    cal = get_calendar('NYSE')
+    scal = SessionCalendar(cal)
+
+    # not a session, so the next one is set
+    assert scal.set_session(pd.Timestamp('2018-11-22', tz='UTC')) == \
+        pd.Timestamp('2018-11-23', tz='UTC')
+
+    for label in cal.sessions_in_range('2018-11-20', '2018-11-27'):
+        assert scal.is_session(label)
+        assert scal.session_open(label) == cal.session_open(label)
+        assert scal.session_close(label) == cal.session_close(label)
+        assert scal.open_and_close_for_session(label) == \
+            cal.open_and_close_for_session(label)
+        assert scal.minutes_for_session(label).equals(
+            cal.minutes_for_session(label))
+    assert not scal.is_session(pd.Timestamp('2018-11-22', tz='UTC'))
+
+    # delegated
+    assert scal.name == cal.name
+    assert scal.all_sessions is cal.all_sessions
+
+    scal = copy.copy(scal)
+    assert scal.current_session is None
+    assert scal.name == cal.name
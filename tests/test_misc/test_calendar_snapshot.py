@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import trading_calendars
+
+from pylivetrader.misc import calendar_snapshot
+from pylivetrader.misc.calendar_snapshot import (
+    get_calendar, load_snapshot, save_snapshot, snapshot_path,
+)
+
+
+def test_snapshot_roundtrip(tmp_path):
+    cal = trading_calendars.get_calendar('NYSE')
+    path = snapshot_path('XNYS', str(tmp_path))
+    save_snapshot(cal, path)
+
+    restored = load_snapshot('XNYS', path)
+    assert type(restored) is type(cal)
+    assert restored.schedule.equals(cal.schedule)
+    assert restored.all_minutes.equals(cal.all_minutes)
+    assert restored._early_closes.equals(cal._early_closes)
+    assert restored.first_trading_session == cal.first_trading_session
+    assert restored.last_trading_session == cal.last_trading_session
+
+    # thanksgiving and the early close after it
+    minutes = pd.date_range(
+        '2018-11-21 14:00', '2018-11-26 22:00', freq='17min', tz='UTC')
+    for m in minutes:
+        assert restored.is_open_on_minute(m) == cal.is_open_on_minute(m)
+        assert restored.next_open(m) == cal.next_open(m)
+        assert restored.previous_minute(m) == cal.previous_minute(m)
+        assert restored.minute_to_session_label(m) == \
+            cal.minute_to_session_label(m)
+    label = pd.Timestamp('2018-11-23', tz='UTC')
+    assert restored.minutes_for_session(label).equals(
+        cal.minutes_for_session(label))
+    assert restored.sessions_in_range('2018-01-01', '2018-12-31').equals(
+        cal.sessions_in_range('2018-01-01', '2018-12-31'))
+
+    # not far enough into the future
+    end = cal.last_trading_session + pd.Timedelta(days=1)
+    assert load_snapshot('XNYS', path, min_end=end) is None
+
+    with open(path, 'r+b') as f:
+        f.truncate(1000)
+    assert load_snapshot('XNYS', path) is None
+    assert load_snapshot('XNYS', str(tmp_path / 'missing.npy')) is None
+
+
+def test_get_calendar(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYLIVETRADER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(calendar_snapshot, '_calendars', {})
+    path = snapshot_path('XNYS')
+
+    cal = get_calendar('NYSE')
+    assert get_calendar('XNYS') is cal
+    assert (tmp_path / 'calendars').exists()
+    assert load_snapshot('XNYS', path) is not None
+
+    # a new process restores it and shares it with trading_calendars
+    monkeypatch.setattr(calendar_snapshot, '_calendars', {})
+    restored = get_calendar('NYSE')
+    assert restored is not cal
+    assert restored.schedule.equals(cal.schedule)
+    assert trading_calendars.get_calendar('NYSE') is restored
+
+
+def test_snapshot_attributes(tmp_path, monkeypatch):
+    # whatever the installed constructor sets, as the breaks of newer
+    # trading_calendars
+    nyse = trading_calendars.get_calendar('NYSE')
+    cal = type(nyse).__new__(type(nyse))
+    cal.__dict__.update(vars(nyse))
+    nat = np.full(len(cal.schedule), np.datetime64('NaT'), dtype='M8[ns]')
+    cal._break_starts = pd.DatetimeIndex(nat, tz='UTC')
+    cal.market_break_starts_nanos = nat.view(np.int64)
+    cal.schedule = cal.schedule.assign(break_start=nat)
+    cal.options = {'name': 'XNYS'}
+    path = snapshot_path('XNYS', str(tmp_path))
+    save_snapshot(cal, path)
+
+    restored = load_snapshot('XNYS', path)
+    assert sorted(vars(restored)) == sorted(vars(cal))
+    assert restored._break_starts.equals(cal._break_starts)
+    assert (restored.market_break_starts_nanos ==
+            cal.market_break_starts_nanos).all()
+    assert restored.schedule.equals(cal.schedule)
+    assert restored.options == {'name': 'XNYS'}
+
+    # not restored when it does not answer as the saved calendar
+    checks = calendar_snapshot._checks(cal)
+    monkeypatch.setattr(calendar_snapshot, '_checks',
+                        lambda c: checks[:-1] + (checks[-1] + 1,))
+    save_snapshot(cal, path)
+    monkeypatch.undo()
+    assert load_snapshot('XNYS', path) is None
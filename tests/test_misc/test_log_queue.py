@@ -0,0 +1,127 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from logbook import Logger, WARNING
+
+from pylivetrader.misc.log_queue import QueuedStreamHandler
+
+
+log = Logger('test')
+
+
+def test_queued_stream_handler():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(
+        stream, format_string='{record.level_name}: {record.message}')
+    with handler.applicationbound():
+        log.info('start')
+        for _ in range(5):
+            log.warn('no data for AAPL')
+        log.warn('no data for MSFT')
+        # a repeated info is not left out
+        log.info('start')
+    handler.close()
+
+    assert stream.getvalue().splitlines() == [
+        'INFO: start',
+        'WARNING: no data for AAPL',
+        'WARNING: no data for MSFT',
+        'INFO: start',
+        # the repeats pending at close
+        'WARNING: no data for AAPL (repeated 4 times in 0 s)',
+    ]
+
+
+def test_repeats_after_interval():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(
+        stream, dedup_interval=0,
+        format_string='{record.message}')
+    with handler.applicationbound():
+        log.warn('a')
+        log.warn('a')
+    handler.close()
+    assert stream.getvalue().splitlines() == ['a', 'a']
+
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(stream, format_string='{record.message}')
+    handler._seen[('test', WARNING, 'a')] = [-1000, 3, None]
+    with handler.applicationbound():
+        log.warn('a')
+    handler.close()
+    assert stream.getvalue().startswith('a (repeated 3 times in')
+
+
+def test_repeats_reported_after_burst():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(
+        stream, dedup_interval=0.1, format_string='{record.message}')
+    with handler.applicationbound():
+        for _ in range(3):
+            log.warn('b')
+    deadline = time.time() + 5
+    while 'repeated' not in stream.getvalue() and time.time() < deadline:
+        time.sleep(0.05)
+    lines = stream.getvalue().splitlines()
+    handler.close()
+    assert lines[0] == 'b'
+    assert lines[1].startswith('b (repeated 2 times in')
+    assert stream.getvalue().splitlines() == lines
+
+
+class BlockingStream(io.StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+
+    def write(self, s):
+        self.unblock.wait()
+        return super().write(s)
+
+
+def test_dropped_records():
+    stream = BlockingStream()
+    handler = QueuedStreamHandler(
+        stream, maxsize=2, format_string='{record.message}')
+    with handler.applicationbound():
+        # does not block on the stream
+        for i in range(20):
+            log.info('message {}'.format(i))
+    assert handler.dropped > 0
+    stream.unblock.set()
+    handler.close()
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == 'message 0'
+    assert lines[-1] == \
+        'dropped {} log records, the log queue was full'.format(
+            handler.dropped)
+    assert len(lines) == 20 - handler.dropped + 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                    reason='no fork hooks')
+def test_fork_while_locked():
+    handler = QueuedStreamHandler(io.StringIO())
+    locked = threading.Event()
+
+    def hold():
+        with handler._seen_lock:
+            locked.set()
+            time.sleep(0.2)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    locked.wait()
+    pid = os.fork()
+    if pid == 0:
+        # the lock is not inherited held by the other thread
+        os._exit(0 if handler._seen_lock.acquire(timeout=2) else 1)
+    _, status = os.waitpid(pid, 0)
+    thread.join()
+    handler.close()
+    assert status == 0
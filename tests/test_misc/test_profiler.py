@@ -0,0 +1,90 @@
+import importlib.util
+import time
+
+import pandas as pd
+
+from pylivetrader.misc.profiler import SamplingProfiler
+from pylivetrader.testing.smoke import harness
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler(tmp_path):
+    profiler = SamplingProfiler(
+        str(tmp_path), name='test', interval=0.001,
+        user_files=[__file__])
+    dt = pd.Timestamp('2018-11-23 15:00', tz='UTC')
+    with profiler:
+        profiler.start_session(dt.normalize())
+        # not sampled outside of a section
+        busy(0.05)
+        assert profiler.samples == 0
+        with profiler.section(dt, 'bar'):
+            busy(0.1)
+    assert profiler._thread is None
+
+    report = (tmp_path / 'test-2018-11-23.txt').read_text()
+    assert 'top user code' in report
+    assert 'test_profiler.py:busy' in report
+    assert '2018-11-23 15:00 bar' in report
+
+    lines = (tmp_path / 'test-2018-11-23.collapsed').read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith('bar;')
+        assert int(count) > 0
+    assert any(line.split(' ')[0].endswith('test_profiler.py:busy')
+               for line in lines)
+
+
+ALGO = '''
+import time
+
+from pylivetrader.api import schedule_function, date_rules, time_rules
+
+
+def initialize(context):
+    schedule_function(rebalance, date_rules.every_day(),
+                      time_rules.market_open(minutes=5))
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def rebalance(context, data):
+    spin(0.2)
+
+
+def handle_data(context, data):
+    spin(0.001)
+'''
+
+
+def test_run_smoke_profile(tmp_path, monkeypatch):
+    # the algorithm saves its state to the working directory
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'profiled_algo.py'
+    path.write_text(ALGO)
+    spec = importlib.util.spec_from_file_location('profiled_algo', str(path))
+    algo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(algo)
+
+    out = tmp_path / 'profile'
+    harness.run_smoke(algo, profile=str(out), profile_interval=0.002)
+
+    reports = list(out.glob('profiled_algo-*.txt'))
+    assert len(reports) == 1
+    assert len(list(out.glob('profiled_algo-*.collapsed'))) == 1
+    report = reports[0].read_text().splitlines()
+    # the scheduled function makes the slowest bar
+    slowest = report[report.index('slowest bars') + 2]
+    assert slowest.endswith('rebalance')
+    assert any(line.endswith('profiled_algo.py:spin') for line in report)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylivetrader.misc.recorder import Recorder, load_recorded
+
+
+def minutes(n, start='2018-11-23 14:30'):
+    return pd.date_range(start, periods=n, freq='min', tz='UTC')
+
+
+def test_ring_buffer():
+    recorder = Recorder(capacity=5)
+    assert recorder.history('x').empty
+
+    for i, dt in enumerate(minutes(3)):
+        recorder.record(dt, 'x', i)
+    history = recorder.history('x')
+    assert list(history) == [0, 1, 2]
+    assert history.index.equals(minutes(3))
+
+    for i, dt in enumerate(minutes(9)):
+        recorder.record(dt, 'y', float(i))
+    # the oldest values are dropped
+    assert list(recorder.history('y')) == [4, 5, 6, 7, 8]
+    assert list(recorder.history('y', 2)) == [7, 8]
+    assert recorder.history('y').index.equals(minutes(9)[4:])
+
+    recorder.record(minutes(1)[0], 'x', None)
+    assert np.isnan(recorder.history('x', 1).iloc[0])
+
+    # only numbers are kept
+    recorder.record(minutes(1)[0], 'label', 'buy')
+    with pytest.raises(ValueError):
+        recorder.history('label')
+
+
+def test_memory_cap():
+    recorder = Recorder(capacity=10, max_bytes=2 * 10 * 16)
+    dt = minutes(1)[0]
+    for name in 'abc':
+        recorder.record(dt, name, 1)
+    assert recorder.nbytes == 2 * 10 * 16
+    recorder.history('b')
+    with pytest.raises(ValueError):
+        recorder.history('c')
+
+
+def test_flush(tmp_path):
+    recorder = Recorder(
+        capacity=100, directory=str(tmp_path),
+        flush_interval=pd.Timedelta(minutes=10))
+    dts = minutes(25)
+    for i, dt in enumerate(dts):
+        recorder.record(dt, 'a', i)
+        if i % 2 == 0:
+            recorder.record(dt, 'b', -i)
+    recorder.close()
+
+    files = sorted(p.name for p in (tmp_path / '2018-11-23').iterdir())
+    assert len(files) == 3
+    assert files[0] == '143000-000001.npz'
+
+    df = load_recorded(str(tmp_path))
+    assert list(df.columns) == ['a', 'b']
+    assert df.index.equals(dts)
+    assert list(df['a']) == list(range(25))
+    assert list(df['b'].dropna()) == [-i for i in range(0, 25, 2)]
+
+    assert load_recorded(str(tmp_path), start='2018-11-24').empty
@@ -0,0 +1,52 @@
+import time
+
+from pylivetrader.misc.runtime_snapshot import (
+    RuntimeSnapshot,
+    backend_identity,
+)
+from pylivetrader.testing.fixtures import Backend
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'runtime.pkl')
+    snapshot = RuntimeSnapshot(path)
+    assert snapshot.load(('backend', '2018-08-13')) is None
+
+    snapshot.save(('backend', '2018-08-13'), {'assets': [1, 2]})
+    assert snapshot.load(('backend', '2018-08-13')) == {'assets': [1, 2]}
+
+    # another session or backend
+    assert snapshot.load(('backend', '2018-08-14')) is None
+    assert snapshot.load(('other', '2018-08-13')) is None
+
+    with open(path, 'wb') as f:
+        f.write(b'broken')
+    assert snapshot.load(('backend', '2018-08-13')) is None
+
+
+def test_background(tmp_path):
+    path = str(tmp_path / 'runtime.pkl')
+    snapshot = RuntimeSnapshot(path, interval=0.01)
+    collected = []
+
+    def collect():
+        collected.append(1)
+        return 'key', {'calls': len(collected)}
+
+    snapshot.start(collect)
+    deadline = time.time() + 5
+    while len(collected) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    snapshot.stop()
+    assert len(collected) >= 3
+    assert snapshot.load('key') == {'calls': len(collected)}
+
+
+def test_backend_identity():
+    class Other(Backend):
+
+        def identity(self):
+            return 'https://paper-api.example.com:KEY'
+
+    assert backend_identity(Backend()) == backend_identity(Backend())
+    assert backend_identity(Backend()) != backend_identity(Other())
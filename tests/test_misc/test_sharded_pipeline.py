@@ -0,0 +1,82 @@
+import os
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from pylivetrader.misc.sharded_pipeline import (
+    split_shards, run_sharded_pipeline, ShardPool,
+)
+
+
+class FakeEngine:
+
+    def __init__(self, list_symbols):
+        self.list_symbols = list_symbols
+
+    def run_pipeline(self, pipeline):
+        symbols = self.list_symbols()
+        return pd.DataFrame({
+            'value': [pipeline[s] for s in symbols],
+            'pid': os.getpid(),
+        }, index=symbols)
+
+
+@pytest.fixture
+def engine_module():
+    pkg = 'pipeline_live.engine'
+    saved = sys.modules.get(pkg)
+    mod = types.ModuleType(pkg)
+    mod.LivePipelineEngine = FakeEngine
+    sys.modules[pkg] = mod
+    yield mod
+    if saved is None:
+        del sys.modules[pkg]
+    else:
+        sys.modules[pkg] = saved
+
+
+def test_split_shards():
+    assert split_shards(['C', 'A', 'B', 'D', 'E'], 2) == [
+        ['A', 'B', 'C'], ['D', 'E']]
+    assert split_shards(['A', 'B'], 4) == [['A'], ['B']]
+    assert split_shards([], 4) == []
+
+
+def test_run_sharded_pipeline(engine_module):
+    symbols = ['S{:03d}'.format(i) for i in range(100)]
+    # not picklable, so it can only reach the workers through fork
+    pipeline = {s: i for i, s in enumerate(symbols)}
+    pipeline['closure'] = lambda: None
+
+    output = run_sharded_pipeline(
+        pipeline, list(reversed(symbols)), 4, processes=2)
+    assert list(output.index) == symbols
+    assert list(output['value']) == list(range(100))
+    pids = set(output['pid'])
+    assert 1 <= len(pids) <= 2
+    assert os.getpid() not in pids
+
+    output = run_sharded_pipeline(pipeline, symbols[:3], 1)
+    assert list(output.index) == symbols[:3]
+    assert set(output['pid']) == {os.getpid()}
+
+
+def test_shard_pool(engine_module):
+    symbols = ['S{:03d}'.format(i) for i in range(10)]
+    pipeline = {s: i for i, s in enumerate(symbols)}
+    pipeline['closure'] = lambda: None
+
+    pool = ShardPool(pipeline, processes=2)
+    try:
+        # forked on creation, and not again for the runs
+        pids = set(pool._executor._processes)
+        assert len(pids) == 2
+        for _ in range(2):
+            output = pool.run(symbols, 2)
+            assert list(output['value']) == list(range(10))
+            assert set(output['pid']) <= pids
+        assert set(pool._executor._processes) == pids
+    finally:
+        pool.shutdown()
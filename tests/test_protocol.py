@@ -15,3 +15,112 @@ def test_order():
     ))
     assert o.sid == asset
     assert o.amount == 3
+
+
+def test_slotted_objects():
+    import pickle
+    import warnings
+    import pytest
+    from pylivetrader.protocol import (
+        Portfolio, Account, Position, Positions,
+    )
+
+    asset = Asset('asset-id', 'NSDQ', symbol='AAPL')
+    position = Position(asset, amount=10, cost_basis=1.5)
+    assert not hasattr(position, '__dict__')
+    assert position.sid == asset
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        assert position['amount'] == 10
+        assert position['sid'] == asset
+        with pytest.raises(KeyError):
+            position['asset_name']
+
+    portfolio = Portfolio()
+    portfolio.positions[asset] = position
+    portfolio = pickle.loads(pickle.dumps(portfolio))
+    assert portfolio.positions[asset].amount == 10
+    assert 'positions_value' in repr(portfolio)
+
+    account = Account()
+    with pytest.raises(AttributeError):
+        account.total_position_value = 1
+
+    # the state of the former dict based objects
+    position = Position.__new__(Position)
+    position.__setstate__({
+        'asset': asset, 'amount': 3, 'cost_basis': 1.0,
+        'last_sale_price': 2.0, 'last_sale_date': None, 'removed': 1,
+    })
+    assert position.amount == 3
+    assert isinstance(Positions()[asset], Position)
+
+    o = Order(dict(sid=asset, amount=3, custom='value'))
+    assert o.custom == 'value'
+    assert 'custom' in o
+    assert 'filled' not in o
+    assert set(o.keys()) == {'sid', 'amount', 'custom'}
+
+
+def test_positions_arrays():
+    import copy
+    import pickle
+    import pytest
+    from pylivetrader.protocol import Position, Positions
+
+    a, b, c = [Asset('asset-{}'.format(i), 'NYSE', symbol=s)
+               for i, s in enumerate('ABC')]
+    positions = Positions()
+    positions[a] = Position(a, amount=10, cost_basis=5.0, last_sale_price=6.0)
+    positions[b] = Position(b, amount=-4, cost_basis=10.0,
+                            last_sale_price=None)
+    positions[c] = Position(c, amount=2, cost_basis=1.0, last_sale_price=2.0)
+
+    # price unknown for b, valued at cost
+    assert positions.market_value == 60 - 40 + 4
+    assert positions.gross_exposure == 60 + 40 + 4
+    assert positions.long_exposure == 64
+    assert positions.short_exposure == -40
+    assert positions.cost_value == 50 - 40 + 2
+    assert positions.unrealized_pnl == pytest.approx(12)
+
+    # writes to the positions go through to the arrays
+    positions[b].last_sale_price = 11.0
+    positions[a].amount = 20
+    assert positions.market_value == 120 - 44 + 4
+
+    del positions[a]
+    assert positions.assets == [c, b]
+    assert list(positions.amounts([a, b, c])) == [0, -4, 2]
+    position = positions.pop(c)
+    position.amount = 100
+    assert positions.market_value == -44
+    positions.update({a: Position(a, amount=1, last_sale_price=1.0)})
+    assert positions.market_value == -43
+    assert isinstance(positions[c], Position)
+    assert c not in positions
+
+    restored = pickle.loads(pickle.dumps(positions))
+    assert isinstance(restored, Positions)
+    assert restored.market_value == -43
+    restored[a].amount = 2
+    assert restored.market_value == -42
+    assert positions.market_value == -43
+
+    # a copy does not take over the write-through of the original
+    for copied in (positions.copy(), copy.copy(positions),
+                   Positions(positions)):
+        assert copied.market_value == -43
+        positions[a].amount = 3
+        assert positions.market_value == -41
+        assert copied.market_value == -43
+        copied[b].amount = -5
+        assert copied.market_value == -54
+        assert positions.market_value == -41
+        positions[a].amount = 1
+        positions[b].amount = -4
+
+    positions.clear()
+    assert positions.market_value == 0
+    assert len(positions.array('amount')) == 0
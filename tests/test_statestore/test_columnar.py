@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylivetrader.statestore import get_state_store
+from pylivetrader.statestore.columnar import ColumnarStateStore
+
+
+class Context:
+    pass
+
+
+def blobs(path):
+    return sorted(n for n in os.listdir(str(path)) if n.endswith('.npy'))
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / 'algo-state'
+    index = pd.date_range('2018-01-02', periods=20000, freq='min', tz='UTC')
+
+    ctx = Context()
+    ctx.skip = 'not saved'
+    ctx.count = 3
+    ctx.symbols = ['AAPL', 'MSFT']
+    ctx.weights = np.arange(20000, dtype=np.float64)
+    ctx.small = np.arange(3)
+    ctx.prices = pd.DataFrame(
+        np.random.rand(20000, 3), index=index, columns=['A', 'B', 'C'])
+    ctx.universe = pd.DataFrame({
+        'price': np.random.rand(20000),
+        'volume': np.arange(20000),
+        'sector': ['tech'] * 20000,
+    }, index=index, columns=['price', 'volume', 'sector'])
+    ctx.spread = pd.Series(np.random.rand(20000), index=index, name='spread')
+
+    store = get_state_store(str(path), 'columnar')
+    assert isinstance(store, ColumnarStateStore)
+    store.save(ctx, 'algo', ['skip'])
+
+    loaded = Context()
+    ColumnarStateStore(str(path)).load(loaded, 'algo')
+    assert not hasattr(loaded, 'skip')
+    assert loaded.count == 3
+    assert loaded.symbols == ['AAPL', 'MSFT']
+    np.testing.assert_array_equal(loaded.weights, ctx.weights)
+    np.testing.assert_array_equal(loaded.small, ctx.small)
+    pd.testing.assert_frame_equal(loaded.prices, ctx.prices)
+    pd.testing.assert_frame_equal(loaded.universe, ctx.universe)
+    pd.testing.assert_series_equal(loaded.spread, ctx.spread)
+    assert loaded.prices.index.freq == ctx.prices.index.freq
+
+    # the large arrays are mapped, and writable without touching the file
+    assert isinstance(loaded.weights, np.memmap)
+    assert isinstance(loaded.small, np.ndarray) and \
+        not isinstance(loaded.small, np.memmap)
+    loaded.weights[0] = -1
+    again = Context()
+    ColumnarStateStore(str(path)).load(again, 'algo')
+    assert again.weights[0] == 0
+
+    with pytest.raises(ValueError):
+        ColumnarStateStore(str(path)).load(Context(), 'other')
+
+
+def test_save_writes_what_changed(tmp_path):
+    path = tmp_path / 'algo-state'
+    ctx = Context()
+    ctx.a = np.zeros(10000)
+    ctx.b = np.ones(10000)
+    ctx.n = 0
+
+    store = ColumnarStateStore(str(path))
+    store.save(ctx, 'algo', [])
+    first = blobs(path)
+    assert len(first) == 2
+
+    manifest = path / 'manifest.pkl'
+    mtime = manifest.stat().st_mtime_ns
+    os.utime(str(manifest), ns=(mtime - 10**9, mtime - 10**9))
+    store.save(ctx, 'algo', [])
+    assert manifest.stat().st_mtime_ns == mtime - 10**9
+
+    ctx.n = 1
+    store.save(ctx, 'algo', [])
+    assert manifest.stat().st_mtime_ns != mtime - 10**9
+    assert blobs(path) == first
+
+    ctx.a[0] = 5
+    store.save(ctx, 'algo', [])
+    after = blobs(path)
+    assert len(after) == 2
+    assert len(set(after) - set(first)) == 1
+
+    # a restarted store keeps the unchanged blobs
+    loaded = Context()
+    store = ColumnarStateStore(str(path))
+    store.load(loaded, 'algo')
+    assert loaded.n == 1 and loaded.a[0] == 5
+    store.save(loaded, 'algo', [])
+    assert blobs(path) == after
+
+
+def test_corrupt(tmp_path):
+    path = tmp_path / 'algo-state'
+    ctx = Context()
+    ctx.a = np.zeros(10000)
+    ColumnarStateStore(str(path)).save(ctx, 'algo', [])
+
+    for name in blobs(path):
+        os.remove(str(path / name))
+    with pytest.raises(ValueError):
+        ColumnarStateStore(str(path)).load(Context(), 'algo')
+
+    (path / 'manifest.pkl').write_bytes(b'broken')
+    with pytest.raises(ValueError):
+        ColumnarStateStore(str(path)).load(Context(), 'algo')
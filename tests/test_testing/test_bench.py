@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pandas as pd
+from click.testing import CliRunner
+from trading_calendars import get_calendar
+
+from pylivetrader.__main__ import main
+from pylivetrader.testing.bench import run_bench, format_report
+
+
+ALGO = '''
+def initialize(ctx):
+    ctx.assets = [symbol('AAA'), symbol('BBB')]
+
+def handle_data(ctx, data):
+    prices = data.current(ctx.assets, 'price')
+    data.current(ctx.assets[0], 'price')
+    if prices[ctx.assets[0]] > 10:
+        order_target(ctx.assets[0], 10)
+'''
+
+
+def write_recorded(path):
+    minutes = get_calendar('NYSE').minutes_for_session(
+        pd.Timestamp('2018-11-23', tz='UTC'))
+    for i, symbol in enumerate(['AAA', 'BBB']):
+        close = np.linspace(10, 11, len(minutes)) + i
+        pd.DataFrame({
+            'open': close,
+            'high': close + 0.5,
+            'low': close - 0.5,
+            'close': close,
+            'volume': 1000,
+        }, index=minutes).to_csv(str(path / '{}.csv'.format(symbol)))
+    return len(minutes)
+
+
+def test_run_bench(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    bars = write_recorded(data)
+    algofile = tmp_path / 'algo.py'
+    algofile.write_text(ALGO)
+
+    report = run_bench(str(algofile), data=str(data))
+    assert report['universe'] == 2
+    assert report['latency_ms']['handle_data']['count'] == bars
+    latency = report['latency_ms']['handle_data']
+    assert latency['p50'] <= latency['p90'] <= latency['p99'] <= \
+        latency['max']
+    assert report['backend_calls']['get_equities'] == 1
+    assert report['backend_calls']['order'] >= 1
+    spot = report['cache']['spot_value']
+    assert spot['requests'] == 2 * bars
+    # the second read in the bar is served by the bar snapshot
+    assert spot['fetches'] == bars
+    assert spot['hit_rate'] == 0.5
+    assert report['peak_rss_mb'] > 0
+
+    lines = format_report(report)
+    assert any(line.startswith('handle_data') for line in lines)
+
+    result = CliRunner().invoke(main, [
+        'bench', str(algofile), '--data', str(data), '--json', '-'])
+    assert result.exit_code == 0, result.output
+    output = result.output[result.output.index('{'):]
+    assert json.loads(output)['latency_ms']['handle_data']['count'] == bars